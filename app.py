@@ -1,19 +1,20 @@
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from src.model_handler import ModelHandler
-from src.explainer import XAIExplainer
+from src.explainer_cache import ExplainerCache, file_digest
+from src.jobs import JobManager
+from src.sessions import SessionManager
+from src.model_registry import ModelRegistry
+from src.uploads import UploadManager, UploadError
+from src.metrics import REGISTRY
 import os
 import sys
-import joblib
-import pandas as pd
-from sklearn.linear_model import LogisticRegression
-from sklearn.linear_model import LinearRegression
-from sklearn.datasets import load_iris, fetch_california_housing
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
+import json
 import threading
 
+# pandas, scikit-learn, shap and shapash are imported on first use so the
+# server starts serving before the heavy scientific stack is loaded
+
 # Add local Shapash to Python path
 shapash_path = os.path.join(os.path.dirname(__file__), 'shapash')
 if shapash_path not in sys.path:
@@ -25,19 +26,107 @@ CORS(app)
 # Configure upload settings
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
 EXAMPLE_MODELS_FOLDER = os.path.join(os.path.dirname(__file__), 'example_models')
+CACHE_FOLDER = os.path.join(os.path.dirname(__file__), 'cache')
+EXPORT_FOLDER = os.path.join(os.path.dirname(__file__), 'exports')
+PROFILE_FOLDER = os.path.join(CACHE_FOLDER, 'profiles')
+CONTRIBUTION_FOLDER = os.path.join(CACHE_FOLDER, 'contributions')
+EXAMPLE_MANIFEST = os.path.join(EXAMPLE_MODELS_FOLDER, 'manifest.json')
+# Bump when the example training recipe changes so stale artifacts are rebuilt
+EXAMPLE_MODELS_VERSION = 2
 ALLOWED_EXTENSIONS = {'csv', 'pkl', 'h5', 'pt', 'pth'}
+EXAMPLE_MODEL_TYPES = ('classification', 'regression', 'clustering')
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(EXAMPLE_MODELS_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['EXPLAINER_CACHE_ITEMS'] = int(os.environ.get('EXPLAINER_CACHE_ITEMS', 4))
+app.config['EXPLAINER_CACHE_BYTES'] = int(os.environ.get('EXPLAINER_CACHE_BYTES', 2 * 1024 ** 3))
+
+# Compiled explainers keyed by model, dataset and settings hash
+explainer_cache = ExplainerCache(
+    os.path.join(CACHE_FOLDER, 'explainers'),
+    max_memory_items=app.config['EXPLAINER_CACHE_ITEMS'],
+    max_disk_bytes=app.config['EXPLAINER_CACHE_BYTES']
+)
+
+app.config['MODEL_REGISTRY_BYTES'] = int(os.environ.get('MODEL_REGISTRY_BYTES', 2 * 1024 ** 3))
+app.config['MODEL_MMAP_BYTES'] = int(os.environ.get('MODEL_MMAP_BYTES', 64 * 1024 ** 2))
+
+# Loaded models shared across sessions, keyed by content hash
+model_registry = ModelRegistry(
+    max_memory_bytes=app.config['MODEL_REGISTRY_BYTES'],
+    mmap_threshold_bytes=app.config['MODEL_MMAP_BYTES']
+)
+
+app.config['EXPLAIN_N_JOBS'] = int(os.environ.get('EXPLAIN_N_JOBS', 1))
+app.config['EXPLAIN_CHUNK_SIZE'] = int(os.environ.get('EXPLAIN_CHUNK_SIZE', 10000))
+app.config['EXPLAIN_SAMPLE_SIZE'] = int(os.environ['EXPLAIN_SAMPLE_SIZE']) if os.environ.get('EXPLAIN_SAMPLE_SIZE') else None
+app.config['EXPLAIN_SAMPLING'] = os.environ.get('EXPLAIN_SAMPLING', 'uniform')
+app.config['EXPLAIN_BACKEND'] = os.environ.get('EXPLAIN_BACKEND', 'auto')
+app.config['EXPLAIN_LAZY'] = os.environ.get('EXPLAIN_LAZY', '').lower() in ('1', 'true', 'yes')
+app.config['EXPLAIN_LAZY_ROWS'] = int(os.environ.get('EXPLAIN_LAZY_ROWS', 1000))
+app.config['ROW_CACHE_SIZE'] = int(os.environ.get('ROW_CACHE_SIZE', 10000))
+app.config['PLOT_POINT_BUDGET'] = int(os.environ.get('PLOT_POINT_BUDGET', 2000))
+app.config['PLOT_BINS'] = int(os.environ.get('PLOT_BINS', 32))
+app.config['PLOT_GRID_SIZE'] = int(os.environ.get('PLOT_GRID_SIZE', 64))
+# float32, int16 or int8 (quantized); float64 keeps contributions in memory as before
+app.config['CONTRIBUTION_DTYPE'] = os.environ.get('CONTRIBUTION_DTYPE', 'float32')
+app.config['CONTRIBUTION_STORE_BYTES'] = int(os.environ.get('CONTRIBUTION_STORE_BYTES', 8 * 1024 ** 3))
+app.config['DATASET_CACHE_BYTES'] = int(os.environ.get('DATASET_CACHE_BYTES', 2 * 1024 ** 3))
+app.config['PERMUTATION_FIRST_VIEW'] = os.environ.get('PERMUTATION_FIRST_VIEW', 'false').lower() in ('1', 'true', 'yes')
+app.config['PERMUTATION_MAX_ROWS'] = int(os.environ.get('PERMUTATION_MAX_ROWS', 10000))
+app.config['PERMUTATION_MAX_REPEATS'] = int(os.environ.get('PERMUTATION_MAX_REPEATS', 50))
+app.config['PERMUTATION_TOLERANCE'] = float(os.environ.get('PERMUTATION_TOLERANCE', 0.05))
+app.config['WHATIF_MAX_ROWS'] = int(os.environ.get('WHATIF_MAX_ROWS', 1000))
+app.config['WHATIF_MAX_EVALUATIONS'] = int(os.environ.get('WHATIF_MAX_EVALUATIONS', 1000000))
+app.config['WHATIF_CACHE_ITEMS'] = int(os.environ.get('WHATIF_CACHE_ITEMS', 256))
+app.config['COUNTERFACTUAL_MAX_EVALUATIONS'] = int(os.environ.get('COUNTERFACTUAL_MAX_EVALUATIONS', 10000))
+app.config['COUNTERFACTUAL_MAX_SECONDS'] = float(os.environ.get('COUNTERFACTUAL_MAX_SECONDS', 5.0))
+app.config['MAX_CONCURRENT_JOBS'] = int(os.environ.get('MAX_CONCURRENT_JOBS', 2))
+app.config['PROFILE_MAX_FILES'] = int(os.environ.get('PROFILE_MAX_FILES', 50))
+
+# Background workers that load, compile and launch explanations
+job_manager = JobManager(max_workers=app.config['MAX_CONCURRENT_JOBS'])
 
-# Global variable to store the Shapash app instance
-shapash_app = None
-shapash_thread = None
+app.config['DASHBOARD_HOST'] = os.environ.get('DASHBOARD_HOST', 'localhost')
+app.config['DASHBOARD_PORT_START'] = int(os.environ.get('DASHBOARD_PORT_START', 8050))
+app.config['DASHBOARD_PORT_COUNT'] = int(os.environ.get('DASHBOARD_PORT_COUNT', 10))
+app.config['SESSION_TTL_SECONDS'] = int(os.environ.get('SESSION_TTL_SECONDS', 1800))
+app.config['SESSION_MEMORY_BYTES'] = int(os.environ.get('SESSION_MEMORY_BYTES', 4 * 1024 ** 3))
+app.config['INCREMENTAL_MAX_MODELS'] = int(os.environ.get('INCREMENTAL_MAX_MODELS', 4))
+app.config['INCREMENTAL_MAX_ROWS'] = int(os.environ.get('INCREMENTAL_MAX_ROWS', 2000000))
+app.config['BUNDLE_MAX_OPEN'] = int(os.environ.get('BUNDLE_MAX_OPEN', 32))
+app.config['UPLOAD_MAX_FILE_BYTES'] = int(os.environ.get('UPLOAD_MAX_FILE_BYTES', 8 * 1024 ** 3))
+app.config['UPLOAD_QUOTA_BYTES'] = int(os.environ.get('UPLOAD_QUOTA_BYTES', 32 * 1024 ** 3))
+app.config['UPLOAD_TTL_SECONDS'] = int(os.environ.get('UPLOAD_TTL_SECONDS', 24 * 3600))
+
+# Resumable, content-addressed uploads shared by every client
+upload_manager = UploadManager(
+    app.config['UPLOAD_FOLDER'],
+    max_file_bytes=app.config['UPLOAD_MAX_FILE_BYTES'],
+    quota_bytes=app.config['UPLOAD_QUOTA_BYTES'],
+    ttl_seconds=app.config['UPLOAD_TTL_SECONDS']
+)
+
+# One Shapash dashboard per explanation session, served from a small port pool
+session_manager = SessionManager(
+    ports=range(app.config['DASHBOARD_PORT_START'],
+                app.config['DASHBOARD_PORT_START'] + app.config['DASHBOARD_PORT_COUNT']),
+    host=app.config['DASHBOARD_HOST'],
+    ttl_seconds=app.config['SESSION_TTL_SECONDS'],
+    max_memory_bytes=app.config['SESSION_MEMORY_BYTES']
+)
+session_manager.start_reaper()
 
 def train_iris_model():
     """Train a model on the Iris dataset"""
+    import pandas as pd
+    from sklearn.datasets import load_iris
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    
     iris = load_iris()
     X = pd.DataFrame(iris.data, columns=iris.feature_names)
     y = pd.Series(iris.target, name='target')
@@ -57,6 +146,12 @@ def train_iris_model():
 
 def train_california_model():
     """Train a model on the California Housing dataset"""
+    import pandas as pd
+    from sklearn.datasets import fetch_california_housing
+    from sklearn.linear_model import LinearRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    
     housing = fetch_california_housing()
     X = pd.DataFrame(housing.data, columns=housing.feature_names)
     y = pd.Series(housing.target, name='target')
@@ -74,8 +169,30 @@ def train_california_model():
     
     return model, X_test_scaled, y_test, scaler
 
+def train_clustering_model():
+    """Fit KMeans on three generated blobs; the dataset has no target column"""
+    import numpy as np
+    import pandas as pd
+    from sklearn.cluster import KMeans
+    
+    rng = np.random.default_rng(42)
+    n_samples = 300
+    X = pd.DataFrame(np.concatenate([
+        rng.normal(0, 1, (n_samples, 2)),
+        rng.normal(4, 1.5, (n_samples, 2)),
+        rng.normal(-4, 1.2, (n_samples, 2))
+    ]), columns=['feature1', 'feature2'])
+    
+    model = KMeans(n_clusters=3, n_init=10, random_state=42)
+    model.fit(X)
+    
+    return model, X
+
 def create_example_models():
     """Create and save example models if they don't exist"""
+    import joblib
+    import pandas as pd
+    
     # Classification example (Iris dataset)
     model, X_test_scaled, y_test, scaler = train_iris_model()
     
@@ -94,9 +211,67 @@ def create_example_models():
         os.path.join(EXAMPLE_MODELS_FOLDER, 'regression_data.csv'), index=False
     )
 
+    # Clustering example (generated blobs)
+    model, X = train_clustering_model()
+    
+    # Save model and data
+    joblib.dump(model, os.path.join(EXAMPLE_MODELS_FOLDER, 'clustering_model.pkl'))
+    X.to_csv(os.path.join(EXAMPLE_MODELS_FOLDER, 'clustering_data.csv'), index=False)
+    
+    write_example_manifest()
+
+def example_artifacts():
+    """Files produced by create_example_models()"""
+    return [f'{model_type}_{kind}' for model_type in EXAMPLE_MODEL_TYPES
+            for kind in ('model.pkl', 'data.csv')]
+
+def write_example_manifest():
+    """Record the training recipe version and content hash of every example artifact"""
+    manifest = {
+        'version': EXAMPLE_MODELS_VERSION,
+        'files': {name: file_digest(os.path.join(EXAMPLE_MODELS_FOLDER, name)) for name in example_artifacts()}
+    }
+    with open(EXAMPLE_MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def example_models_up_to_date():
+    """True when every example artifact exists and matches the manifest hashes"""
+    try:
+        with open(EXAMPLE_MANIFEST) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if manifest.get('version') != EXAMPLE_MODELS_VERSION:
+        return False
+    for name in example_artifacts():
+        path = os.path.join(EXAMPLE_MODELS_FOLDER, name)
+        if not os.path.exists(path) or manifest['files'].get(name) != file_digest(path):
+            return False
+    return True
+
+def ensure_example_models():
+    """Train the example models only when the artifacts are missing or stale"""
+    with example_models_lock:
+        if not example_models_up_to_date():
+            create_example_models()
+
+def example_model_paths():
+    """Bundled example models that are already on disk"""
+    paths = [os.path.join(EXAMPLE_MODELS_FOLDER, f'{model_type}_model.pkl')
+             for model_type in EXAMPLE_MODEL_TYPES]
+    return [path for path in paths if os.path.exists(path)]
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def allowed_dataset(filename):
+    from src.ingest import DATASET_EXTENSIONS
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in DATASET_EXTENSIONS
+
+# Warm the registry so the first example request does not pay for deserialization
+example_models_lock = threading.Lock()
+model_registry.preload(example_model_paths())
+
 @app.route('/')
 def index():
     return send_from_directory('static', 'index.html')
@@ -105,48 +280,287 @@ def index():
 def serve_static(path):
     return send_from_directory('static', path)
 
-def run_shapash_app(explainer, port):
-    """Run Shapash app in a separate thread"""
-    global shapash_app
+# Per-row contributions reused across re-uploads, created on first explanation
+incremental_store = None
+incremental_store_lock = threading.Lock()
+
+def get_incremental_store():
+    """Shared store of already explained rows (see src.incremental)"""
+    global incremental_store
+    from src.incremental import IncrementalStore
+    
+    with incremental_store_lock:
+        if incremental_store is None:
+            incremental_store = IncrementalStore(
+                max_models=app.config['INCREMENTAL_MAX_MODELS'],
+                max_rows_per_model=app.config['INCREMENTAL_MAX_ROWS']
+            )
+        return incremental_store
+
+# Fitted categorical encodings per dataset schema, created on first explanation
+encoder_store = None
+encoder_store_lock = threading.Lock()
+
+def get_encoder_store():
+    """Shared categorical encoders (see src.encoding)"""
+    global encoder_store
+    from src.encoding import EncoderStore
+    
+    with encoder_store_lock:
+        if encoder_store is None:
+            encoder_store = EncoderStore(os.path.join(CACHE_FOLDER, 'encoders'))
+        return encoder_store
+
+# Exported explanation bundles, served read-only without the model
+bundle_store = None
+bundle_store_lock = threading.Lock()
+
+def get_bundle_store():
+    """Shared store of exported bundles (see src.bundles)"""
+    global bundle_store
+    from src.bundles import BundleStore
+    
+    with bundle_store_lock:
+        if bundle_store is None:
+            bundle_store = BundleStore(EXPORT_FOLDER, max_open=app.config['BUNDLE_MAX_OPEN'])
+        return bundle_store
+
+# What-if results per (model hash, base rows, perturbation spec), created on first use
+whatif_cache = None
+whatif_cache_lock = threading.Lock()
+
+def get_whatif_cache():
+    """Shared what-if result cache (see src.whatif)"""
+    global whatif_cache
+    from src.whatif import WhatIfCache
+    
+    with whatif_cache_lock:
+        if whatif_cache is None:
+            whatif_cache = WhatIfCache(max_items=app.config['WHATIF_CACHE_ITEMS'])
+        return whatif_cache
+
+def explainer_options(overrides=None):
+    """Explainer settings from the app config, optionally overridden per request"""
+    options = {
+        'n_jobs': app.config['EXPLAIN_N_JOBS'],
+        'chunk_size': app.config['EXPLAIN_CHUNK_SIZE'],
+        'sample_size': app.config['EXPLAIN_SAMPLE_SIZE'],
+        'sampling': app.config['EXPLAIN_SAMPLING'],
+        'backend': app.config['EXPLAIN_BACKEND'],
+        'lazy': app.config['EXPLAIN_LAZY'],
+        'lazy_rows': app.config['EXPLAIN_LAZY_ROWS'],
+        'row_cache_size': app.config['ROW_CACHE_SIZE'],
+        'point_budget': app.config['PLOT_POINT_BUDGET'],
+        'plot_bins': app.config['PLOT_BINS'],
+        'plot_grid_size': app.config['PLOT_GRID_SIZE'],
+        'contribution_store_dir': None if app.config['CONTRIBUTION_DTYPE'] == 'float64' else CONTRIBUTION_FOLDER,
+        'contribution_dtype': app.config['CONTRIBUTION_DTYPE'],
+        'contribution_store_bytes': app.config['CONTRIBUTION_STORE_BYTES'],
+        'dataset_cache_dir': os.path.join(CACHE_FOLDER, 'datasets'),
+        'dataset_cache_bytes': app.config['DATASET_CACHE_BYTES'],
+        'incremental_store': get_incremental_store(),
+        'encoder_store': get_encoder_store(),
+    }
+    options.update(overrides or {})
+    return options
+
+def permutation_options():
+    """Row and repeat budget of permutation importance runs"""
+    return {
+        'max_rows': app.config['PERMUTATION_MAX_ROWS'],
+        'max_repeats': app.config['PERMUTATION_MAX_REPEATS'],
+        'tolerance': app.config['PERMUTATION_TOLERANCE'],
+    }
+
+def importance_json(importance):
+    """JSON form of an importance table from the explainer"""
+    return {
+        'rows': importance.attrs['n_rows'],
+        'confidence': importance.attrs['confidence'],
+        'features': [
+            {'feature': feature, **values} for feature, values in importance.to_dict(orient='index').items()
+        ]
+    }
+
+def request_overrides():
+    """Read per-request explainer settings from the form or query string"""
+    from src.backends import BACKENDS
+    from src.sampling import SAMPLING_STRATEGIES
+    
+    overrides = {}
+    sample_size = request.values.get('sample_size')
+    if sample_size:
+        if not sample_size.isdigit() or int(sample_size) == 0:
+            raise ValueError('sample_size must be a positive integer')
+        overrides['sample_size'] = int(sample_size)
+    sampling = request.values.get('sampling')
+    if sampling:
+        if sampling not in SAMPLING_STRATEGIES:
+            raise ValueError(f"sampling must be one of {', '.join(SAMPLING_STRATEGIES)}")
+        overrides['sampling'] = sampling
+    backend = request.values.get('backend')
+    if backend:
+        if backend != 'auto' and backend not in BACKENDS:
+            raise ValueError(f"backend must be auto or one of {', '.join(BACKENDS)}")
+        overrides['backend'] = backend
+    lazy = request.values.get('lazy')
+    if lazy:
+        overrides['lazy'] = lazy.lower() in ('1', 'true', 'yes')
+    return overrides
+
+def request_profile():
+    """Whether the request asked for a cProfile dump of its job"""
+    return request.values.get('profile', '').lower() in ('1', 'true', 'yes')
+
+def profile_path(job_id):
+    return os.path.join(PROFILE_FOLDER, f'{job_id}.prof')
+
+def trim_profiles():
+    """Delete the oldest profile dumps beyond PROFILE_MAX_FILES"""
+    dumps = []
+    for name in os.listdir(PROFILE_FOLDER):
+        path = os.path.join(PROFILE_FOLDER, name)
+        try:
+            dumps.append((os.path.getmtime(path), path))
+        except FileNotFoundError:
+            continue
+    for _, path in sorted(dumps)[:max(0, len(dumps) - app.config['PROFILE_MAX_FILES'])]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def profile_job(job, fn, *args, **kwargs):
+    """Run ``fn`` for ``job`` under cProfile, keeping the stats for /api/jobs/<id>/profile"""
+    import cProfile
+    
+    profiler = cProfile.Profile()
+    profiler.enable()
     try:
-        shapash_app = explainer.launch_webapp(port=port)
-        # The app is already running in a thread via SmartExplainer.run_app()
-        # We don't need to do anything else
-    except Exception as e:
-        print(f"Error launching Shapash app: {str(e)}")
-        raise
+        result = fn(job, *args, **kwargs)
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_FOLDER, exist_ok=True)
+        profiler.dump_stats(profile_path(job.id))
+        trim_profiles()
+    result['profile_url'] = f'/api/jobs/{job.id}/profile'
+    return result
+
+def submit_job(fn, *args, name, profile=False, **kwargs):
+    """Queue ``fn`` on the job manager, profiled when requested"""
+    if profile:
+        return job_manager.submit(profile_job, fn, *args, name=name, **kwargs)
+    return job_manager.submit(fn, *args, name=name, **kwargs)
+
+def explain_job(job, model_path, data_path, options=None):
+    """Load the model and data, compile the explainer and launch its dashboard"""
+    from src.explainer import XAIExplainer
+    
+    # Uploaded files are content-addressed blobs that other uploads may share,
+    # so they are left to the upload quota rather than deleted on failure
+    job.update(0.05, 'Loading model')
+    model_handler = model_registry.get(model_path)
+    
+    job.update(0.2, 'Reading dataset')
+    explainer = XAIExplainer(model_handler, data_path, cache=explainer_cache, **explainer_options(options))
+    
+    first_view = None
+    if app.config['PERMUTATION_FIRST_VIEW']:
+        # Model predictions alone give a global ranking; it runs as a job of its
+        # own next to the compile rather than delaying it
+        permutation = job_manager.submit(explainer_permutation_job, explainer, name=f'permutation:{job.id}')
+        first_view = {
+            'permutation_job_id': permutation.id,
+            'permutation_status_url': f'/api/jobs/{permutation.id}'
+        }
+    
+    job.update(0.35, 'Computing contributions', result=first_view)
+    if not explainer.compile_explainer(checkpoint=job.check_cancelled):
+        raise ValueError(f"Error compiling explainer: {explainer.compile_error}")
+    
+    job.update(0.9, 'Starting dashboard')
+    with REGISTRY.span('session_start'):
+        session = session_manager.create(explainer)
+    
+    return {
+        'message': 'Shapash visualization started',
+        'session_id': session.id,
+        'url': session.url,
+        'rows_explained': len(explainer.sample_index),
+        'backend': explainer.backend_report,
+        **(first_view or {})
+    }
+
+def explainer_permutation_job(job, explainer, confidence=0.95):
+    """Permutation importance of an explainer's model and data"""
+    job.update(0.1, 'Computing permutation importance')
+    importance = explainer.permutation_importance(confidence=confidence, **permutation_options())
+    return {
+        'message': 'Permutation importance computed',
+        'metric': importance.attrs['metric'],
+        'baseline_loss': importance.attrs['baseline_loss'],
+        **importance_json(importance)
+    }
+
+def permutation_job(job, model_path, data_path, options=None, confidence=0.95):
+    """Permutation importance of a model on a dataset, without computing any contributions"""
+    from src.explainer import XAIExplainer
+    
+    job.update(0.05, 'Loading model')
+    model_handler = model_registry.get(model_path)
+    
+    job.update(0.2, 'Reading dataset')
+    explainer = XAIExplainer(model_handler, data_path, **explainer_options(options))
+    
+    return explainer_permutation_job(job, explainer, confidence=confidence)
+
+def example_job(job, model_type, options=None):
+    """Explain one of the bundled example models, creating it first if needed"""
+    model_path = os.path.join(EXAMPLE_MODELS_FOLDER, f'{model_type}_model.pkl')
+    data_path = os.path.join(EXAMPLE_MODELS_FOLDER, f'{model_type}_data.csv')
+    
+    if not os.path.exists(model_path) or not os.path.exists(data_path):
+        job.update(0.01, 'Training example models')
+        ensure_example_models()
+    
+    return explain_job(job, model_path, data_path, options=options)
+
+def export_job(job, session):
+    """Write a session's compiled results to a read-only bundle"""
+    job.update(0.1, 'Exporting explanation bundle')
+    bundle_id, manifest = get_bundle_store().export(session.explainer)
+    return {
+        'message': 'Explanation exported',
+        'bundle_id': bundle_id,
+        'url': f'/api/bundles/{bundle_id}',
+        'rows': manifest['rows']
+    }
+
+def job_accepted(job, message='Explanation queued'):
+    """202 response pointing the client at the job's status URL"""
+    status_url = f'/api/jobs/{job.id}'
+    response = jsonify({
+        'message': message,
+        'job_id': job.id,
+        'status_url': status_url
+    })
+    response.headers['Location'] = status_url
+    return response, 202
 
 @app.route('/api/example/<model_type>', methods=['POST'])
 def example_model(model_type):
     try:
-        if model_type not in ['classification', 'regression']:
+        if model_type not in EXAMPLE_MODEL_TYPES:
             return jsonify({'error': 'Invalid model type'}), 400
         
-        model_path = os.path.join(EXAMPLE_MODELS_FOLDER, f'{model_type}_model.pkl')
-        data_path = os.path.join(EXAMPLE_MODELS_FOLDER, f'{model_type}_data.csv')
-        
-        if not os.path.exists(model_path) or not os.path.exists(data_path):
-            create_example_models()
-        
-        model_handler = ModelHandler(model_path)
-        explainer = XAIExplainer(model_handler, data_path)
-        
-        # Start Shapash app in a separate thread
-        global shapash_thread
-        if shapash_thread is not None:
-            # Stop previous instance if exists
-            if shapash_app is not None:
-                shapash_app.server.shutdown()
-            shapash_thread.join()
-        
-        shapash_thread = threading.Thread(target=run_shapash_app, args=(explainer, 8050))
-        shapash_thread.daemon = True
-        shapash_thread.start()
+        try:
+            overrides = request_overrides()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        return jsonify({
-            'message': 'Shapash visualization started',
-            'url': 'http://localhost:8050'
-        }), 200
+        job = submit_job(example_job, model_type, options=overrides, name=f'example:{model_type}',
+                         profile=request_profile())
+        return job_accepted(job)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -163,52 +577,651 @@ def upload_files():
         if model_file.filename == '' or dataset_file.filename == '':
             return jsonify({'error': 'No selected files'}), 400
         
-        if not (allowed_file(model_file.filename) and dataset_file.filename.endswith('.csv')):
+        if not (allowed_file(model_file.filename) and allowed_dataset(dataset_file.filename)):
             return jsonify({'error': 'Invalid file types'}), 400
         
-        # Save files
-        model_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(model_file.filename))
-        dataset_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(dataset_file.filename))
-        
-        model_file.save(model_path)
-        dataset_file.save(dataset_path)
+        try:
+            overrides = request_overrides()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
+        # Stream into content-addressed storage so concurrent uploads never collide
         try:
-            # Load and validate model
-            model_handler = ModelHandler(model_path)
-            explainer = XAIExplainer(model_handler, dataset_path)
-            
-            # Start Shapash app in a separate thread
-            global shapash_thread
-            if shapash_thread is not None:
-                # Stop previous instance if exists
-                if shapash_app is not None:
-                    shapash_app.server.shutdown()
-                shapash_thread.join()
-            
-            shapash_thread = threading.Thread(target=run_shapash_app, args=(explainer, 8050))
-            shapash_thread.daemon = True
-            shapash_thread.start()
-            
-            return jsonify({
-                'message': 'Shapash visualization started',
-                'url': 'http://localhost:8050'
-            }), 200
-            
-        except Exception as e:
-            # Clean up uploaded files if processing fails
-            os.remove(model_path)
-            os.remove(dataset_path)
-            raise
+            model_id = upload_manager.store(model_file.stream, secure_filename(model_file.filename))
+            dataset_id = upload_manager.store(dataset_file.stream, secure_filename(dataset_file.filename))
+        except UploadError as e:
+            return jsonify({'error': str(e)}), e.status
+        
+        job = submit_job(
+            explain_job, upload_manager.blob_path(model_id), upload_manager.blob_path(dataset_id),
+            options=overrides,
+            name=f'upload:{model_file.filename}',
+            profile=request_profile()
+        )
+        return job_accepted(job)
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    payload = request.get_json(silent=True) or request.values
+    filename = secure_filename(payload.get('filename', ''))
+    if not (allowed_file(filename) or allowed_dataset(filename)):
+        return jsonify({'error': 'Invalid file type'}), 400
+    try:
+        size = int(payload.get('size'))
+        upload = upload_manager.create(filename, size, sha256=payload.get('sha256'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size must be an integer number of bytes'}), 400
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    if isinstance(upload, str):
+        # Identical content is already stored, nothing to send
+        return jsonify({'file_id': upload, 'deduplicated': True}), 200
+    response = jsonify({**upload.to_dict(), 'chunk_url': f'/api/uploads/{upload.id}'})
+    response.headers['Location'] = f'/api/uploads/{upload.id}'
+    return response, 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    upload = upload_manager.get(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(upload.to_dict()), 200
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT', 'PATCH'])
+def upload_chunk(upload_id):
+    """Append the raw request body at ``offset`` (query string or Upload-Offset header)"""
+    try:
+        offset = int(request.args.get('offset', request.headers.get('Upload-Offset', 0)))
+    except ValueError:
+        return jsonify({'error': 'offset must be an integer'}), 400
+    try:
+        received = upload_manager.write_chunk(upload_id, offset, request.stream, request.content_length)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify({'upload_id': upload_id, 'received': received}), 200
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    try:
+        file_id, deduplicated = upload_manager.complete(upload_id)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify({'file_id': file_id, 'deduplicated': deduplicated}), 200
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    if not upload_manager.abort(upload_id):
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify({'message': 'Upload aborted'}), 200
+
+@app.route('/api/explain', methods=['POST'])
+def explain_uploaded():
+    """Explain a model and dataset previously stored through /api/uploads"""
+    model_id = request.values.get('model', '')
+    dataset_id = request.values.get('dataset', '')
+    model_path = upload_manager.blob_path(model_id)
+    dataset_path = upload_manager.blob_path(dataset_id)
+    if model_path is None or dataset_path is None:
+        return jsonify({'error': 'Unknown model or dataset file id'}), 404
+    if not (allowed_file(model_id) and allowed_dataset(dataset_id)):
+        return jsonify({'error': 'Invalid file types'}), 400
+    try:
+        overrides = request_overrides()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    job = submit_job(explain_job, model_path, dataset_path, options=overrides, name=f'explain:{model_id}',
+                     profile=request_profile())
+    return job_accepted(job)
+
+@app.route('/api/permutation-importance', methods=['POST'])
+def permutation_uploaded():
+    """Queue permutation importance for a model and dataset stored through /api/uploads"""
+    model_id = request.values.get('model', '')
+    dataset_id = request.values.get('dataset', '')
+    model_path = upload_manager.blob_path(model_id)
+    dataset_path = upload_manager.blob_path(dataset_id)
+    if model_path is None or dataset_path is None:
+        return jsonify({'error': 'Unknown model or dataset file id'}), 404
+    if not (allowed_file(model_id) and allowed_dataset(dataset_id)):
+        return jsonify({'error': 'Invalid file types'}), 400
+    try:
+        confidence = float(request.values.get('confidence', 0.95))
+    except ValueError:
+        return jsonify({'error': 'confidence must be a number'}), 400
+    
+    job = submit_job(permutation_job, model_path, dataset_path, confidence=confidence,
+                     name=f'permutation:{model_id}', profile=request_profile())
+    return job_accepted(job, message='Permutation importance queued')
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/api/jobs/<job_id>/profile', methods=['GET'])
+def job_profile(job_id):
+    """cProfile stats of a job submitted with profile=1, as text or the raw .prof file"""
+    import io
+    import pstats
+    
+    path = profile_path(job_id) if job_id.isalnum() else None
+    if path is None or not os.path.exists(path):
+        return jsonify({'error': 'No profile recorded for this job'}), 404
+    if request.args.get('format') == 'raw':
+        return send_from_directory(PROFILE_FOLDER, f'{job_id}.prof', as_attachment=True)
+    
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'ncalls'):
+        return jsonify({'error': 'sort must be cumulative, tottime or ncalls'}), 400
+    try:
+        limit = int(request.args.get('limit', 40))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).sort_stats(sort).print_stats(limit)
+    return app.response_class(output.getvalue(), mimetype='text/plain')
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if not job_manager.cancel(job_id):
+        return jsonify({'error': f'Job already {job.status}'}), 409
+    return jsonify(job.to_dict()), 202
+
+@app.route('/api/predict', methods=['POST'])
+def predict():
+    payload = request.get_json(silent=True) or {}
+    session = session_manager.get(payload.get('session_id', ''))
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    rows = payload.get('rows')
+    if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+        return jsonify({'error': 'rows must be a non-empty list of feature mappings'}), 400
+    
+    explainer = session.explainer
+    try:
+        # Rows arrive with labels; the model sees the same codes and dtypes as when explaining them
+        X = explainer.encode_rows(rows)
+        model_handler = explainer.model_handler
+        predictions = model_handler.predict_batched(X)
+        response = {'predictions': predictions.tolist()}
+        if payload.get('proba') and model_handler.model_type == 'classification':
+            response['probabilities'] = model_handler.predict_proba_batched(X).tolist()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(response), 200
+
+def explanation_json(explainer, explanation):
+    """JSON form of an explain_row/explain_features result, keyed by class for classifiers"""
+    import numpy as np
+    
+    def as_dict(frame):
+        return {str(feature): float(value) for feature, value in frame.iloc[0].items()}
+    
+    contributions = explanation['contributions']
+    if isinstance(contributions, list):
+        labels = explainer.explainer._classes or range(len(contributions))
+        contributions = {str(label): as_dict(frame) for label, frame in zip(labels, contributions)}
+    else:
+        contributions = as_dict(contributions)
+    prediction = explanation['prediction']
+    return {
+        'prediction': prediction.item() if isinstance(prediction, np.generic) else prediction,
+        'contributions': contributions
+    }
+
+@app.route('/api/explain/<session_id>/row', methods=['GET', 'POST'])
+def explain_session_row(session_id):
+    """Local explanation for a dataset row (``index``) or an ad-hoc feature vector (``features``)"""
+    import time
+    
+    session = session_manager.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    payload = request.get_json(silent=True) or {}
+    index = payload.get('index', request.args.get('index'))
+    features = payload.get('features')
+    
+    explainer = session.explainer
+    start = time.perf_counter()
+    try:
+        if features is not None:
+            if not isinstance(features, dict):
+                raise ValueError('features must be a mapping of feature name to value')
+            explanation, cached = explainer.explain_features(features)
+        elif index is not None:
+            index = parse_index(index)
+            explanation, cached = explainer.explain_row(index)
+        else:
+            raise ValueError('Provide a row index or a features mapping')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'index': index if features is None else None,
+        **explanation_json(explainer, explanation),
+        'cached': cached,
+        'seconds': round(time.perf_counter() - start, 6)
+    }), 200
+
+def parse_index(index):
+    """Dataset indexes are integers unless the file carried its own index"""
+    if isinstance(index, str) and index.lstrip('-').isdigit():
+        return int(index)
+    return index
+
+def whatif_rows(explainer, payload):
+    """Encoded base rows of a what-if request: dataset rows, feature mappings or a dataset sample"""
+    from src.sampling import sample_rows
+    
+    max_rows = app.config['WHATIF_MAX_ROWS']
+    if payload.get('index') is not None:
+        index = payload['index'] if isinstance(payload['index'], list) else [payload['index']]
+        index = [parse_index(label) for label in index]
+        missing = [str(label) for label in index if label not in explainer.features.index]
+        if missing:
+            raise ValueError(f"Rows not found in dataset: {', '.join(missing[:10])}")
+        x = explainer.features.loc[index]
+    elif payload.get('rows') is not None:
+        rows = payload['rows']
+        if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+            raise ValueError('rows must be a non-empty list of feature mappings')
+        x = explainer.encode_rows(rows)
+    else:
+        sample = payload.get('sample', max_rows)
+        if not isinstance(sample, int) or sample < 1:
+            raise ValueError('sample must be a positive integer')
+        x, _ = explainer.complete_rows()
+        if len(x) > sample:
+            x = x.loc[sample_rows(x, sample, random_state=explainer.random_state)]
+    if len(x) > max_rows:
+        raise ValueError(f'At most {max_rows} base rows per request')
+    return x
+
+def whatif_cached(explainer, base, spec, compute):
+    """Result for (model hash, base rows, spec) from the what-if cache, computed on a miss"""
+    from src.whatif import row_digest, spec_key
+    
+    cache = get_whatif_cache()
+    key = (model_registry.digest(explainer.model_handler.model_path), row_digest(base), spec_key(spec))
+    result = cache.get(key)
+    if result is not None:
+        return result, True
+    result = compute()
+    # A search cut short by its time limit depends on the machine's load, so it is not reused
+    if result.get('stopped') != 'max_seconds':
+        cache.put(key, result)
+    return result, False
+
+@app.route('/api/whatif', methods=['POST'])
+def whatif():
+    """ICE curves and partial dependence of base rows over a grid of feature values, in one model call"""
+    import time
+    from src.whatif import grid_values, sweep
+    
+    payload = request.get_json(silent=True) or {}
+    session = session_manager.get(payload.get('session_id', ''))
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    explainer = session.explainer
+    start = time.perf_counter()
+    try:
+        grid = payload.get('grid')
+        grid = [grid] if isinstance(grid, dict) else grid
+        if not isinstance(grid, list) or not grid or not all(isinstance(axis, dict) for axis in grid):
+            raise ValueError('grid must be a mapping, or a list of mappings, with a feature and values or points')
+        base = whatif_rows(explainer, payload)
+        axes = [
+            (axis.get('feature'), grid_values(explainer.features, explainer.encoder, axis.get('feature'),
+                                              axis.get('values'), int(axis.get('points', 20))))
+            for axis in grid
+        ]
+        ice = bool(payload.get('ice', True))
+        spec = {'kind': 'sweep', 'grid': [[feature, values.tolist()] for feature, values in axes], 'ice': ice}
+        result, cached = whatif_cached(explainer, base, spec, lambda: sweep(
+            explainer.model_handler, base, axes, explainer.encoder, ice=ice,
+            max_evaluations=app.config['WHATIF_MAX_EVALUATIONS']
+        ))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        **result,
+        'cached': cached,
+        'seconds': round(time.perf_counter() - start, 6)
+    }), 200
+
+@app.route('/api/whatif/counterfactual', methods=['POST'])
+def whatif_counterfactual():
+    """Closest change to a row that reaches a target prediction, within an evaluation and time budget"""
+    from src.whatif import acceptance, counterfactual
+    
+    payload = request.get_json(silent=True) or {}
+    session = session_manager.get(payload.get('session_id', ''))
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    explainer = session.explainer
+    try:
+        features = payload.get('features')
+        if features is not None:
+            if not isinstance(features, dict):
+                raise ValueError('features must be a mapping of feature name to value')
+            base = explainer.encode_rows([features])
+        elif payload.get('index') is not None and not isinstance(payload['index'], list):
+            base = whatif_rows(explainer, {'index': payload['index']})
+        else:
+            raise ValueError('Provide a row index or a features mapping')
+        
+        accept = acceptance(explainer.model_handler, payload.get('target'), payload.get('low'), payload.get('high'))
+        mutable = payload.get('mutable')
+        if mutable is not None and not isinstance(mutable, list):
+            raise ValueError('mutable must be a list of feature names')
+        # Requests may lower the budgets, never raise them
+        max_evaluations = min(int(payload.get('max_evaluations', app.config['COUNTERFACTUAL_MAX_EVALUATIONS'])),
+                              app.config['COUNTERFACTUAL_MAX_EVALUATIONS'])
+        max_seconds = min(float(payload.get('max_seconds', app.config['COUNTERFACTUAL_MAX_SECONDS'])),
+                          app.config['COUNTERFACTUAL_MAX_SECONDS'])
+        # Searches that time out are never cached, so the time limit is not part of the key
+        spec = {'kind': 'counterfactual', 'data': file_digest(explainer.data_path), 'target': payload.get('target'),
+                'low': payload.get('low'), 'high': payload.get('high'), 'mutable': mutable,
+                'max_evaluations': max_evaluations}
+        data, _ = explainer.complete_rows()
+        result, cached = whatif_cached(explainer, base, spec, lambda: counterfactual(
+            explainer.model_handler, base, data, explainer.encoder, accept, mutable=mutable,
+            max_evaluations=max_evaluations, max_seconds=max_seconds, random_state=explainer.random_state
+        ))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({**result, 'cached': cached}), 200
+
+@app.route('/api/sessions', methods=['GET'])
+def list_sessions():
+    return jsonify([session.to_dict() for session in session_manager.list()]), 200
+
+@app.route('/api/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    session = session_manager.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify(session.to_dict()), 200
+
+@app.route('/api/sessions/<session_id>/importance', methods=['GET'])
+def session_importance(session_id):
+    session = session_manager.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    try:
+        confidence = float(request.args.get('confidence', 0.95))
+        importance = session.explainer.global_importance(confidence=confidence)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(importance_json(importance)), 200
+
+@app.route('/api/sessions/<session_id>/permutation-importance', methods=['GET'])
+def session_permutation_importance(session_id):
+    """Permutation importance of the session's model on its dataset"""
+    session = session_manager.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    try:
+        confidence = float(request.args.get('confidence', 0.95))
+        importance = session.explainer.permutation_importance(confidence=confidence, **permutation_options())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'metric': importance.attrs['metric'],
+        'baseline_loss': importance.attrs['baseline_loss'],
+        **importance_json(importance)
+    }), 200
+
+@app.route('/api/sessions/<session_id>/plots', methods=['GET'])
+def session_plots(session_id):
+    """Features that have pre-binned plot data"""
+    session = session_manager.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    plot_data = session.explainer.plot_data
+    return jsonify({
+        'rows': len(plot_data.x),
+        'classes': len(plot_data.contributions),
+        'point_budget': plot_data.point_budget,
+        'features': [{'feature': str(feature), 'type': 'numeric' if numeric else 'categorical'}
+                     for feature, numeric in plot_data.numeric.items()]
+    }), 200
+
+@app.route('/api/sessions/<session_id>/plots/<path:feature>', methods=['GET'])
+def session_plot(session_id, feature):
+    """Aggregated contribution plot for a feature, or the points of a zoom window.
+
+    Without window parameters the response is the compile-time overview. With
+    ``x_min``/``x_max`` (numeric features), ``category`` (categorical ones),
+    ``y_min``/``y_max`` (contributions) or ``max_points`` it is the window's
+    raw points, or a density grid and a sample when there are more than the
+    point budget.
+    """
+    session = session_manager.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    plot_data = session.explainer.plot_data
+    args = request.args
+    
+    def bounds(low, high):
+        if low not in args and high not in args:
+            return None
+        return float(args.get(low, '-inf')), float(args.get(high, 'inf'))
+    
+    try:
+        class_index = int(args.get('class', -1))
+        x_range, y_range = bounds('x_min', 'x_max'), bounds('y_min', 'y_max')
+        category = args.get('category')
+        max_points = int(args['max_points']) if 'max_points' in args else None
+        if max_points is not None and max_points < 1:
+            raise ValueError("max_points must be >= 1")
+        if x_range is None and y_range is None and category is None and max_points is None:
+            return jsonify({'level': 'overview', **plot_data.overview(feature, class_index)}), 200
+        result = plot_data.window(feature, class_index, x_range=x_range, y_range=y_range,
+                                  category=category, max_points=max_points)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 200
+
+def session_store(session_id):
+    """The session's memory-mapped contribution store, or an error response"""
+    session = session_manager.get(session_id)
+    if session is None:
+        return None, (jsonify({'error': 'Session not found'}), 404)
+    store = session.explainer.contribution_store
+    if store is None:
+        return None, (jsonify({'error': 'Contribution store is disabled (CONTRIBUTION_DTYPE=float64)'}), 409)
+    return store, None
+
+@app.route('/api/sessions/<session_id>/contributions', methods=['GET'])
+def session_contributions(session_id):
+    """Contributions for a slice of rows, reading only the requested ``features``"""
+    store, error = session_store(session_id)
+    if error is not None:
+        return error
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = min(int(request.args.get('limit', 100)), 1000)
+        class_index = int(request.args.get('class', -1))
+        if offset < 0 or limit < 1:
+            raise ValueError("offset must be >= 0 and limit >= 1")
+        features = request.args.get('features')
+        features = features.split(',') if features else None
+        frame = store.frame(class_index, features, slice(offset, offset + limit))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'offset': offset,
+        'total': store.index['rows'],
+        'rows': [{'index': index, 'contributions': values}
+                 for index, values in zip(frame.index.tolist(), frame.astype(float).to_dict(orient='records'))]
+    }), 200
+
+@app.route('/api/sessions/<session_id>/contributions/top', methods=['GET'])
+def session_top_contributions(session_id):
+    """Top-k rows by |contribution| of a ``feature``, or top-k features of the row at ``index``"""
+    store, error = session_store(session_id)
+    if error is not None:
+        return error
+    args = request.args
+    try:
+        k = int(args.get('k', 10))
+        class_index = int(args.get('class', -1))
+        if k < 1:
+            raise ValueError("k must be >= 1")
+        if 'feature' in args:
+            positions, values = store.top_rows(args['feature'], min(k, 1000), class_index)
+            rows = store.rows[positions].tolist()
+            return jsonify({'feature': args['feature'], 'rows': [
+                {'index': index, 'contribution': float(value)} for index, value in zip(rows, values)
+            ]}), 200
+        if 'index' not in args:
+            raise ValueError("Provide a feature or a row index")
+        index = args['index']
+        index = int(index) if index.lstrip('-').isdigit() else index
+        if index not in store.rows:
+            raise ValueError(f"Row {index} was not compiled")
+        top = store.top_features(store.rows.get_loc(index), k, class_index)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'index': index, 'features': [
+        {'feature': feature, 'contribution': float(value)} for feature, value in top
+    ]}), 200
+
+@app.route('/api/sessions/<session_id>/export', methods=['POST'])
+def export_session(session_id):
+    session = session_manager.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    job = job_manager.submit(export_job, session, name=f'export:{session_id}')
+    return job_accepted(job, message='Export queued')
+
+@app.route('/api/bundles/<bundle_id>', methods=['GET'])
+def get_bundle(bundle_id):
+    bundle = get_bundle_store().get(bundle_id)
+    if bundle is None:
+        return jsonify({'error': 'Bundle not found'}), 404
+    return jsonify(bundle.manifest), 200
+
+@app.route('/api/bundles/<bundle_id>/importance', methods=['GET'])
+def bundle_importance(bundle_id):
+    bundle = get_bundle_store().get(bundle_id)
+    if bundle is None:
+        return jsonify({'error': 'Bundle not found'}), 404
+    return jsonify({
+        'rows': bundle.manifest['rows'],
+        'confidence': bundle.manifest['importance_confidence'],
+        'features': bundle.importance()
+    }), 200
+
+@app.route('/api/bundles/<bundle_id>/rows', methods=['GET'])
+def bundle_rows(bundle_id):
+    bundle = get_bundle_store().get(bundle_id)
+    if bundle is None:
+        return jsonify({'error': 'Bundle not found'}), 404
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = min(int(request.args.get('limit', 100)), 1000)
+        class_index = int(request.args.get('class', -1))
+        if offset < 0 or limit < 1:
+            raise ValueError("offset must be >= 0 and limit >= 1")
+        if not -len(bundle.manifest['contributions']) <= class_index < len(bundle.manifest['contributions']):
+            raise ValueError(f"class must index one of {len(bundle.manifest['contributions'])} contribution tables")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'offset': offset,
+        'total': bundle.manifest['rows'],
+        'rows': bundle.rows(offset, limit, class_index)
+    }), 200
+
+@app.route('/api/bundles/<bundle_id>', methods=['DELETE'])
+def delete_bundle(bundle_id):
+    if not get_bundle_store().delete(bundle_id):
+        return jsonify({'error': 'Bundle not found'}), 404
+    return jsonify({'message': 'Bundle deleted'}), 200
+
+@app.route('/api/sessions/<session_id>', methods=['DELETE'])
+def close_session(session_id):
+    if not session_manager.close(session_id):
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify({'message': 'Session closed'}), 200
+
+def component_gauges():
+    """Numeric fields of the components' stats() as Prometheus gauges"""
+    components = {
+        'explainer_cache': explainer_cache,
+        'model_registry': model_registry,
+        'jobs': job_manager,
+        'sessions': session_manager,
+        'uploads': upload_manager,
+        'incremental': incremental_store,
+        'whatif': whatif_cache,
+    }
+    lines = []
+    for component, source in components.items():
+        if source is None:
+            continue
+        for key, value in source.stats().items():
+            name = f'explainify_{component}_{key}'
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines += [f'# TYPE {name} gauge', f'{name} {value}']
+            elif isinstance(value, dict) and value:
+                # e.g. job counts per status
+                lines.append(f'# TYPE {name} gauge')
+                lines += [f'{name}{{state="{label}"}} {count}' for label, count in value.items()]
+    return '\n'.join(lines) + '\n'
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return app.response_class(REGISTRY.render() + component_gauges(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy'}), 200
 
+@app.route('/health/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(explainer_cache.stats()), 200
+
+@app.route('/health/models', methods=['GET'])
+def model_stats():
+    return jsonify(model_registry.stats()), 200
+
+@app.route('/health/incremental', methods=['GET'])
+def incremental_stats():
+    if incremental_store is None:
+        return jsonify({'models': 0, 'stored_rows': 0}), 200
+    return jsonify(incremental_store.stats()), 200
+
+@app.route('/health/bundles', methods=['GET'])
+def bundle_stats():
+    return jsonify(get_bundle_store().stats()), 200
+
+@app.route('/health/uploads', methods=['GET'])
+def upload_stats():
+    return jsonify(upload_manager.stats()), 200
+
+@app.route('/health/sessions', methods=['GET'])
+def session_stats():
+    return jsonify(session_manager.stats()), 200
+
 if __name__ == '__main__':
-    # Create example models on startup
-    create_example_models()
-    app.run(debug=True, port=5000)
+    # Create example models on startup unless up-to-date artifacts already exist
+    ensure_example_models()
+    app.run(debug=True, port=int(os.environ.get('PORT', 5000)))
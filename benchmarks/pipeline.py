@@ -0,0 +1,254 @@
+"""Benchmark the load -> predict -> explain -> serve pipeline.
+
+For every model family and synthetic dataset shape, times (and records the
+peak traced memory of) each stage:
+  * load_model - ``ModelHandler`` deserializing the pickled model
+  * ingest     - ``XAIExplainer`` reading the CSV and encoding categoricals
+  * compile    - ``compile_explainer()`` (predictions and contributions)
+  * serve      - ``/api/predict`` and ``/api/sessions/<id>/importance``
+                 through the Flask test client, on a session registered
+                 without launching its Shapash dashboard
+
+Results are written as JSON: the median of ``--repeat`` runs of every stage,
+with the individual samples and their standard deviation. With
+``--baseline`` the median stage times are compared against a stored report
+and the run exits with status 1 when a stage is slower than the baseline by
+more than ``--tolerance`` and by more than twice the baseline's spread.
+Regenerate the baseline whenever a case changes.
+
+Usage: python benchmarks/pipeline.py [--rows 1000,10000] [--cols 10,50]
+           [--families linear,logistic,random_forest,kmeans] [--repeat 3]
+           [--output pipeline.json] [--baseline baseline.json] [--tolerance 0.25]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FAMILIES = ('linear', 'logistic', 'random_forest', 'kmeans')
+SERVE_REQUESTS = 50
+
+
+def make_dataset(n_rows, n_cols, family, seed=0):
+    """Synthetic features with ~10% text columns, a target and the encoded frame models are fitted on"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    n_text = max(1, n_cols // 10)
+    data = pd.DataFrame(rng.normal(size=(n_rows, n_cols - n_text)),
+                        columns=[f'num_{i}' for i in range(n_cols - n_text)])
+    for i in range(n_text):
+        data[f'cat_{i}'] = rng.choice([f'level_{j}' for j in range(8)], n_rows)
+
+    # Codes in sorted label order, as XAIExplainer's encoder produces them
+    encoded = data.copy()
+    for i in range(n_text):
+        encoded[f'cat_{i}'] = pd.Categorical(data[f'cat_{i}']).codes
+
+    signal = encoded.iloc[:, :min(5, n_cols)].to_numpy().sum(axis=1)
+    if family == 'linear':
+        data['target'] = signal + rng.normal(scale=0.1, size=n_rows)
+    else:
+        data['target'] = (signal > np.median(signal)).astype(int)
+    return data, encoded
+
+
+def make_model(family, X, y):
+    from sklearn.cluster import KMeans
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LinearRegression, LogisticRegression
+
+    if family == 'linear':
+        return LinearRegression().fit(X, y)
+    if family == 'logistic':
+        return LogisticRegression(max_iter=500).fit(X, y)
+    if family == 'random_forest':
+        return RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0, n_jobs=1).fit(X, y)
+    if family == 'kmeans':
+        return KMeans(n_clusters=4, n_init=1, random_state=0).fit(X)
+    raise ValueError(f"Unknown model family '{family}', expected one of {FAMILIES}")
+
+
+def measure(fn, trace_memory=True):
+    """Run ``fn`` once and return ``(result, seconds, peak traced bytes)``"""
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+        return result, time.perf_counter() - start, tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+
+def run_case(family, n_rows, n_cols, workdir, trace_memory=True):
+    """Time each pipeline stage once for one model family and dataset shape"""
+    import joblib
+    import app as explainify
+    from src.explainer import XAIExplainer
+    from src.model_handler import ModelHandler
+
+    data, encoded = make_dataset(n_rows, n_cols, family)
+    data_path = os.path.join(workdir, f'{family}_{n_rows}x{n_cols}.csv')
+    model_path = os.path.join(workdir, f'{family}_{n_rows}x{n_cols}.pkl')
+    data.to_csv(data_path, index=False)
+    joblib.dump(make_model(family, encoded, data['target']), model_path)
+
+    stages = {}
+    handler, seconds, peak = measure(lambda: ModelHandler(model_path), trace_memory)
+    stages['load_model'] = {'seconds': seconds, 'peak_bytes': peak}
+
+    explainer, seconds, peak = measure(lambda: XAIExplainer(handler, data_path), trace_memory)
+    stages['ingest'] = {'seconds': seconds, 'peak_bytes': peak, 'rows_per_second': n_rows / seconds}
+
+    compiled, seconds, peak = measure(explainer.compile_explainer, trace_memory)
+    if not compiled:
+        raise RuntimeError(explainer.compile_error)
+    explained = len(explainer.sample_index)
+    stages['compile'] = {'seconds': seconds, 'peak_bytes': peak, 'rows_per_second': explained / seconds}
+
+    # The endpoints only need the compiled explainer, not a running dashboard
+    session = explainify.session_manager.create(explainer, launch=False)
+    try:
+        client = explainify.app.test_client()
+        rows = data.drop(columns='target').iloc[:10].to_dict('records')
+
+        def serve():
+            for _ in range(SERVE_REQUESTS):
+                response = client.post('/api/predict', json={'session_id': session.id, 'rows': rows})
+                if response.status_code != 200:
+                    raise RuntimeError(response.get_json())
+            response = client.get(f'/api/sessions/{session.id}/importance')
+            if response.status_code != 200:
+                raise RuntimeError(response.get_json())
+
+        _, seconds, peak = measure(serve, trace_memory)
+        stages['serve'] = {'seconds': seconds, 'peak_bytes': peak, 'requests_per_second': (SERVE_REQUESTS + 1) / seconds}
+    finally:
+        explainify.session_manager.close(session.id)
+
+    return stages
+
+
+def summarize(runs):
+    """Median of every metric over repeated runs of a case, with the spread of the stage times"""
+    summary = {}
+    for stage in runs[0]:
+        summary[stage] = {}
+        for metric in runs[0][stage]:
+            values = [run[stage][metric] for run in runs if run[stage][metric] is not None]
+            summary[stage][metric] = round(statistics.median(values), 6) if values else None
+        samples = [run[stage]['seconds'] for run in runs]
+        summary[stage]['stdev'] = round(statistics.stdev(samples), 6) if len(samples) > 1 else None
+        summary[stage]['samples'] = [round(seconds, 6) for seconds in samples]
+    return summary
+
+
+def compare(report, baseline, tolerance, min_seconds=0.01):
+    """Stages whose median time grew by more than ``tolerance`` relative to the baseline.
+
+    Growth within twice the baseline's standard deviation is treated as noise.
+    """
+    previous = {case['name']: case for case in baseline.get('cases', [])}
+    regressions = []
+    for case in report['cases']:
+        old_case = previous.get(case['name'])
+        if old_case is None or 'stages' not in case or 'stages' not in old_case:
+            continue
+        for stage, metrics in case['stages'].items():
+            old = old_case['stages'].get(stage)
+            if old is None:
+                continue
+            new_seconds, old_seconds = metrics['seconds'], old['seconds']
+            # Sub-10ms stages are dominated by noise
+            noise = max(min_seconds, 2 * (old.get('stdev') or 0))
+            if new_seconds > old_seconds * (1 + tolerance) and new_seconds - old_seconds > noise:
+                regressions.append({
+                    'case': case['name'],
+                    'stage': stage,
+                    'baseline_seconds': old_seconds,
+                    'seconds': new_seconds,
+                    'ratio': round(new_seconds / old_seconds, 3) if old_seconds else None,
+                })
+    return regressions
+
+
+def versions():
+    import numpy
+    import pandas
+    import shap
+    import sklearn
+
+    return {'numpy': numpy.__version__, 'pandas': pandas.__version__,
+            'scikit-learn': sklearn.__version__, 'shap': shap.__version__}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1000,10000', help='comma-separated dataset row counts')
+    parser.add_argument('--cols', default='10,50', help='comma-separated dataset column counts')
+    parser.add_argument('--families', default=','.join(FAMILIES), help='comma-separated model families')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc, which slows Python-heavy stages')
+    parser.add_argument('--output', help='write the JSON report to this file as well as stdout')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before a stage is flagged')
+    args = parser.parse_args()
+
+    # Keep dashboards off the ports a running development server uses
+    os.environ.setdefault('DASHBOARD_PORT_START', '8150')
+
+    cases = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for family in args.families.split(','):
+            for n_rows in map(int, args.rows.split(',')):
+                for n_cols in map(int, args.cols.split(',')):
+                    name = f'{family}/{n_rows}x{n_cols}'
+                    print(f"Running {name}", file=sys.stderr)
+                    try:
+                        runs = [run_case(family, n_rows, n_cols, workdir, not args.no_memory)
+                                for _ in range(args.repeat)]
+                        cases.append({'name': name, 'family': family, 'rows': n_rows, 'cols': n_cols,
+                                      'stages': summarize(runs)})
+                    except Exception as e:
+                        print(f"Error benchmarking {name}: {str(e)}", file=sys.stderr)
+                        cases.append({'name': name, 'family': family, 'rows': n_rows, 'cols': n_cols,
+                                      'error': str(e)})
+
+    report = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': versions(),
+        'repeat': args.repeat,
+        'memory_traced': not args.no_memory,
+        'cases': cases,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(report, json.load(f), args.tolerance)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    if report.get('regressions'):
+        print(f"{len(report['regressions'])} stage(s) slower than the baseline", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Measure Explainify cold-start latency.
+
+Reports, over several fresh interpreter launches:
+  * import_seconds  - time to ``import app``
+  * ready_seconds   - time from process start until ``/health`` answers
+
+Usage: python benchmarks/startup.py [--runs 5] [--port 5099] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app; "
+    "print(time.perf_counter() - start)"
+)
+
+SERVE_SNIPPET = (
+    "import app; app.ensure_example_models(); "
+    "app.app.run(port={port}, debug=False, use_reloader=False)"
+)
+
+
+def measure_import():
+    """Seconds spent importing the app module in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_SNIPPET], cwd=ROOT, check=True,
+        capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_ready(port, timeout=60):
+    """Seconds from launching the server until /health returns 200"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVE_SNIPPET.format(port=port)], cwd=ROOT,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"Server did not become ready within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(samples):
+    return {
+        'median': round(statistics.median(samples), 4),
+        'min': round(min(samples), 4),
+        'max': round(max(samples), 4),
+        'samples': [round(s, 4) for s in samples],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--output', help='write the JSON report to this file as well as stdout')
+    args = parser.parse_args()
+
+    report = {
+        'python': sys.version.split()[0],
+        'import_seconds': summarize([measure_import() for _ in range(args.runs)]),
+        'ready_seconds': summarize([measure_ready(args.port) for _ in range(args.runs)]),
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
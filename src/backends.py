@@ -0,0 +1,200 @@
+import numpy as np
+import shap
+from sklearn.base import is_regressor
+from shapash.backend.base_backend import BaseBackend
+from shapash.backend.shap_backend import ShapBackend
+
+from src.clustering import ClusterAssigner, is_clustering_model
+
+
+class LinearBackend(BaseBackend):
+    """Exact contributions for linear and logistic models: coef * (x - mean(x)).
+
+    For regressors the contributions are in the output space; for logistic
+    models they are in log-odds, matching shap's LinearExplainer with an
+    independent masker. Regressors with a log link (Poisson, Gamma, most
+    Tweedie models) are left to other backends, since their contributions
+    would not add up to the prediction.
+    """
+
+    name = 'linear'
+
+    def __init__(self, model, preprocessing=None, masker=None):
+        super().__init__(model, preprocessing)
+        self.mean = None if masker is None else np.asarray(masker, dtype=np.float64)
+
+    @classmethod
+    def supports(cls, model):
+        if not type(model).__module__.startswith('sklearn.linear_model'):
+            return False
+        if not hasattr(model, 'coef_') or np.ndim(model.coef_) > 2:
+            return False
+        if is_regressor(model):
+            return (np.ndim(model.coef_) == 1 or model.coef_.shape[0] == 1) and cls.identity_link(model)
+        return hasattr(model, 'predict_proba')
+
+    @staticmethod
+    def identity_link(model):
+        """Whether a linear regressor predicts coef @ x + intercept rather than a link function of it"""
+        from sklearn.linear_model import GammaRegressor, PoissonRegressor, TweedieRegressor
+
+        if isinstance(model, (PoissonRegressor, GammaRegressor)):
+            return False
+        if isinstance(model, TweedieRegressor):
+            # 'auto' picks the identity link only for the normal distribution (power 0)
+            return model.link == 'identity' or (model.link == 'auto' and model.power <= 0)
+        return True
+
+    @staticmethod
+    def summarize(x):
+        """The only background statistic a linear model needs is the feature mean"""
+        return x.mean(axis=0).to_numpy(dtype=np.float64)
+
+    def run_explainer(self, x):
+        values = x.to_numpy(dtype=np.float64)
+        mean = values.mean(axis=0) if self.mean is None else self.mean
+        centered = values - mean
+        coef = np.atleast_2d(self.model.coef_)
+        if coef.shape[0] == 1:
+            contributions = centered * coef[0]
+        else:
+            # One slice per class: (rows, features, classes)
+            contributions = centered[:, :, np.newaxis] * coef.T[np.newaxis, :, :]
+        return {'contributions': contributions}
+
+
+class TreeBackend(BaseBackend):
+    """Path-dependent TreeSHAP for tree ensembles, which needs no background data"""
+
+    name = 'tree'
+
+    def __init__(self, model, preprocessing=None, masker=None):
+        super().__init__(model, preprocessing)
+        self.explainer = shap.TreeExplainer(model, feature_perturbation='tree_path_dependent')
+
+    @classmethod
+    def supports(cls, model):
+        try:
+            return shap.explainers.Tree.supports_model_with_masker(model, None)
+        except Exception:
+            return False
+
+    @staticmethod
+    def summarize(x):
+        return None
+
+    def run_explainer(self, x):
+        return {'contributions': self.explainer(x, check_additivity=False).values}
+
+
+class KernelBackend(BaseBackend):
+    """Model-agnostic KernelSHAP over a k-means summary of the data.
+
+    Coalitions are sampled, so results vary slightly between runs and between
+    serial and chunked computation.
+    """
+
+    name = 'kernel'
+    n_background = 10
+
+    def __init__(self, model, preprocessing=None, masker=None):
+        super().__init__(model, preprocessing)
+        predict = model.predict_proba if self._case == 'classification' else model.predict
+        self.explainer = shap.KernelExplainer(predict, masker)
+
+    @classmethod
+    def supports(cls, model):
+        return hasattr(model, 'predict')
+
+    @classmethod
+    def summarize(cls, x):
+        return shap.kmeans(x, min(cls.n_background, len(x)))
+
+    def run_explainer(self, x):
+        contributions = self.explainer.shap_values(x, silent=True)
+        if isinstance(contributions, list):
+            contributions = np.stack(contributions, axis=-1)
+        return {'contributions': contributions}
+
+
+class ClusterBackend(BaseBackend):
+    """Exact contributions to each row's membership of its assigned cluster.
+
+    The membership score is minus the squared distance to the cluster
+    centroid, a sum of one term per feature, so its Shapley values against
+    an independent background are closed-form:
+    E[(X_j - c_j)^2] - (x_j - c_j)^2. A positive value means the feature puts
+    the row closer to its cluster than a typical row. Noise rows are
+    explained against the nearest centroid. The background is the feature
+    means and variances plus the ``ClusterAssigner``, so clusters are
+    assigned without refitting the model.
+    """
+
+    name = 'cluster'
+    batch_size = 100000
+
+    def __init__(self, model, preprocessing=None, masker=None):
+        masker = masker or {}
+        self.assigner = masker.get('assigner') or ClusterAssigner(model)
+        self.mean = masker.get('mean')
+        self.var = masker.get('var')
+        # Shapash needs a model with predict(); the assigner is that model
+        super().__init__(self.assigner, preprocessing)
+
+    @classmethod
+    def supports(cls, model):
+        return is_clustering_model(model)
+
+    @staticmethod
+    def summarize(x):
+        values = x.to_numpy(dtype=np.float64)
+        return {'mean': values.mean(axis=0), 'var': values.var(axis=0)}
+
+    def run_explainer(self, x):
+        values = x.to_numpy(dtype=np.float64)
+        mean = values.mean(axis=0) if self.mean is None else self.mean
+        var = values.var(axis=0) if self.var is None else self.var
+        centroids = self.assigner.centroids
+        # E[(X_j - c_j)^2] for every centroid, shape (clusters, features)
+        expected = var + (mean - centroids) ** 2
+        positions = self.assigner.centroid_positions(values, self.assigner.predict(x))
+
+        contributions = np.empty_like(values)
+        for start in range(0, len(values), self.batch_size):
+            block = slice(start, start + self.batch_size)
+            nearest = positions[block]
+            contributions[block] = expected[nearest] - (values[block] - centroids[nearest]) ** 2
+        return {'contributions': contributions}
+
+
+# Tried in order by select_backend(); 'shap' keeps Shapash's generic shap.Explainer dispatch
+BACKENDS = {
+    'cluster': ClusterBackend,
+    'linear': LinearBackend,
+    'tree': TreeBackend,
+    'kernel': KernelBackend,
+    'shap': ShapBackend,
+}
+AUTO_ORDER = ('cluster', 'linear', 'tree', 'kernel')
+
+
+def select_backend(model, name='auto'):
+    """Return the backend class for ``model``, dispatching on the estimator family when ``name`` is 'auto'"""
+    if name != 'auto':
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown explanation backend '{name}', expected 'auto' or one of {tuple(BACKENDS)}")
+        if hasattr(BACKENDS[name], 'supports') and not BACKENDS[name].supports(model):
+            raise ValueError(f"The {name} explanation backend does not support {type(model).__name__}")
+        return BACKENDS[name]
+    for candidate in AUTO_ORDER:
+        if BACKENDS[candidate].supports(model):
+            return BACKENDS[candidate]
+    raise ValueError(f"No explanation backend supports {type(model).__name__}")
+
+
+def summarize_background(backend_cls, x):
+    """Background data the backend is built with, identical for serial and chunked runs"""
+    if hasattr(backend_cls, 'summarize'):
+        return backend_cls.summarize(x)
+    # The 100-row sample shap draws itself when handed the full dataset
+    return shap.utils.sample(x, 100, random_state=0)
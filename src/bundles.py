@@ -0,0 +1,179 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Only pyarrow is needed to serve a bundle; the model, pandas-heavy explainer
+# code and shap are never imported by the reading side
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+def _write_table(frame, path, compression):
+    frame = frame.copy(deep=False)
+    frame.columns = [str(column) for column in frame.columns]
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    pq.write_table(table, path, compression=compression)
+
+
+def export_bundle(explainer, bundle_dir, confidence=0.95, compression='zstd'):
+    """Write a compiled XAIExplainer's results as a directory of Parquet files.
+
+    The bundle holds the displayed feature values, predictions (and targets),
+    one float32 contributions table per class and the global importance, plus
+    a JSON manifest describing them. Returns the manifest.
+    """
+    import numpy as np
+
+    smart = explainer.explainer
+    if smart is None:
+        raise ValueError("Explainer must be compiled before exporting")
+
+    tmp_dir = f'{bundle_dir}.{threading.get_ident()}.tmp'
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        x = smart.x_init.reset_index(names='row_id')
+        _write_table(x, os.path.join(tmp_dir, 'features.parquet'), compression)
+
+        outputs = smart.y_pred.copy()
+        outputs.columns = ['prediction']
+        if smart.y_target is not None:
+            outputs['target'] = smart.y_target.to_numpy().ravel()
+        _write_table(outputs.reset_index(names='row_id'), os.path.join(tmp_dir, 'predictions.parquet'), compression)
+
+        contributions = smart.contributions if isinstance(smart.contributions, list) else [smart.contributions]
+        classes = [str(label) for label in smart._classes] if smart._classes is not None else [None]
+        contribution_files = []
+        for i, frame in enumerate(contributions):
+            name = f'contributions_{i}.parquet'
+            _write_table(frame.astype(np.float32), os.path.join(tmp_dir, name), compression)
+            contribution_files.append({'class': classes[i] if i < len(classes) else None, 'file': name})
+
+        importance = explainer.global_importance(confidence=confidence)
+        _write_table(importance.reset_index(names='feature'), os.path.join(tmp_dir, 'importance.parquet'), compression)
+
+        manifest = {
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'created': time.time(),
+            'case': smart._case,
+            'backend': smart.backend.name,
+            'rows': len(x),
+            'features': [str(column) for column in smart.x_init.columns],
+            'contributions': contribution_files,
+            'importance_confidence': confidence,
+            'compression': compression,
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        if os.path.exists(bundle_dir):
+            shutil.rmtree(bundle_dir)
+        os.replace(tmp_dir, bundle_dir)
+        return manifest
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+class Bundle:
+    """Read-only view of one exported bundle, tables decoded on first use"""
+
+    def __init__(self, bundle_dir):
+        self.bundle_dir = bundle_dir
+        with open(os.path.join(bundle_dir, MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        with self._lock:
+            if name not in self._tables:
+                self._tables[name] = pq.read_table(os.path.join(self.bundle_dir, name), memory_map=True)
+            return self._tables[name]
+
+    def importance(self):
+        return self.table('importance.parquet').to_pylist()
+
+    def rows(self, offset=0, limit=100, class_index=-1):
+        """Feature values, prediction and contributions for a slice of rows"""
+        contributions = self.manifest['contributions'][class_index]['file']
+        features = self.table('features.parquet').select(self.manifest['features']).slice(offset, limit).to_pylist()
+        outputs = self.table('predictions.parquet').slice(offset, limit).to_pylist()
+        values = self.table(contributions).slice(offset, limit).to_pylist()
+        return [
+            {**output, 'features': feature, 'contributions': value}
+            for feature, output, value in zip(features, outputs, values)
+        ]
+
+    def nbytes(self):
+        with self._lock:
+            return sum(table.nbytes for table in self._tables.values())
+
+
+class BundleStore:
+    """Exported bundles under ``bundle_dir``, with an LRU of opened bundles.
+
+    Serving a bundle only decodes its Parquet files, so many viewers can be
+    served from one small process without any model or explainer in memory.
+    """
+
+    def __init__(self, bundle_dir, max_open=32):
+        self.bundle_dir = bundle_dir
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.bundle_dir, exist_ok=True)
+
+    def path(self, bundle_id):
+        return os.path.join(self.bundle_dir, bundle_id)
+
+    def export(self, explainer, confidence=0.95):
+        """Export ``explainer`` under a new id and return ``(bundle_id, manifest)``"""
+        bundle_id = uuid.uuid4().hex
+        manifest = export_bundle(explainer, self.path(bundle_id), confidence=confidence)
+        return bundle_id, manifest
+
+    def get(self, bundle_id):
+        """Return the opened Bundle or None if no such bundle exists"""
+        with self._lock:
+            bundle = self._open.get(bundle_id)
+            if bundle is not None:
+                self._open.move_to_end(bundle_id)
+                return bundle
+
+        # Ids are generated hex strings; anything else cannot name a bundle
+        if not bundle_id.isalnum() or not os.path.exists(os.path.join(self.path(bundle_id), MANIFEST_NAME)):
+            return None
+        bundle = Bundle(self.path(bundle_id))
+        with self._lock:
+            bundle = self._open.setdefault(bundle_id, bundle)
+            self._open.move_to_end(bundle_id)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return bundle
+
+    def delete(self, bundle_id):
+        with self._lock:
+            self._open.pop(bundle_id, None)
+        path = self.path(bundle_id)
+        if not bundle_id.isalnum() or not os.path.isdir(path):
+            return False
+        shutil.rmtree(path)
+        return True
+
+    def stats(self):
+        with self._lock:
+            open_bundles = list(self._open.values())
+        return {
+            'bundles': len([name for name in os.listdir(self.bundle_dir) if name.isalnum()]),
+            'open_bundles': len(open_bundles),
+            'max_open': self.max_open,
+            'memory_bytes': sum(bundle.nbytes() for bundle in open_bundles),
+        }
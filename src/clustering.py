@@ -0,0 +1,137 @@
+import numpy as np
+
+# scikit-learn is imported inside the methods that need it, like the model handler
+
+
+def is_clustering_model(model):
+    from sklearn.base import ClusterMixin
+
+    return isinstance(model, ClusterMixin)
+
+
+def assigner_needs_data(model):
+    """Whether rows can only be assigned with the data the model was fit on, not from the model alone"""
+    if not hasattr(model, 'predict'):
+        # DBSCAN-style models keep their core samples; the others only their labels_
+        return not (hasattr(model, 'core_sample_indices_') and hasattr(model, 'components_'))
+    return not (hasattr(model, 'cluster_centers_') or hasattr(model, 'subcluster_centers_'))
+
+
+def _group_means(points, labels):
+    """Mean point of every label except noise (-1): ``(labels, means)``"""
+    keep = labels >= 0
+    groups, inverse = np.unique(labels[keep], return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(groups)).astype(np.float64)
+    means = np.column_stack([
+        np.bincount(inverse, weights=points[keep, j], minlength=len(groups)) / counts
+        for j in range(points.shape[1])
+    ])
+    return groups, means
+
+
+class ClusterAssigner:
+    """Assigns rows to the clusters of a fitted clustering model without ever refitting it.
+
+    Models whose clusters are the Voronoi cells of their centres (KMeans,
+    MiniBatchKMeans, MeanShift, AffinityPropagation) are assigned by a batched
+    nearest-centroid lookup; other inductive models (Birch, BisectingKMeans,
+    ...) use their own ``predict``. Non-inductive models are answered from a nearest-neighbour index built
+    once: DBSCAN-style models assign a row to the cluster of its nearest core
+    sample within ``eps`` (noise otherwise), and other models with only
+    ``labels_`` (AgglomerativeClustering, SpectralClustering, ...) to the
+    cluster of the nearest row of ``X``, the data they were fit on.
+
+    Every cluster also gets a centroid: the model's own centres when it has
+    them, otherwise the mean of the points that define the cluster.
+    """
+
+    def __init__(self, model, X=None, batch_size=100000):
+        from sklearn.cluster import AffinityPropagation, KMeans, MeanShift, MiniBatchKMeans
+        from sklearn.neighbors import NearestNeighbors
+
+        if not is_clustering_model(model):
+            raise ValueError(f"{type(model).__name__} is not a clustering model")
+        self.model = model
+        self.batch_size = batch_size
+        self.index = None
+        self.index_labels = None
+        self.radius = None
+        self.voronoi = isinstance(model, (KMeans, MiniBatchKMeans, MeanShift, AffinityPropagation))
+        points = labels = None
+
+        if not hasattr(model, 'predict'):
+            if not hasattr(model, 'labels_'):
+                raise ValueError(f"{type(model).__name__} has neither predict() nor fitted labels_")
+            if hasattr(model, 'core_sample_indices_') and hasattr(model, 'components_'):
+                if getattr(model, 'metric', 'euclidean') == 'precomputed':
+                    raise ValueError("Cannot assign new rows for a precomputed distance metric")
+                points = np.asarray(model.components_, dtype=np.float64)
+                labels = np.asarray(model.labels_)[model.core_sample_indices_]
+                self.radius = model.eps
+                self.index = NearestNeighbors(n_neighbors=1, metric=model.metric, p=model.p,
+                                              metric_params=model.metric_params)
+            else:
+                if X is None or len(X) != len(model.labels_):
+                    raise ValueError(
+                        f"{type(model).__name__} cannot assign new rows; explain it on the "
+                        f"{len(model.labels_)} rows it was fit on"
+                    )
+                points = np.asarray(X, dtype=np.float64)
+                labels = np.asarray(model.labels_)
+                self.index = NearestNeighbors(n_neighbors=1)
+            if len(points) == 0:
+                raise ValueError("The model found no clusters, only noise")
+            self.index.fit(points)
+            self.index_labels = labels
+
+        if hasattr(model, 'cluster_centers_'):
+            self.centroid_labels = np.arange(len(model.cluster_centers_))
+            self.centroids = np.asarray(model.cluster_centers_, dtype=np.float64)
+        elif hasattr(model, 'subcluster_centers_'):
+            # Birch: a cluster is the union of its subclusters
+            self.centroid_labels, self.centroids = _group_means(
+                np.asarray(model.subcluster_centers_, dtype=np.float64), np.asarray(model.subcluster_labels_)
+            )
+        elif points is not None:
+            self.centroid_labels, self.centroids = _group_means(points, labels)
+        elif X is not None:
+            self.centroid_labels, self.centroids = _group_means(np.asarray(X, dtype=np.float64), self.predict(X))
+        else:
+            raise ValueError(f"Cannot locate the clusters of {type(model).__name__} without its data")
+        if len(self.centroids) == 0:
+            raise ValueError("The model found no clusters, only noise")
+
+    def predict(self, X):
+        """Cluster label of every row, -1 for noise"""
+        if self.voronoi:
+            return self.centroid_labels[self.nearest_centroids(np.asarray(X, dtype=np.float64))]
+        if self.index is None:
+            return self.model.predict(X)
+        values = np.asarray(X, dtype=np.float64)
+        labels = np.empty(len(values), dtype=self.index_labels.dtype)
+        for start in range(0, len(values), self.batch_size):
+            distance, nearest = self.index.kneighbors(values[start:start + self.batch_size])
+            block = self.index_labels[nearest[:, 0]]
+            if self.radius is not None:
+                block = np.where(distance[:, 0] <= self.radius, block, -1)
+            labels[start:start + len(block)] = block
+        return labels
+
+    def nearest_centroids(self, values):
+        """Position in ``centroids`` of the centroid closest to each row"""
+        positions = np.empty(len(values), dtype=np.intp)
+        squared_norms = (self.centroids ** 2).sum(axis=1)
+        for start in range(0, len(values), self.batch_size):
+            block = values[start:start + self.batch_size]
+            # ||x - c||^2 up to the per-row ||x||^2 term, which does not change the argmin
+            positions[start:start + len(block)] = (squared_norms - 2 * block @ self.centroids.T).argmin(axis=1)
+        return positions
+
+    def centroid_positions(self, values, labels):
+        """Centroid each row is explained against: its cluster's, or the nearest one for noise"""
+        positions = np.searchsorted(self.centroid_labels, labels)
+        positions = np.minimum(positions, len(self.centroid_labels) - 1)
+        unmatched = self.centroid_labels[positions] != labels
+        if unmatched.any():
+            positions[unmatched] = self.nearest_centroids(values[unmatched])
+        return positions
@@ -0,0 +1,280 @@
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+STORE_FORMAT_VERSION = 1
+INDEX_NAME = 'index.json'
+ARRAY_NAME = 'contributions.npy'
+ROWS_NAME = 'rows.npy'
+# Shapash's per-row ranking of the contributions, see ContributionStore.ranked()
+RANKED_NAMES = {'var_dict': 'ranked_features.npy', 'contrib_sorted': 'ranked_contributions.npy',
+                'x_sorted': 'ranked_values.npy'}
+RANK_CHUNK_ROWS = 100000
+# Storage dtypes; the integer ones are linearly quantized per column
+STORE_DTYPES = ('float32', 'int16', 'int8')
+
+
+def _write_ranked(path, array, scales, x):
+    """Write each row's features ordered by decreasing |contribution|, as Shapash ranks them"""
+    n_classes, n_features, n_rows = array.shape
+    order_dtype = np.int16 if n_features <= np.iinfo(np.int16).max else np.int32
+    numeric = all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+                  for dtype in x.dtypes)
+    shapes = {'var_dict': order_dtype, 'contrib_sorted': np.float32}
+    if numeric:
+        shapes['x_sorted'] = np.result_type(*x.dtypes)
+    outputs = {
+        name: np.lib.format.open_memmap(os.path.join(path, RANKED_NAMES[name]), mode='w+', dtype=dtype,
+                                        shape=(n_classes, n_rows, n_features))
+        for name, dtype in shapes.items()
+    }
+    for c in range(n_classes):
+        for start in range(0, n_rows, RANK_CHUNK_ROWS):
+            block = np.asarray(array[c, :, start:start + RANK_CHUNK_ROWS], dtype=np.float32).T
+            if scales is not None:
+                block = block * np.asarray(scales[c], dtype=np.float32)
+            order = np.argsort(-np.abs(block), axis=1)
+            rows = slice(start, start + len(block))
+            outputs['var_dict'][c, rows] = order
+            outputs['contrib_sorted'][c, rows] = np.take_along_axis(block, order, axis=1)
+            if numeric:
+                values = x.iloc[rows].to_numpy(dtype=shapes['x_sorted'])
+                outputs['x_sorted'][c, rows] = np.take_along_axis(values, order, axis=1)
+    for output in outputs.values():
+        output.flush()
+    return list(outputs)
+
+
+def write_store(path, contributions, dtype='float32', x=None):
+    """Write contribution frames (one per class) as a column-major array plus a JSON column index.
+
+    The array has shape (classes, features, rows), so every feature column
+    of every class is contiguous on disk and can be read on its own. Integer
+    dtypes store ``round(value / scale)`` with one scale per column, chosen
+    so the column's largest magnitude maps to the dtype's maximum. With the
+    displayed features ``x``, the per-row ranking Shapash keeps alongside
+    the contributions is stored as well.
+    """
+    if dtype not in STORE_DTYPES:
+        raise ValueError(f"Unknown contribution store dtype '{dtype}', expected one of {STORE_DTYPES}")
+    frames = contributions if isinstance(contributions, list) else [contributions]
+    features = list(frames[0].columns)
+    n_rows = len(frames[0])
+    quantized = np.issubdtype(np.dtype(dtype), np.integer)
+    limit = np.iinfo(dtype).max if quantized else None
+
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    os.makedirs(tmp_path, exist_ok=True)
+    try:
+        array = np.lib.format.open_memmap(os.path.join(tmp_path, ARRAY_NAME), mode='w+', dtype=dtype,
+                                          shape=(len(frames), len(features), n_rows))
+        scales = []
+        for c, frame in enumerate(frames):
+            class_scales = []
+            for j in range(len(features)):
+                column = frame.iloc[:, j].to_numpy(dtype=np.float64)
+                if quantized:
+                    peak = np.abs(column).max() if n_rows else 0.0
+                    scale = peak / limit if peak > 0 else 1.0
+                    array[c, j] = np.rint(column / scale)
+                    class_scales.append(float(scale))
+                else:
+                    array[c, j] = column
+            scales.append(class_scales)
+        array.flush()
+        ranked = [] if x is None else _write_ranked(tmp_path, array, scales if quantized else None, x)
+        del array
+
+        rows = frames[0].index
+        index = {
+            'format_version': STORE_FORMAT_VERSION,
+            'dtype': dtype,
+            'rows': n_rows,
+            'features': [str(feature) for feature in features],
+            'classes': len(frames),
+            'multiclass': isinstance(contributions, list),
+            'scales': scales if quantized else None,
+            'row_labels': None,
+            'ranked': ranked,
+        }
+        if pd.api.types.is_integer_dtype(rows):
+            np.save(os.path.join(tmp_path, ROWS_NAME), rows.to_numpy(dtype=np.int64))
+        else:
+            index['row_labels'] = [str(label) for label in rows]
+        with open(os.path.join(tmp_path, INDEX_NAME), 'w') as f:
+            json.dump(index, f)
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+
+def trim_stores(root, max_bytes):
+    """Delete the least recently used stores under ``root`` until they fit in ``max_bytes``.
+
+    Sessions that still map a deleted store keep reading it; the space is
+    only released once they close.
+    """
+    stores = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            size = sum(os.path.getsize(os.path.join(path, entry)) for entry in os.listdir(path))
+            stores.append((os.path.getmtime(os.path.join(path, INDEX_NAME)), size, path))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    total = sum(size for _, size, _ in stores)
+    for _, size, path in sorted(stores):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+class ContributionStore:
+    """Read-only, memory-mapped view of a store written by ``write_store``.
+
+    The array is only mapped on first use and pages are read as columns are
+    touched, so processes explaining the same model and data share one copy
+    through the page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_NAME)) as f:
+            self.index = json.load(f)
+        if self.index.get('format_version') != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported contribution store format in {path}")
+        self.features = self.index['features']
+        self._positions = {feature: j for j, feature in enumerate(self.features)}
+        self._array = None
+        self._rows = None
+        self._lock = threading.Lock()
+        self.heap_bytes = 0
+        # Touching the index marks the store as recently used for trim_stores()
+        os.utime(os.path.join(path, INDEX_NAME))
+
+    @property
+    def quantized(self):
+        return self.index['scales'] is not None
+
+    @property
+    def array(self):
+        with self._lock:
+            if self._array is None:
+                self._array = np.load(os.path.join(self.path, ARRAY_NAME), mmap_mode='r')
+            return self._array
+
+    @property
+    def rows(self):
+        """Row labels of the explained rows"""
+        with self._lock:
+            if self._rows is None:
+                if self.index['row_labels'] is not None:
+                    self._rows = pd.Index(self.index['row_labels'])
+                else:
+                    self._rows = pd.Index(np.load(os.path.join(self.path, ROWS_NAME)))
+            return self._rows
+
+    def _class(self, class_index):
+        if not -self.index['classes'] <= class_index < self.index['classes']:
+            raise ValueError(f"class must index one of {self.index['classes']} contribution tables")
+        return class_index % self.index['classes']
+
+    def _feature(self, feature):
+        if feature not in self._positions:
+            raise ValueError(f"Unknown feature: {feature}")
+        return self._positions[feature]
+
+    def _decode(self, values, c, j):
+        """float32 contributions from stored values of column ``j`` of class ``c``"""
+        if not self.quantized:
+            return values
+        return values.astype(np.float32) * np.float32(self.index['scales'][c][j])
+
+    def column(self, feature, class_index=-1, positions=None):
+        """Contributions of one feature, reading only that column"""
+        c, j = self._class(class_index), self._feature(feature)
+        values = self.array[c, j] if positions is None else self.array[c, j, positions]
+        return self._decode(values, c, j)
+
+    def frame(self, class_index=-1, features=None, positions=None):
+        """Contributions of ``features`` (all by default) for row ``positions`` as float32"""
+        c = self._class(class_index)
+        features = self.features if features is None else features
+        rows = self.rows if positions is None else self.rows[positions]
+        return pd.DataFrame({feature: self.column(feature, c, positions) for feature in features}, index=rows)
+
+    def frames(self):
+        """Contributions in the form ``SmartExplainer.contributions`` holds them.
+
+        float32 stores are wrapped without copying, so the frames stay backed
+        by the mapped file; quantized ones are decoded into memory.
+        """
+        frames = []
+        for c in range(self.index['classes']):
+            if self.quantized:
+                frame = self.frame(c)
+                self.heap_bytes += int(frame.memory_usage(index=False).sum())
+            else:
+                # (features, rows) -> (rows, features) view; pandas keeps the block as is
+                frame = pd.DataFrame(self.array[c].T, index=self.rows, columns=self.features, copy=False)
+            frames.append(frame)
+        return frames if self.index['multiclass'] else frames[0]
+
+    def ranked(self, x):
+        """Shapash's ``SmartExplainer.data``: per-row sorted contributions, feature order and values.
+
+        Mapped from the store when it was written with them; the sorted values
+        of non-numeric features are rebuilt in memory from ``x``.
+        """
+        if not self.index.get('ranked'):
+            return None
+        columns = {
+            'var_dict': [f'feature_{i}' for i in range(len(self.features))],
+            'contrib_sorted': [f'contribution_{i}' for i in range(len(self.features))],
+            'x_sorted': [f'feature_{i}' for i in range(len(self.features))],
+        }
+        data = {}
+        for name in ('contrib_sorted', 'x_sorted', 'var_dict'):
+            frames = []
+            for c in range(self.index['classes']):
+                if name in self.index['ranked']:
+                    array = np.load(os.path.join(self.path, RANKED_NAMES[name]), mmap_mode='r')[c]
+                else:
+                    order = np.load(os.path.join(self.path, RANKED_NAMES['var_dict']), mmap_mode='r')[c]
+                    array = np.take_along_axis(x.to_numpy(), np.asarray(order, dtype=np.intp), axis=1)
+                    self.heap_bytes += array.nbytes
+                frames.append(pd.DataFrame(array, index=self.rows, columns=columns[name], copy=False))
+            data[name] = frames if self.index['multiclass'] else frames[0]
+        return data
+
+    def top_rows(self, feature, k=10, class_index=-1):
+        """Positions and contributions of the ``k`` rows with the largest |contribution| of ``feature``"""
+        values = self.column(feature, class_index)
+        k = min(k, len(values))
+        if k == 0:
+            return np.array([], dtype=np.intp), np.array([], dtype=np.float32)
+        magnitude = np.abs(values)
+        top = np.argpartition(-magnitude, k - 1)[:k]
+        top = top[np.argsort(-magnitude[top], kind='stable')]
+        return top, np.asarray(values[top])
+
+    def top_features(self, position, k=10, class_index=-1, features=None):
+        """The ``k`` features with the largest |contribution| for the row at ``position``"""
+        c = self._class(class_index)
+        features = self.features if features is None else features
+        values = np.array([float(self.column(feature, c, [position])[0]) for feature in features])
+        order = np.argsort(-np.abs(values), kind='stable')[:k]
+        return [(features[i], values[i]) for i in order]
+
+    def nbytes(self):
+        """Size of the mapped array file (resident only as far as pages have been read)"""
+        return os.path.getsize(os.path.join(self.path, ARRAY_NAME))
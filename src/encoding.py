@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+def categorical_columns(frame):
+    """Columns holding labels rather than numbers: categoricals and text"""
+    return [
+        column for column, dtype in frame.dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype)
+        or pd.api.types.is_object_dtype(dtype)
+    ]
+
+
+# Version of the JSON files written by EncoderStore; unversioned files hold bare label lists
+ENCODER_FORMAT_VERSION = 2
+
+
+def _label_to_json(label):
+    """``[type, value]`` pair that ``_label_from_json`` turns back into an equal label of the same type"""
+    if isinstance(label, np.generic):
+        label = label.item()
+    if isinstance(label, str):
+        return ['str', label]
+    if isinstance(label, bool):
+        return ['bool', label]
+    if isinstance(label, int):
+        return ['int', label]
+    if isinstance(label, float):
+        # Hex keeps every bit, including infinities, which JSON numbers cannot
+        return ['float', label.hex()]
+    if isinstance(label, pd.Timestamp):
+        return ['timestamp', label.isoformat()]
+    if isinstance(label, pd.Timedelta):
+        return ['timedelta', label.value]
+    raise ValueError(f"Cannot store a {type(label).__name__} category label")
+
+
+def _label_from_json(pair):
+    kind, value = pair
+    if kind == 'float':
+        return float.fromhex(value)
+    if kind == 'timestamp':
+        return pd.Timestamp(value)
+    if kind == 'timedelta':
+        return pd.Timedelta(value)
+    return value
+
+
+def labels_to_json(labels):
+    """JSON form of a label index that keeps each label's type and the index dtype"""
+    return {'dtype': str(labels.dtype), 'labels': [_label_to_json(label) for label in labels.tolist()]}
+
+
+def labels_from_json(stored):
+    labels = [_label_from_json(pair) for pair in stored['labels']]
+    try:
+        return pd.Index(labels, dtype=stored['dtype'])
+    except (TypeError, ValueError):
+        return pd.Index(labels, dtype=object)
+
+
+def schema_key(frame, model_digest=None):
+    """Hash of the column names, which of them are categorical and the model they are encoded for"""
+    categorical = set(categorical_columns(frame))
+    schema = [[str(column), column in categorical] for column in frame.columns]
+    return hashlib.sha256(json.dumps([model_digest, schema]).encode()).hexdigest()
+
+
+class CategoricalEncoder:
+    """Maps categorical columns to stable int32 codes and back.
+
+    Labels are sorted on first fit (the order LabelEncoder would use); labels
+    seen in later datasets are appended, so existing codes never change.
+    Columns that already are pandas categoricals are recoded from their
+    categories alone, without hashing every row. Missing values encode to -1.
+    """
+
+    def __init__(self, categories=None):
+        self.categories = {column: pd.Index(labels) for column, labels in (categories or {}).items()}
+
+    def fit(self, frame):
+        """Learn labels not seen before; returns True when the mapping grew"""
+        changed = False
+        for column in categorical_columns(frame):
+            values = frame[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Only labels that actually occur, straight from the codes
+                labels = values.cat.categories[np.unique(values.cat.codes[values.cat.codes >= 0])]
+            else:
+                labels = pd.Index(values.dropna().unique())
+            known = self.categories.get(column)
+            if known is None:
+                self.categories[column] = labels.sort_values()
+                changed = True
+                continue
+            new = labels.difference(known, sort=False)
+            if len(new):
+                self.categories[column] = known.append(new.sort_values())
+                changed = True
+        return changed
+
+    def transform(self, frame):
+        """Copy of ``frame`` with every fitted column replaced by its codes.
+
+        Missing values encode to -1; a label that was never fitted raises a
+        ValueError naming the column and the labels.
+        """
+        encoded = frame.copy(deep=False)
+        for column, labels in self.categories.items():
+            if column not in encoded.columns:
+                continue
+            values = encoded[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                codes = values.cat.set_categories(labels).cat.codes
+            else:
+                codes = labels.get_indexer(values)
+            codes = np.asarray(codes, dtype=np.int32)
+            unknown = (codes < 0) & values.notna().to_numpy()
+            if unknown.any():
+                found = pd.unique(np.asarray(values)[unknown])
+                shown = ', '.join(repr(label) for label in found[:10]) + (', ...' if len(found) > 10 else '')
+                raise ValueError(f"Unknown labels for feature '{column}': {shown}")
+            encoded[column] = codes
+        return encoded
+
+    def decode(self, column, codes):
+        """Labels for ``codes`` of ``column`` (missing for -1)"""
+        return pd.Categorical.from_codes(np.asarray(codes), categories=self.categories[column])
+
+    def shapash_preprocessing(self):
+        """The mappings in Shapash's dict preprocessing format, so dashboards show labels"""
+        return [
+            {
+                'col': column,
+                'mapping': pd.Series(np.arange(len(labels), dtype=np.int32), index=labels),
+                'data_type': 'object',
+            }
+            for column, labels in self.categories.items()
+        ]
+
+
+class EncoderStore:
+    """Fitted encoders per model and dataset schema, kept in memory and in ``cache_dir``.
+
+    Every dataset explained with the same model and columns shares one
+    encoder, so a re-upload is encoded with the codes (and therefore the model
+    inputs) of the first one, and codes never depend on what other models
+    were explained with. The first dataset's labels are sorted, the order
+    LabelEncoder gives when the model is trained on it; labels only later
+    datasets bring are appended after them. Labels are stored with their
+    types, so integer, float, boolean and timestamp labels come back equal to
+    the ones that were fitted.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._encoders = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def _load(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return CategoricalEncoder()
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+            if stored.get('format_version') != ENCODER_FORMAT_VERSION:
+                # Written before labels carried their types, when only string labels survived
+                return CategoricalEncoder(stored)
+            return CategoricalEncoder({
+                column: labels_from_json(labels) for column, labels in stored['categories'].items()
+            })
+        except Exception as e:
+            print(f"Discarding unreadable encoder {path}: {str(e)}")
+            return CategoricalEncoder()
+
+    def _save(self, key, encoder):
+        path = self._path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            stored = {
+                'format_version': ENCODER_FORMAT_VERSION,
+                'categories': {column: labels_to_json(labels) for column, labels in encoder.categories.items()},
+            }
+            with open(tmp_path, 'w') as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            # The encoder still works for this process; it is just not shared with the next one
+            print(f"Could not persist encoder: {str(e)}")
+
+    def get(self, frame, model_digest):
+        """Encoder for ``frame``'s schema under the model hashed ``model_digest``, extended with any new labels"""
+        key = schema_key(frame, model_digest)
+        with self._lock:
+            encoder = self._encoders.get(key)
+            if encoder is None:
+                encoder = self._encoders[key] = self._load(key)
+            if encoder.fit(frame):
+                self._save(key, encoder)
+            return encoder
@@ -1,83 +1,490 @@
 import os
 import sys
+import copy
+import time
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import LabelEncoder
 
 # Add local Shapash to Python path
 shapash_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'shapash')
 if shapash_path not in sys.path:
     sys.path.append(shapash_path)
 
-from shapash.explainer.smart_explainer import SmartExplainer
-import dash
+from src.parallel import compute_contributions
+from src.backends import select_backend, summarize_background
+from src.sampling import sample_rows, importance_with_confidence, importance_from_sums
+from src.ingest import load_dataset
+from src.explainer_cache import file_digest, compile_key
+from src.incremental import background_digest
+from src.jobs import JobCancelled
+from src.contribution_store import ContributionStore, INDEX_NAME, trim_stores, write_store
+from src.encoding import CategoricalEncoder
+from src.metrics import REGISTRY
+from src.plotdata import PlotData
+from src.permutation import permutation_importance
+
+def _no_checkpoint():
+    """Default compile checkpoint, which never stops the compile"""
 
 class XAIExplainer:
-    def __init__(self, model_handler, data_path):
-        """Initialize the XAI explainer with a model and data"""
+    def __init__(self, model_handler, data_path, cache=None, n_jobs=1, chunk_size=10000,
+                 sample_size=None, sampling='uniform', random_state=42, dataset_cache_dir=None,
+                 dataset_cache_bytes=None, backend='auto', incremental_store=None, encoder_store=None, lazy=False,
+                 lazy_rows=1000, row_cache_size=10000, point_budget=2000, plot_bins=32, plot_grid_size=64,
+                 contribution_store_dir=None, contribution_dtype='float32', contribution_store_bytes=8 * 1024 ** 3):
+        """Initialize the XAI explainer with a model and data.
+
+        With ``n_jobs`` other than 1, datasets larger than ``chunk_size`` rows have
+        their contributions computed in chunks across a process pool. With a
+        ``sample_size``, only that many rows are explained, drawn uniformly or
+        stratified by target or prediction (see ``src.sampling``). ``data_path`` may
+        be CSV, Parquet, Feather or Arrow IPC; CSVs are converted once into
+        ``dataset_cache_dir`` when it is given, which is kept under
+        ``dataset_cache_bytes``. ``backend`` names an explanation
+        backend from ``src.backends`` or 'auto' to pick one by model family. With an
+        ``incremental_store`` (see ``src.incremental``), rows this model has already
+        explained reuse their stored predictions and contributions. Categorical
+        features are encoded by the ``encoder_store`` encoder for the dataset's
+        schema when one is given (see ``src.encoding``). In ``lazy`` mode only a
+        sample of at most ``lazy_rows`` rows is compiled for the global views;
+        other rows are explained on demand by ``explain_row`` and
+        ``explain_features``, memoized in an LRU of ``row_cache_size`` entries.
+        Contribution plots are pre-binned at compile time into ``plot_bins``
+        quantile bins and ``plot_grid_size``-square density grids, and no plot
+        ships more than ``point_budget`` raw points (see ``src.plotdata``). With a
+        ``contribution_store_dir``, compiled contributions are moved to a
+        memory-mapped ``contribution_dtype`` store there (at most
+        ``contribution_store_bytes`` of stores are kept; see
+        ``src.contribution_store``).
+        """
         self.model_handler = model_handler
-        self.data = pd.read_csv(data_path)
-        self.target_column = 'target' if 'target' in self.data.columns else self.data.columns[-1]
-        self.features = self.data.drop(columns=[self.target_column])
-        self.target = pd.Series(self.data[self.target_column], name=self.target_column)
+        self.data_path = data_path
+        self.cache = cache
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+        self.lazy = lazy
+        if lazy and (sample_size is None or sample_size > lazy_rows):
+            sample_size = lazy_rows
+        self.sample_size = sample_size
+        self.row_cache_size = row_cache_size
+        self.point_budget = point_budget
+        self.plot_bins = plot_bins
+        self.plot_grid_size = plot_grid_size
+        self.plot_data = None
+        self.contribution_store_dir = contribution_store_dir
+        self.contribution_dtype = contribution_dtype
+        self.contribution_store_bytes = contribution_store_bytes
+        self.contribution_store = None
+        self._row_cache = OrderedDict()
+        self._row_cache_lock = threading.Lock()
+        self.sampling = sampling
+        self.random_state = random_state
+        self.sample_index = None
+        self.backend = backend
+        self.backend_report = None
+        self.incremental_store = incremental_store
+        self.importance_sums = None
+        self.explainer = None
+        self.compile_error = None
+        self._checkpoint = _no_checkpoint
+        # One compact frame; features and target share its column buffers
+        with REGISTRY.span('read_dataset') as span:
+            self.data = load_dataset(data_path, cache_dir=dataset_cache_dir, cache_bytes=dataset_cache_bytes)
+            span.rows, span.features = self.data.shape
+        self.target_column = self.detect_target_column()
+        if self.target_column is None:
+            self.features, self.target = self.data, None
+        else:
+            self.features = self.data.drop(columns=[self.target_column])
+            self.target = self.data[self.target_column]
         
         # Handle categorical features
-        self.label_encoders = {}
-        self.encode_categorical_features()
+        self.encoder = None
+        self.encode_categorical_features(encoder_store)
         
-    def encode_categorical_features(self):
-        """Encode categorical features in the dataset"""
+        # Clustering models that cannot predict are indexed from the data they were fit on
+        self.model_handler = self.model_handler.with_data(self.features)
         
-        for column in self.features.columns:
-            if self.features[column].dtype == 'object':
-                le = LabelEncoder()
-                self.features[column] = le.fit_transform(self.features[column])
-                self.label_encoders[column] = le
+    def detect_target_column(self):
+        """The 'target' column, else the last column unless the model was fit on every column"""
+        if 'target' in self.data.columns:
+            return 'target'
+        model = self.model_handler.model
+        names = getattr(model, 'feature_names_in_', None)
+        if names is not None:
+            if set(self.data.columns) <= set(names):
+                return None
+        elif self.model_handler.model_type == 'clustering' or \
+                getattr(model, 'n_features_in_', None) == self.data.shape[1]:
+            # Unsupervised data usually has no target column
+            return None
+        return self.data.columns[-1]
+        
+    def encode_categorical_features(self, encoder_store=None):
+        """Replace categorical features with the integer codes the model and explainer consume"""
+        with REGISTRY.span('encode') as span:
+            if encoder_store is not None:
+                self.encoder = encoder_store.get(self.features, file_digest(self.model_handler.model_path))
+            else:
+                self.encoder = CategoricalEncoder()
+                self.encoder.fit(self.features)
+            self.features = self.encoder.transform(self.features)
+            span.rows, span.features = len(self.features), len(self.encoder.categories)
                 
-    def compile_explainer(self):
-        """Compile the explainer with the current model and data"""
+    def cache_settings(self):
+        """Settings that change the compiled result and therefore belong in the cache key"""
+        return {
+            'backend': self.backend,
+            'target_column': self.target_column,
+            'sample_size': self.sample_size,
+            'sampling': self.sampling if self.sample_size is not None else None,
+            'random_state': self.random_state if self.sample_size is not None else None,
+        }
+
+    def compile_explainer(self, checkpoint=None):
+        """Compile the explainer with the current model and data.
+
+        ``checkpoint()`` is called between compile stages and after every
+        parallel chunk of contributions; a JobCancelled it raises stops the
+        compile and is re-raised. A single in-process contribution call is not
+        interrupted.
+        """
+        self._checkpoint = checkpoint or _no_checkpoint
         try:
-            # Drop any rows with NaN values
-            data = self.data.dropna()
-            
-            # Create a features dictionary
-            features_dict = {col: col for col in data.columns if col != 'target'}
+            with REGISTRY.span('compile_explainer'):
+                self._compile()
+                self._checkpoint()
+                with REGISTRY.span('plot_summary') as span:
+                    self.plot_data = PlotData(
+                        self.explainer.x_init, self.explainer.contributions, n_bins=self.plot_bins,
+                        grid_size=self.plot_grid_size, point_budget=self.point_budget
+                    )
+                    span.rows, span.features = self.explainer.x_init.shape
+            print("Shapash explainer compiled successfully!")
+            return True
             
+        except JobCancelled:
+            print("Explainer compilation cancelled")
+            self.explainer = None
+            self.plot_data = None
+            self.contribution_store = None
+            raise
+        except Exception as e:
+            print(f"Error compiling explainer: {str(e)}")
+            self.compile_error = str(e)
+            self.explainer = None
+            self.plot_data = None
+            self.contribution_store = None
+            return False
+        finally:
+            self._checkpoint = _no_checkpoint
+        
+    def complete_rows(self):
+        """Features and target of the rows without NaN values, without copying when there are none"""
+        complete = self.data.notna().all(axis=1)
+        if complete.all():
+            return self.features, self.target
+        return self.features[complete], None if self.target is None else self.target[complete]
+        
+    def _compile(self):
+        """compile_explainer() body, timed as one stage and split into sub-stages"""
+        from shapash.explainer.smart_explainer import SmartExplainer
+
+        cache_key = None
+        if self.cache is not None:
+            with REGISTRY.span('cache_lookup'):
+                cache_key = self.cache.make_key(self.model_handler.model_path, self.data_path, self.cache_settings())
+                cached = self.cache.get(cache_key)
+            if cached is not None and cached.contributions is None and not self._store_exists(cache_key):
+                # Cached without its contributions, and their store has since been trimmed
+                cached = None
+            if cached is not None:
+                self.explainer = cached
+                self.sample_index = cached.x_init.index
+                self.backend_report = {'backend': cached.backend.name, 'seconds': 0.0, 'cached': True}
+                self.map_contributions(cache_key)
+                print("Loaded compiled Shapash explainer from cache")
+                return
+
+        self._checkpoint()
+        X, y = self.complete_rows()
+        # Shapash only accepts 32/64-bit numeric targets, the compact reader may narrow them
+        if y is not None and (pd.api.types.is_bool_dtype(y) or
+                              (pd.api.types.is_integer_dtype(y) and y.dtype.itemsize < 4)):
+            y = y.astype(np.int32)
+        
+        # Explain a bounded subsample of very large datasets
+        if self.sample_size is not None and len(X) > self.sample_size:
+            with REGISTRY.span('sample') as span:
+                strata = None
+                if self.sampling == 'target':
+                    if y is None:
+                        raise ValueError("Target-stratified sampling needs a target column")
+                    strata = y
+                elif self.sampling == 'prediction':
+                    strata = self.model_handler.predict(X)
+                self.sample_index = sample_rows(X, self.sample_size, self.sampling, strata, self.random_state)
+                X = X.loc[self.sample_index]
+                y = None if y is None else y.loc[self.sample_index]
+                span.rows = len(X)
+        else:
+            self.sample_index = X.index
+        
+        # Pick the cheapest exact method for the model family
+        backend_cls = select_backend(self.model_handler.model, self.backend)
+        
+        self._checkpoint()
+        background = summarize_background(backend_cls, X)
+        
+        def make_backend():
+            if self.model_handler.model_type == 'clustering' and isinstance(background, dict):
+                # Assign clusters through the handler's index rather than the model
+                background['assigner'] = self.model_handler.cluster_assigner()
+            return backend_cls(model=self.model_handler.model, masker=background), background
+        
+        start = time.perf_counter()
+        if self.incremental_store is not None:
+            # Contributions are relative to the background, so each background keeps its own rows
+            key = (file_digest(self.model_handler.model_path), tuple(X.columns), backend_cls.name,
+                   background_digest(background))
+            contributions, predictions, backend, self.importance_sums, report = self.incremental_store.explain(
+                key, X, make_backend, self.predict_and_explain
+            )
+        else:
+            backend, background = make_backend()
+            contributions, predictions = self.predict_and_explain(backend, background, X)
+            report = {}
+        y_pred = pd.Series(predictions, index=X.index, name='prediction')
+        self.backend_report = {
+            'backend': backend.name,
+            'seconds': round(time.perf_counter() - start, 4),
+            'rows': len(X),
+            'parallel': self.n_jobs != 1 and len(X) > self.chunk_size,
+            **report,
+        }
+        print(f"Computed contributions with the {backend.name} backend in {self.backend_report['seconds']}s")
+        
+        self._checkpoint()
+        # Create a features dictionary
+        features_dict = {col: col for col in X.columns}
+        
+        with REGISTRY.span('shapash_compile') as span:
             # Initialize SmartExplainer with proper feature names
             self.explainer = SmartExplainer(
-                model=self.model_handler.model,
+                # The backend's model: for clustering models, the assigner that predicts without refitting
+                model=backend.model,
+                backend=backend,
                 features_dict=features_dict,
-                preprocessing=None  # We've already preprocessed the data
+                # Lets Shapash show category labels instead of codes
+                preprocessing=self.encoder.shapash_preprocessing() or None
             )
             
-            # Split features and target
-            X = data.drop('target', axis=1)
-            y = data['target']
-            
-            # Get predictions
-            y_pred = pd.Series(self.model_handler.predict(X), name='prediction')
-            
             # Compile the explainer
             self.explainer.compile(
                 x=X,
+                contributions=contributions,
                 y_pred=y_pred,
-                y_target=y  # Pass the target variable
+                y_target=y  # None for datasets without a target
             )
-            
-            print("Shapash explainer compiled successfully!")
-            return True
-            
-        except Exception as e:
-            print(f"Error compiling explainer: {str(e)}")
-            return False
+            span.rows, span.features = X.shape
+        
+        # Before caching, so cached explainers share the mapped contributions too
+        self._checkpoint()
+        self.map_contributions(cache_key)
+        
+        if cache_key is not None:
+            with REGISTRY.span('cache_store'):
+                self.cache.put(cache_key, self._cache_entry())
+
+    def _store_path(self, key):
+        """Directory of the contribution store for a compile key, None without a store"""
+        if self.contribution_store_dir is None:
+            return None
+        return os.path.join(self.contribution_store_dir, f'{key}.{self.contribution_dtype}')
+
+    def _store_exists(self, key):
+        """Whether the contribution store for a compile key is on disk"""
+        path = self._store_path(key)
+        return path is not None and os.path.exists(os.path.join(path, INDEX_NAME))
+
+    def _cache_entry(self):
+        """The compiled explainer as cached, without the frames mapped from the contribution store
+
+        Pickling them would copy the whole store into the cache entry; hits map
+        them from the store again instead.
+        """
+        if self.contribution_store is None:
+            return self.explainer
+        entry = copy.copy(self.explainer)
+        entry.contributions = None
+        if self.contribution_store.index.get('ranked'):
+            entry.data = None
+        return entry
+
+    def map_contributions(self, key=None):
+        """Replace the compiled contribution frames with views of a memory-mapped store"""
+        if self.contribution_store_dir is None:
+            return
+        with REGISTRY.span('contribution_store') as span:
+            if key is None:
+                key = compile_key(self.model_handler.model_path, self.data_path, self.cache_settings())
+            path = self._store_path(key)
+            # Stores are content-addressed, so one written by another session or process is reused
+            written = not os.path.exists(os.path.join(path, INDEX_NAME))
+            if written:
+                os.makedirs(self.contribution_store_dir, exist_ok=True)
+                write_store(path, self.explainer.contributions, self.contribution_dtype, x=self.explainer.x_init)
+            self.contribution_store = ContributionStore(path)
+            self.explainer.contributions = self.contribution_store.frames()
+            # Shapash also keeps the raw array it was compiled from and a per-row
+            # ranking of the contributions; the store replaces both copies
+            self.explainer.explain_data = None
+            ranked = self.contribution_store.ranked(self.explainer.x_init)
+            if ranked is not None:
+                self.explainer.data = ranked
+            if written:
+                trim_stores(self.contribution_store_dir, self.contribution_store_bytes)
+            span.rows, span.features = len(self.contribution_store.rows), len(self.contribution_store.features)
+
+    def predict_and_explain(self, backend, background, X):
+        """Predictions and raw contributions for ``X``"""
+        predictions = self.model_handler.predict(X)
+        self._checkpoint()
+        with REGISTRY.span(f'contributions_{backend.name}') as span:
+            # Spread large datasets over worker processes, otherwise compute in-process
+            if self.n_jobs != 1 and len(X) > self.chunk_size:
+                contributions = compute_contributions(
+                    self.model_handler.model_path, X, type(backend), background,
+                    n_jobs=self.n_jobs, chunk_size=self.chunk_size, checkpoint=self._checkpoint
+                )
+            else:
+                contributions = backend.run_explainer(X)['contributions']
+            span.rows, span.features = X.shape
+        if isinstance(contributions, list):
+            contributions = np.stack(contributions, axis=-1)
+        return np.asarray(contributions), predictions
+        
+    def global_importance(self, confidence=0.95):
+        """Feature importance over the explained rows with confidence intervals"""
+        if self.explainer is None:
+            raise ValueError("Explainer must be compiled before computing importance")
+        if self.importance_sums is not None:
+            # Maintained incrementally by the store, no pass over the contributions
+            n, total, total_sq = self.importance_sums
+            return importance_from_sums(self.explainer.x_init.columns, n, total, total_sq, confidence)
+        return importance_with_confidence(self.explainer.contributions, confidence=confidence)
+        
+    def permutation_importance(self, confidence=0.95, **options):
+        """Permutation importance from model predictions alone, available before (or without) compiling.
+
+        ``options`` are passed to ``src.permutation.permutation_importance``;
+        results are memoized per confidence and options in the row cache.
+        """
+        def compute():
+            X, y = self.complete_rows()
+            with REGISTRY.span('permutation_importance') as span:
+                importance = permutation_importance(self.model_handler, X, y, n_jobs=self.n_jobs,
+                                                    confidence=confidence, random_state=self.random_state, **options)
+                span.rows, span.features = importance.attrs['n_rows'], len(importance)
+            return importance
+        
+        key = ('permutation', confidence, tuple(sorted(options.items())))
+        return self._memoized(key, compute)[0]
+        
+    def _memoized(self, key, compute):
+        """Return the row cache entry for ``key``, computing and storing it on a miss"""
+        with self._row_cache_lock:
+            if key in self._row_cache:
+                self._row_cache.move_to_end(key)
+                return self._row_cache[key], True
+        value = compute()
+        with self._row_cache_lock:
+            self._row_cache[key] = value
+            while len(self._row_cache) > self.row_cache_size:
+                self._row_cache.popitem(last=False)
+        return value, False
+        
+    def _explain_encoded(self, x):
+        """Prediction and Shapash-formatted local contributions for encoded rows ``x``"""
+        backend = self.explainer.backend
+        with REGISTRY.span('explain_row') as span:
+            contributions = backend.get_local_contributions(x=x, explain_data=backend.run_explainer(x))
+            span.rows, span.features = x.shape
+        return {'prediction': self.model_handler.predict(x)[0], 'contributions': contributions}
+        
+    def explain_row(self, index):
+        """Prediction and local contributions for one dataset row, computed on demand if it was not compiled.
+
+        Returns ``(explanation, cached)`` where ``cached`` tells whether the
+        explanation came from the compiled rows or the row cache.
+        """
+        if self.explainer is None:
+            raise ValueError("Explainer must be compiled before explaining rows")
+        if index not in self.data.index:
+            raise ValueError(f"Row {index} not found in dataset")
+        
+        if index in self.explainer.x_init.index:
+            contributions = self.explainer.contributions
+            if isinstance(contributions, list):
+                contributions = [c.loc[[index]] for c in contributions]
+            else:
+                contributions = contributions.loc[[index]]
+            prediction = self.explainer.y_pred.loc[index].iloc[0]
+            return {'prediction': prediction, 'contributions': contributions}, True
+        
+        return self._memoized(('row', index), lambda: self._explain_encoded(self.features.loc[[index]]))
+        
+    def encode_rows(self, rows):
+        """Encoded frame of rows given as mappings of feature name to raw value"""
+        missing = sorted({str(column) for values in rows for column in self.features.columns if column not in values})
+        if missing:
+            raise ValueError(f"Missing features: {', '.join(missing)}")
+        
+        x = pd.DataFrame([{column: values[column] for column in self.features.columns} for values in rows])
+        x = self.encoder.transform(x)
+        try:
+            return x.astype(self.features.dtypes.to_dict())
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid feature values: {str(e)}")
+        
+    def explain_features(self, values):
+        """Explain an ad-hoc feature vector given as a mapping of feature name to raw value"""
+        if self.explainer is None:
+            raise ValueError("Explainer must be compiled before explaining rows")
+        x = self.encode_rows([values])
+        key = ('features', int(pd.util.hash_pandas_object(x, index=False).iloc[0]))
+        return self._memoized(key, lambda: self._explain_encoded(x))
+        
+    def memory_usage(self):
+        """Estimate the bytes held by the dataset and the compiled explanation"""
+        frames = [self.data, self.features, self.target]
+        total = 0 if self.plot_data is None else self.plot_data.nbytes()
+        if self.explainer is not None:
+            frames += [self.explainer.x_init, self.explainer.x_encoded]
+            if self.contribution_store is not None:
+                # Mapped pages belong to the shared page cache, only decoded copies are ours
+                total += self.contribution_store.heap_bytes
+            else:
+                contributions = self.explainer.contributions
+                frames += contributions if isinstance(contributions, list) else [contributions]
+        
+        for frame in frames:
+            if frame is not None:
+                usage = frame.memory_usage(deep=True)
+                total += int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+        return total
         
     def launch_webapp(self, port=8050):
         """Launch the Shapash web app"""
         try:
-            self.compile_explainer()
+            if self.explainer is None:
+                self.compile_explainer()
             print(f"Starting Shapash web app on http://localhost:{port}")
-            # Let SmartExplainer handle the threading and app startup
-            app = self.explainer.run_app(host='0.0.0.0', port=port)
+            # Let SmartExplainer handle the threading and app startup; its scatter
+            # plots draw at most point_budget points, like the plot endpoints
+            app = self.explainer.run_app(host='0.0.0.0', port=port, settings={'points': self.point_budget})
             return app
         except Exception as e:
             raise ValueError(f"Error launching webapp: {str(e)}")
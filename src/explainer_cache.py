@@ -0,0 +1,169 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+# Digests of recently hashed files by (path, size, mtime), so unchanged files are hashed once
+DIGEST_CACHE_ITEMS = 1024
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's contents, re-hashed only when its size or mtime changes"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        if key in _digests:
+            _digests.move_to_end(key)
+            return _digests[key]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    with _digests_lock:
+        _digests[key] = digest.hexdigest()
+        while len(_digests) > DIGEST_CACHE_ITEMS:
+            _digests.popitem(last=False)
+    return digest.hexdigest()
+
+
+def compile_key(model_path, data_path, settings=None):
+    """Key of one compiled explanation: the model bytes, the dataset bytes and the explainer settings"""
+    digest = hashlib.sha256()
+    digest.update(file_digest(model_path).encode())
+    digest.update(file_digest(data_path).encode())
+    digest.update(json.dumps(settings or {}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ExplainerCache:
+    """Content-addressed LRU cache of compiled SmartExplainer objects.
+
+    Entries are written through to ``cache_dir`` so they survive restarts; only
+    the ``max_memory_items`` most recently used explainers are kept in memory and
+    the directory is trimmed (oldest first) once it grows past ``max_disk_bytes``.
+    """
+
+    def __init__(self, cache_dir, max_memory_items=4, max_disk_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, model_path, data_path, settings=None):
+        """Build a cache key from the model bytes, the dataset bytes and the explainer settings"""
+        return compile_key(model_path, data_path, settings)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.joblib')
+
+    def get(self, key):
+        """Return a compiled explainer for ``key`` or None on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                # Callers attach their own web app to the explainer, so hand out a shallow copy
+                return copy.copy(self._memory[key])
+
+        path = self._entry_path(key)
+        if os.path.exists(path):
+            import joblib
+            try:
+                explainer = joblib.load(path)
+                os.utime(path)
+            except Exception as e:
+                print(f"Discarding unreadable cache entry {key}: {str(e)}")
+                self._remove_file(path)
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, explainer)
+                return copy.copy(explainer)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, explainer):
+        """Store a compiled explainer in memory and on disk"""
+        import joblib
+        
+        path = self._entry_path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            joblib.dump(explainer, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Could not write explainer to cache: {str(e)}")
+            self._remove_file(tmp_path)
+
+        with self._lock:
+            self._remember(key, explainer)
+        self._trim_disk()
+
+    def _remember(self, key, explainer):
+        """Insert into the in-memory LRU, evicting the least recently used entries"""
+        self._memory[key] = explainer
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.joblib'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _trim_disk(self):
+        """Delete the least recently used files until the cache fits in ``max_disk_bytes``"""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            self._remove_file(path)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current cache occupancy"""
+        entries = self._disk_entries()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'max_memory_entries': self.max_memory_items,
+                'disk_entries': len(entries),
+                'disk_bytes': sum(size for _, size, _ in entries),
+                'max_disk_bytes': self.max_disk_bytes,
+            }
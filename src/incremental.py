@@ -0,0 +1,191 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def row_fingerprints(X):
+    """64-bit content hash of every row, independent of the index"""
+    return pd.util.hash_pandas_object(X, index=False).to_numpy(dtype=np.uint64)
+
+
+def background_digest(background):
+    """Content hash of a backend's background data (a frame, array, shap summary, dict of them or None)"""
+    digest = hashlib.sha256()
+
+    def update(value):
+        if value is None:
+            digest.update(b'none')
+        elif isinstance(value, dict):
+            for key in sorted(value):
+                digest.update(str(key).encode())
+                update(value[key])
+        elif isinstance(value, pd.DataFrame):
+            digest.update(str(list(value.columns)).encode())
+            digest.update(row_fingerprints(value).tobytes())
+        else:
+            # shap's k-means summaries keep their points in .data and weights in .weights
+            for array in (getattr(value, 'data', value), getattr(value, 'weights', None)):
+                if array is not None:
+                    digest.update(np.ascontiguousarray(np.asarray(array, dtype=np.float64)).tobytes())
+
+    update(background)
+    return digest.hexdigest()
+
+
+def _abs_per_feature(contributions):
+    """|contribution| per row and feature, averaged over classes for multi-output models"""
+    values = np.abs(contributions)
+    return values.mean(axis=2) if values.ndim == 3 else values
+
+
+class _ModelState:
+    """Everything remembered about one model and feature layout"""
+
+    def __init__(self, backend, background):
+        self.backend = backend
+        self.background = background
+        self.lock = threading.Lock()
+        # Explained rows, in insertion order, looked up through a sorted view
+        self.fingerprints = np.empty(0, dtype=np.uint64)
+        self.order = np.empty(0, dtype=np.int64)
+        self.contributions = None
+        self.predictions = None
+        # Aggregates over the most recently explained dataset (with multiplicity)
+        self.last_fingerprints = np.empty(0, dtype=np.uint64)
+        self.abs_sum = None
+        self.abs_sq_sum = None
+
+    @property
+    def n_rows(self):
+        return len(self.fingerprints)
+
+    def lookup(self, fingerprints):
+        """Positions of ``fingerprints`` in the store, -1 where unknown"""
+        positions = np.full(len(fingerprints), -1, dtype=np.int64)
+        if self.n_rows == 0:
+            return positions
+        sorted_fps = self.fingerprints[self.order]
+        slots = np.minimum(np.searchsorted(sorted_fps, fingerprints), self.n_rows - 1)
+        found = sorted_fps[slots] == fingerprints
+        positions[found] = self.order[slots[found]]
+        return positions
+
+    def add(self, fingerprints, contributions, predictions):
+        if self.contributions is None:
+            self.contributions = contributions
+            self.predictions = predictions
+        else:
+            self.contributions = np.concatenate([self.contributions, contributions])
+            self.predictions = np.concatenate([self.predictions, predictions])
+        self.fingerprints = np.concatenate([self.fingerprints, fingerprints])
+        self.order = np.argsort(self.fingerprints, kind='stable')
+
+    def keep_only(self, fingerprints):
+        """Drop stored rows that are not part of ``fingerprints``"""
+        keep = np.isin(self.fingerprints, fingerprints)
+        self.fingerprints = self.fingerprints[keep]
+        self.contributions = self.contributions[keep]
+        self.predictions = self.predictions[keep]
+        self.order = np.argsort(self.fingerprints, kind='stable')
+
+    def update_aggregates(self, fingerprints):
+        """Move the importance sums from the previous dataset to ``fingerprints``.
+
+        Only fingerprints whose multiplicity changed are touched, so an append
+        or edit costs time proportional to the change.
+        """
+        old_fps, old_counts = np.unique(self.last_fingerprints, return_counts=True)
+        new_fps, new_counts = np.unique(fingerprints, return_counts=True)
+        all_fps = np.union1d(old_fps, new_fps)
+        delta = np.zeros(len(all_fps), dtype=np.int64)
+        delta[np.searchsorted(all_fps, new_fps)] += new_counts
+        delta[np.searchsorted(all_fps, old_fps)] -= old_counts
+        changed = delta != 0
+
+        values = _abs_per_feature(self.contributions[self.lookup(all_fps[changed])])
+        weights = delta[changed][:, np.newaxis]
+        if self.abs_sum is None:
+            self.abs_sum = np.zeros(values.shape[1])
+            self.abs_sq_sum = np.zeros(values.shape[1])
+        self.abs_sum += (weights * values).sum(axis=0)
+        self.abs_sq_sum += (weights * values ** 2).sum(axis=0)
+        self.last_fingerprints = fingerprints
+
+
+class IncrementalStore:
+    """Reuses contributions and predictions for rows a model has already explained.
+
+    Rows are identified by content fingerprint, so re-uploading a dataset with
+    appended or edited rows only sends the new and changed rows through the
+    model and explanation backend. Stored rows are only reused under the
+    same key, which must include a ``background_digest`` of the backend's
+    background data: contributions are relative to that background, so rows
+    explained against another dataset's background are never mixed in.
+    Backends without a data-dependent background (path-dependent trees)
+    reuse rows across any datasets; for the others an edited dataset that
+    changes the background is explained afresh. Global importance sums are
+    updated from the difference between consecutive datasets.
+    """
+
+    def __init__(self, max_models=4, max_rows_per_model=2000000):
+        self.max_models = max_models
+        self.max_rows_per_model = max_rows_per_model
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(self, key, make_backend):
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                backend, background = make_backend()
+                state = self._states[key] = _ModelState(backend, background)
+                while len(self._states) > self.max_models:
+                    self._states.popitem(last=False)
+            self._states.move_to_end(key)
+            return state
+
+    def explain(self, key, X, make_backend, compute):
+        """Return contributions and predictions for every row of ``X``.
+
+        ``make_backend()`` returns ``(backend, background)`` and is only called
+        the first time ``key`` is seen. ``compute(backend, background, X_new)``
+        returns ``(contributions, predictions)`` for rows not yet stored. Also
+        returns the shared backend, the ``(n, sum, sum of squares)`` importance
+        sums for ``X`` and a report of reused and computed row counts.
+        """
+        state = self._state(key, make_backend)
+        fingerprints = row_fingerprints(X)
+
+        with state.lock:
+            positions = state.lookup(fingerprints)
+            new = positions < 0
+            # Duplicated new rows are computed once
+            new_fps, first = np.unique(fingerprints[new], return_index=True)
+            if len(new_fps):
+                rows = np.flatnonzero(new)[first]
+                contributions, predictions = compute(state.backend, state.background, X.iloc[rows])
+                state.add(new_fps, np.asarray(contributions), np.asarray(predictions))
+                positions = state.lookup(fingerprints)
+
+            contributions, predictions = state.contributions[positions], state.predictions[positions]
+            state.update_aggregates(fingerprints)
+            # Snapshot of the importance sums for this dataset, see importance_from_sums
+            sums = (len(fingerprints), state.abs_sum.copy(), state.abs_sq_sum.copy())
+            if state.n_rows > self.max_rows_per_model:
+                state.keep_only(fingerprints)
+
+        report = {'reused_rows': int((~new).sum()), 'computed_rows': int(len(new_fps))}
+        return contributions, predictions, state.backend, sums, report
+
+    def stats(self):
+        with self._lock:
+            states = list(self._states.values())
+        return {
+            'models': len(states),
+            'stored_rows': sum(state.n_rows for state in states),
+            'max_models': self.max_models,
+            'max_rows_per_model': self.max_rows_per_model,
+        }
@@ -0,0 +1,262 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from src.explainer_cache import file_digest
+
+DATASET_EXTENSIONS = ('csv', 'parquet', 'feather', 'arrow', 'ipc')
+
+# Order in which a column's inferred kind widens as more chunks are seen
+_KIND_RANK = {'bool': 0, 'int': 1, 'float': 2, 'text': 3}
+_INT_TYPES = (np.int8, np.int16, np.int32, np.int64)
+# Largest float32 rounding error allowed, relative to the column's standard deviation
+FLOAT32_TOLERANCE = 1e-4
+
+
+class _ColumnStats:
+    """Running statistics for one column, gathered chunk by chunk"""
+
+    def __init__(self):
+        self.kind = 'bool'
+        self.has_na = False
+        self.min = None
+        self.max = None
+        self.categories = set()
+        self.seen_values = False
+        # Count, mean and sum of squared deviations of the numbers (merged chunk by chunk,
+        # which stays accurate for large offsets such as timestamps), and the largest
+        # error a float32 round trip made on any of them
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.float32_error = 0.0
+
+    def update(self, values, max_categories):
+        if values.isna().any():
+            self.has_na = True
+            values = values.dropna()
+        if pd.api.types.is_bool_dtype(values):
+            kind = 'bool'
+        elif pd.api.types.is_integer_dtype(values):
+            kind = 'int'
+        elif pd.api.types.is_float_dtype(values):
+            kind = 'float'
+        else:
+            kind = 'text'
+        if (kind == 'text') != (self.kind == 'text') and self.seen_values and len(values):
+            # Some chunks were parsed as numbers, so their text form is unknown
+            self.categories = None
+        if _KIND_RANK[kind] > _KIND_RANK[self.kind]:
+            self.kind = kind
+        self.seen_values = self.seen_values or len(values) > 0
+
+        if kind in ('int', 'float') and len(values):
+            low, high = values.min(), values.max()
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+            self._update_spread(values.to_numpy(dtype=np.float64))
+        if self.kind == 'text' and self.categories is not None:
+            self.categories.update(values.astype(str).unique())
+            if len(self.categories) > max_categories:
+                # Too many distinct values to be worth a categorical
+                self.categories = None
+
+    def _update_spread(self, numbers):
+        numbers = numbers[np.isfinite(numbers)]
+        if not len(numbers):
+            return
+        error = np.abs(numbers.astype(np.float32).astype(np.float64) - numbers).max()
+        self.float32_error = max(self.float32_error, error)
+        count, mean = len(numbers), numbers.mean()
+        m2 = ((numbers - mean) ** 2).sum()
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+
+    def float32_exact(self):
+        """Whether float32 keeps every number within FLOAT32_TOLERANCE of the column's spread"""
+        if self.float32_error == 0:
+            return True
+        std = np.sqrt(self.m2 / self.count) if self.count else 0.0
+        return self.float32_error <= FLOAT32_TOLERANCE * std
+
+    def dtype(self, n_rows, downcast_floats):
+        """Smallest dtype that holds every value seen, or None to keep the parser default"""
+        float_type = np.float32 if downcast_floats and self.float32_exact() else np.float64
+        if self.kind == 'bool':
+            return float_type if self.has_na else np.bool_
+        if self.kind == 'int':
+            if self.has_na:
+                # Integers with gaps become floats; float32 is exact below 2**24
+                exact = self.min is None or max(abs(self.min), abs(self.max)) < 2 ** 24
+                return float_type if exact else np.float64
+            for int_type in _INT_TYPES:
+                info = np.iinfo(int_type)
+                if self.min is None or (info.min <= self.min and self.max <= info.max):
+                    return int_type
+        if self.kind == 'float':
+            return float_type
+        if self.categories is not None and len(self.categories) <= max(1, n_rows // 2):
+            return pd.CategoricalDtype(sorted(self.categories))
+        return None
+
+
+def infer_compact_dtypes(path, chunksize=100000, max_categories=1000, downcast_floats=True):
+    """First pass over a CSV: return ``(n_rows, dtypes)`` with the narrowest dtype per column"""
+    stats = {}
+    n_rows = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        n_rows += len(chunk)
+        for column in chunk.columns:
+            stats.setdefault(column, _ColumnStats()).update(chunk[column], max_categories)
+    dtypes = {column: s.dtype(n_rows, downcast_floats) for column, s in stats.items()}
+    return n_rows, dtypes
+
+
+def _code_type(n_categories):
+    for int_type in _INT_TYPES:
+        if n_categories < np.iinfo(int_type).max:
+            return int_type
+    return np.int64
+
+
+def read_csv_compact(path, chunksize=100000, max_categories=1000, downcast_floats=True):
+    """Stream a CSV into a single compact DataFrame.
+
+    The file is read twice in chunks: once to infer narrow dtypes (float32
+    where it keeps the values, the smallest int, categoricals for
+    low-cardinality text) and once to fill
+    preallocated per-column arrays. Only one chunk is ever held in parser
+    form, and the arrays are handed to the DataFrame without copying, so peak
+    memory stays close to the size of the compact result.
+    """
+    n_rows, dtypes = infer_compact_dtypes(path, chunksize, max_categories, downcast_floats)
+
+    buffers = {}
+    for column, dtype in dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            buffers[column] = np.empty(n_rows, dtype=_code_type(len(dtype.categories)))
+        elif dtype is None:
+            buffers[column] = np.empty(n_rows, dtype=object)
+        else:
+            buffers[column] = np.empty(n_rows, dtype=dtype)
+
+    # Text columns are read as text in every chunk, even those that look numeric
+    read_dtypes = {column: str if dtype is None else dtype for column, dtype in dtypes.items()}
+    start = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize, dtype=read_dtypes):
+        stop = start + len(chunk)
+        if stop > n_rows:
+            raise ValueError(f"{path} changed while it was being read")
+        for column, buffer in buffers.items():
+            values = chunk[column]
+            if isinstance(dtypes[column], pd.CategoricalDtype):
+                buffer[start:stop] = values.cat.codes.to_numpy()
+            else:
+                buffer[start:stop] = values.to_numpy(dtype=buffer.dtype)
+        start = stop
+
+    columns = {}
+    for column, buffer in buffers.items():
+        dtype = dtypes[column]
+        if isinstance(dtype, pd.CategoricalDtype):
+            columns[column] = pd.Categorical.from_codes(buffer[:start], dtype=dtype)
+        else:
+            columns[column] = buffer[:start]
+    return pd.DataFrame(columns, copy=False)
+
+
+def read_arrow(path):
+    """Memory-map an Arrow IPC file and wrap its columns without copying where possible"""
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    # split_blocks keeps one block per column so numeric columns stay views of the map
+    return table.to_pandas(split_blocks=True)
+
+
+def write_arrow(frame, path):
+    """Write an uncompressed Arrow IPC file (compression would defeat memory mapping)"""
+    tmp_path = f'{path}.tmp'
+    feather.write_feather(frame, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+
+def trim_dataset_cache(cache_dir, max_bytes):
+    """Delete the least recently used cached datasets until they fit in ``max_bytes``.
+
+    Sessions that still map a deleted file keep reading it; the space is only
+    released once they close.
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.arrow'):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def load_dataset(path, cache_dir=None, cache_bytes=None):
+    """Load a CSV, Parquet, Feather or Arrow IPC dataset into a DataFrame.
+
+    With a ``cache_dir``, CSV files are parsed once and kept as memory-mappable
+    Arrow files named by content hash, so re-explaining the same upload skips
+    text parsing entirely. With ``cache_bytes``, the least recently used
+    cached files are deleted once the directory grows past it.
+    """
+    extension = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+    if extension not in DATASET_EXTENSIONS:
+        raise ValueError(f"Unsupported dataset format '{extension}', expected one of {DATASET_EXTENSIONS}")
+
+    if extension == 'parquet':
+        return pd.read_parquet(path)
+    if extension == 'feather':
+        return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+    if extension in ('arrow', 'ipc'):
+        return read_arrow(path)
+
+    if cache_dir is None:
+        return read_csv_compact(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    cached_path = os.path.join(cache_dir, f'{file_digest(path)}.arrow')
+    if os.path.exists(cached_path):
+        try:
+            data = read_arrow(cached_path)
+        except FileNotFoundError:
+            # Trimmed by another load in the meantime
+            data = None
+        except Exception as e:
+            print(f"Discarding unreadable dataset cache {cached_path}: {str(e)}")
+            os.remove(cached_path)
+            data = None
+        if data is not None:
+            # Touching the file marks it as recently used for trim_dataset_cache()
+            try:
+                os.utime(cached_path)
+            except FileNotFoundError:
+                pass
+            return data
+    data = read_csv_compact(path)
+    try:
+        write_arrow(data, cached_path)
+        if cache_bytes is not None:
+            trim_dataset_cache(cache_dir, cache_bytes)
+    except Exception as e:
+        print(f"Could not cache dataset as Arrow: {str(e)}")
+    return data
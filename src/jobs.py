@@ -0,0 +1,144 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested"""
+
+
+class Job:
+    """A unit of background work with pollable status and progress"""
+
+    def __init__(self, name=None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = 'Waiting for a free worker'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested; long steps call this between stages"""
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    def update(self, progress, message=None, result=None):
+        """Report progress from inside the job; raises JobCancelled if the job was cancelled.
+
+        A ``result`` is a partial result, visible to pollers until the job's
+        return value replaces it.
+        """
+        self.check_cancelled()
+        self.progress = max(0.0, min(1.0, float(progress)))
+        if message is not None:
+            self.message = message
+        if result is not None:
+            self.result = result
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'progress': round(self.progress, 4),
+            'message': self.message,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    """Runs jobs on a bounded worker pool and keeps their status for polling.
+
+    Job functions are called as ``fn(job, *args, **kwargs)`` and should call
+    ``job.update()`` between stages so progress is reported and cancellation is
+    honoured. At most ``max_finished`` completed jobs are remembered.
+    """
+
+    def __init__(self, max_workers=2, max_finished=200):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='explainify-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, name=None, **kwargs):
+        """Queue ``fn`` and return its Job immediately"""
+        job = Job(name=name)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            self._finish(job, 'cancelled', message='Cancelled before start')
+            return
+        job.status = 'running'
+        job.started_at = time.time()
+        job.message = 'Running'
+        try:
+            result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            self._finish(job, 'cancelled', message='Cancelled')
+        except Exception as e:
+            self._finish(job, 'failed', message='Failed', error=str(e))
+        else:
+            job.result = result
+            job.progress = 1.0
+            self._finish(job, 'completed', message='Done')
+
+    def _finish(self, job, status, message=None, error=None):
+        job.status = status
+        job.error = error
+        if message is not None:
+            job.message = message
+        job.finished_at = time.time()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond ``max_finished``"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Request cancellation; queued jobs never start, running jobs stop at their next update()"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job._cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, 'cancelled', message='Cancelled before start')
+        return True
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {'max_workers': self.max_workers, 'jobs': counts}
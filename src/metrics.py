@@ -0,0 +1,158 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def peak_rss_bytes():
+    """High-water mark of this process's resident memory, None where the platform has no getrusage"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Span:
+    """Handle yielded by ``MetricsRegistry.span`` for recording what a stage processed"""
+
+    def __init__(self):
+        self.rows = None
+        self.features = None
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and histograms rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_max(self, name, value, **labels):
+        """Raise a gauge to ``value`` if it is higher than the current one"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = max(self._gauges.get(key, value), value)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, stage):
+        """Time a pipeline stage and record its duration, memory growth and volume.
+
+        The process memory high-water mark cannot be attributed to a stage
+        directly, so each stage records how far it raised that mark; stages
+        that run inside an earlier peak record 0. Set ``rows`` and
+        ``features`` on the yielded Span to count what the stage processed.
+        Failed stages are counted separately.
+        """
+        span = Span()
+        peak_before = peak_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            self.inc('explainify_stage_failures_total', stage=stage)
+            raise
+        finally:
+            self.observe('explainify_stage_seconds', time.perf_counter() - start, stage=stage)
+            if peak_before is not None:
+                peak = peak_rss_bytes()
+                self.set_max('explainify_stage_peak_rss_growth_bytes', peak - peak_before, stage=stage)
+                self.set_max('explainify_process_peak_rss_bytes', peak)
+        if span.rows is not None:
+            self.inc('explainify_rows_processed_total', span.rows, stage=stage)
+        if span.features is not None:
+            self.inc('explainify_features_processed_total', span.features, stage=stage)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: (list(h.buckets), list(h.counts), h.count, h.sum)
+                          for key, h in self._histograms.items()}
+
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name in seen:
+                return
+            seen.add(name)
+            if name in self._help:
+                lines.append(f'# HELP {name} {self._help[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+        for (name, labels), value in sorted(gauges.items()):
+            header(name, 'gauge')
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+        for (name, labels), (buckets, counts, count, total) in sorted(histograms.items()):
+            header(name, 'histogram')
+            for bound, bucket_count in zip(buckets, counts):
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {bucket_count}')
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry shared by the explainer, model handler and app
+REGISTRY = MetricsRegistry()
+REGISTRY.describe('explainify_stage_seconds', 'Wall time of explanation pipeline stages')
+REGISTRY.describe('explainify_stage_peak_rss_growth_bytes', 'Largest increase of the process peak resident memory during one run of each stage')
+REGISTRY.describe('explainify_process_peak_rss_bytes', 'Process peak resident memory')
+REGISTRY.describe('explainify_stage_failures_total', 'Pipeline stages that raised')
+REGISTRY.describe('explainify_rows_processed_total', 'Rows processed per stage')
+REGISTRY.describe('explainify_features_processed_total', 'Feature columns processed per stage')
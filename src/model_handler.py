@@ -1,22 +1,34 @@
-import joblib
-from sklearn.base import BaseEstimator
-from sklearn.linear_model import LogisticRegression, LinearRegression
-from sklearn.cluster import KMeans
+import copy
 import os
+import threading
+
+from src.metrics import REGISTRY
+
+# joblib and scikit-learn are imported inside the methods that need them so
+# importing this module (and the app) stays cheap
 
 class ModelHandler:
-    def __init__(self, model_path):
+    def __init__(self, model_path, mmap_mode=None):
         self.model_path = model_path
-        self.model = self._load_model()
+        self.mmap_mode = mmap_mode
+        with REGISTRY.span('model_load'):
+            self.model = self._load_model()
         self.model_type = self._detect_model_type()
+        self._prediction_service = None
+        self._cluster_assigner = None
+        self._service_lock = threading.Lock()
 
     def _load_model(self):
         """Load model from pickle file"""
+        import joblib
+        from sklearn.base import BaseEstimator
+        
         try:
             if not os.path.exists(self.model_path):
                 raise ValueError(f"Model file not found: {self.model_path}")
                 
-            model = joblib.load(self.model_path)
+            # mmap_mode keeps large numpy arrays on disk, shared through the page cache
+            model = joblib.load(self.model_path, mmap_mode=self.mmap_mode)
             
             if not isinstance(model, BaseEstimator):
                 raise ValueError("Uploaded model must be a scikit-learn model")
@@ -27,12 +39,15 @@ class ModelHandler:
 
     def _detect_model_type(self):
         """Detect if model is for classification, regression, or clustering"""
+        from sklearn.linear_model import LogisticRegression, LinearRegression
+        from sklearn.base import ClusterMixin
+        
         try:
             if isinstance(self.model, LogisticRegression):
                 return "classification"
             elif isinstance(self.model, LinearRegression):
                 return "regression"
-            elif isinstance(self.model, KMeans):
+            elif isinstance(self.model, ClusterMixin):
                 return "clustering"
             elif hasattr(self.model, 'predict_proba'):
                 return "classification"
@@ -48,10 +63,13 @@ class ModelHandler:
     def predict(self, X):
         """Make predictions using the loaded model"""
         try:
-            if self.model_type == "clustering":
-                return self.model.predict(X) if hasattr(self.model, 'predict') else self.model.fit_predict(X)
-            else:
-                return self.model.predict(X)
+            with REGISTRY.span('predict') as span:
+                span.rows, span.features = len(X), X.shape[1]
+                if self.model_type == "clustering":
+                    # Never fit_predict(): that would refit the model on every call
+                    return self.cluster_assigner().predict(X)
+                else:
+                    return self.model.predict(X)
         except Exception as e:
             raise ValueError(f"Error making predictions: {str(e)}")
             
@@ -60,6 +78,70 @@ class ModelHandler:
         if self.model_type != "classification":
             raise ValueError("predict_proba is only available for classification models")
         try:
-            return self.model.predict_proba(X)
+            with REGISTRY.span('predict_proba') as span:
+                span.rows, span.features = len(X), X.shape[1]
+                return self.model.predict_proba(X)
         except Exception as e:
             raise ValueError(f"Error getting prediction probabilities: {str(e)}")
+
+    def cluster_assigner(self):
+        """Assigns rows to this clustering model's clusters without refitting it.
+
+        Built from the model alone on first use. Models that also need the data
+        they were fit on only have one on a handler from ``with_data``.
+        """
+        from src.clustering import ClusterAssigner
+        
+        if self.model_type != "clustering":
+            raise ValueError("Cluster assignment is only available for clustering models")
+        with self._service_lock:
+            if self._cluster_assigner is None:
+                with REGISTRY.span('cluster_index'):
+                    self._cluster_assigner = ClusterAssigner(self.model)
+            return self._cluster_assigner
+
+    def with_data(self, X):
+        """This model bound to the dataset ``X`` it is explained on.
+
+        Clustering models that assign rows by looking them up in their fit data
+        (see ``src.clustering``) get a handler of their own, sharing the loaded
+        model, with an index of ``X``; so a handler shared through the model
+        registry never keeps one dataset's index for another. Other models
+        return this handler.
+        """
+        from src.clustering import ClusterAssigner, assigner_needs_data
+        
+        if self.model_type != "clustering" or not assigner_needs_data(self.model):
+            return self
+        bound = copy.copy(self)
+        bound._service_lock = threading.Lock()
+        bound._prediction_service = None
+        with REGISTRY.span('cluster_index'):
+            bound._cluster_assigner = ClusterAssigner(self.model, X)
+        return bound
+
+    def prediction_service(self):
+        """Micro-batching prediction service shared by every caller of this model"""
+        from src.prediction_service import PredictionService
+        
+        with self._service_lock:
+            if self._prediction_service is None:
+                self._prediction_service = PredictionService(self)
+            return self._prediction_service
+            
+    def close(self):
+        """Stop this model's prediction service thread (a later call starts a new one)"""
+        with self._service_lock:
+            service, self._prediction_service = self._prediction_service, None
+        if service is not None:
+            service.close()
+            
+    def predict_batched(self, X):
+        """Predict through the shared micro-batching service"""
+        return self.prediction_service().predict(X)
+        
+    def predict_proba_batched(self, X):
+        """Prediction probabilities through the shared micro-batching service"""
+        if self.model_type != "classification":
+            raise ValueError("predict_proba is only available for classification models")
+        return self.prediction_service().predict(X, proba=True)
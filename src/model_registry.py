@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+
+from src.explainer_cache import file_digest
+from src.model_handler import ModelHandler
+
+
+class ModelRegistry:
+    """Shares one read-only ModelHandler per distinct model file.
+
+    Models are keyed by the content hash of their pickle, so the same model
+    uploaded twice (or under another name) is deserialized once. Files of at
+    least ``mmap_threshold_bytes`` are loaded with joblib memory mapping so
+    their arrays live in the page cache, and the least recently used models
+    are dropped once the loaded total passes ``max_memory_bytes``.
+    """
+
+    def __init__(self, max_memory_bytes=2 * 1024 ** 3, mmap_threshold_bytes=64 * 1024 ** 2):
+        self.max_memory_bytes = max_memory_bytes
+        self.mmap_threshold_bytes = mmap_threshold_bytes
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._digests = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _digest(self, model_path):
+        """Content hash of a model file, re-hashed only when its size or mtime changes"""
+        stat = os.stat(model_path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._digests.get(model_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1], stat.st_size
+        # Hashed outside the lock; two threads may hash the same file, both get the same digest
+        digest = file_digest(model_path)
+        with self._lock:
+            self._digests[model_path] = (signature, digest)
+        return digest, stat.st_size
+
+    def digest(self, model_path):
+        """Content hash of a model file"""
+        return self._digest(model_path)[0]
+
+    def get(self, model_path):
+        """Return the shared ModelHandler for ``model_path``, loading it on first use"""
+        if not os.path.exists(model_path):
+            raise ValueError(f"Model file not found: {model_path}")
+        digest, size = self._digest(model_path)
+
+        while True:
+            with self._lock:
+                handler = self._models.get(digest)
+                if handler is not None:
+                    self._models.move_to_end(digest)
+                    self.hits += 1
+                    return handler
+                loading = self._loading.get(digest)
+                if loading is None:
+                    loading = self._loading[digest] = threading.Event()
+                    break
+            # Another thread is deserializing the same model; wait for it and look again
+            loading.wait()
+
+        try:
+            mmap_mode = 'r' if size >= self.mmap_threshold_bytes else None
+            handler = ModelHandler(model_path, mmap_mode=mmap_mode)
+            with self._lock:
+                self.misses += 1
+                self._models[digest] = handler
+                self._sizes[digest] = size
+                self._evict(keep=digest)
+            return handler
+        finally:
+            with self._lock:
+                self._loading.pop(digest, None)
+            loading.set()
+
+    def _evict(self, keep):
+        """Drop least recently used models until the total fits under the memory cap"""
+        total = sum(self._sizes.values())
+        for digest in list(self._models):
+            if total <= self.max_memory_bytes:
+                break
+            if digest == keep:
+                continue
+            # Sessions still using the model keep it; its batching thread must not
+            self._models.pop(digest).close()
+            total -= self._sizes.pop(digest)
+            self.evictions += 1
+
+    def preload(self, model_paths):
+        """Load models in a background thread so the first request finds them warm"""
+        def load_all():
+            for model_path in model_paths:
+                try:
+                    self.get(model_path)
+                except Exception as e:
+                    print(f"Could not preload {model_path}: {str(e)}")
+
+        thread = threading.Thread(target=load_all, name='explainify-model-preload', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self._lock:
+            return {
+                'models': len(self._models),
+                'memory_bytes': sum(self._sizes.values()),
+                'max_memory_bytes': self.max_memory_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,59 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+
+# Per-process backend, built once by the pool initializer
+_worker_backend = None
+
+
+def _init_worker(model_path, backend_cls, background):
+    """Load the model once per worker process and build its explanation backend"""
+    global _worker_backend
+    model = joblib.load(model_path)
+    _worker_backend = backend_cls(model=model, masker=background)
+
+
+def _explain_chunk(x):
+    return _worker_backend.run_explainer(x)['contributions']
+
+
+def resolve_n_jobs(n_jobs):
+    """Translate an sklearn-style n_jobs value into a worker count"""
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return n_jobs
+
+
+def compute_contributions(model_path, x, backend_cls, background, n_jobs=-1, chunk_size=10000, checkpoint=None):
+    """Compute contributions for ``x`` in row chunks across a process pool.
+
+    Every worker builds ``backend_cls`` from the same ``background`` the serial
+    path uses (see ``src.backends.summarize_background``), so deterministic
+    backends (linear, tree, exact shap) return the same values as a single
+    ``run_explainer`` call. The result is the raw contributions array, suitable
+    for ``SmartExplainer.compile(contributions=...)``. ``checkpoint()`` is
+    called after every chunk; if it raises, chunks not yet started are dropped.
+    """
+    n_workers = resolve_n_jobs(n_jobs)
+    chunks = [x.iloc[start:start + chunk_size] for start in range(0, len(x), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(chunks)), initializer=_init_worker,
+                             initargs=(model_path, backend_cls, background)) as pool:
+        futures = [pool.submit(_explain_chunk, chunk) for chunk in chunks]
+        parts = []
+        try:
+            # Collected in submission order, so rows stay aligned with x
+            for future in futures:
+                parts.append(future.result())
+                if checkpoint is not None:
+                    checkpoint()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    return np.concatenate(parts, axis=0)
@@ -0,0 +1,185 @@
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from src.parallel import resolve_n_jobs
+
+# Per-row losses: log loss of the reference class for classifiers, squared
+# error for regressors and disagreement with the reference cluster for
+# clustering models
+METRICS = {'classification': 'log_loss', 'regression': 'squared_error', 'clustering': 'disagreement'}
+PROBA_FLOOR = 1e-15
+
+# Per-process scorer, built once by the pool initializer
+_worker_scorer = None
+
+
+class _Scorer:
+    """Loss of a model on ``x`` and on copies of ``x`` with one feature shuffled"""
+
+    def __init__(self, predict, x, reference, metric, batch_rows=200000):
+        self.predict = predict
+        self.x = x
+        self.reference = reference
+        self.metric = metric
+        self.batch_rows = batch_rows
+        self.baseline = self.losses(x).mean()
+
+    def losses(self, x):
+        """Per-row loss of the model on ``x``, which holds whole copies of the scored rows"""
+        output = np.asarray(self.predict(x))
+        reference = np.tile(self.reference, len(x) // len(self.reference))
+        if self.metric == 'log_loss':
+            return -np.log(np.maximum(output[np.arange(len(x)), reference], PROBA_FLOOR))
+        if self.metric == 'squared_error':
+            return (output.astype(np.float64) - reference) ** 2
+        return (output != reference).astype(np.float64)
+
+    def shuffled(self, column, repeats, seed):
+        """Increase of the mean loss over ``repeats`` independent shuffles of ``column``.
+
+        Shuffles are stacked into one frame of up to ``batch_rows`` rows, so a
+        batch of repeats costs a single vectorized model call.
+        """
+        rng = np.random.default_rng(seed)
+        n_rows = len(self.x)
+        per_call = max(1, self.batch_rows // n_rows)
+        values = self.x[column].to_numpy()
+        scores = []
+        for start in range(0, repeats, per_call):
+            block = min(per_call, repeats - start)
+            stacked = {
+                name: np.concatenate([values[rng.permutation(n_rows)] for _ in range(block)])
+                if name == column else np.tile(self.x[name].to_numpy(), block)
+                for name in self.x.columns
+            }
+            frame = pd.DataFrame(stacked, columns=self.x.columns, copy=False)
+            losses = self.losses(frame).reshape(block, n_rows)
+            scores.append(losses.mean(axis=1) - self.baseline)
+        return np.concatenate(scores)
+
+
+def _worker_predict(model_path, metric, assigner):
+    from src.model_handler import ModelHandler
+
+    if assigner is not None:
+        return assigner.predict
+    handler = ModelHandler(model_path, mmap_mode='r')
+    return handler.predict_proba if metric == 'log_loss' else handler.predict
+
+
+def _init_worker(model_path, assigner, x, reference, metric, batch_rows):
+    """Load the model once per worker process and score its baseline on the shared rows"""
+    global _worker_scorer
+    _worker_scorer = _Scorer(_worker_predict(model_path, metric, assigner), x, reference, metric, batch_rows)
+
+
+def _score_task(task):
+    column, repeats, seed = task
+    return _worker_scorer.shuffled(column, repeats, seed)
+
+
+def reference_values(model_handler, x, y=None, predict=None):
+    """What the permuted predictions are scored against: ``(reference, metric)``.
+
+    The target when there is one, otherwise the model's own predictions on
+    the unshuffled rows, which measures how much the model relies on each
+    feature. Classifier references are positions in ``model.classes_``.
+    """
+    metric = METRICS[model_handler.model_type]
+    if metric == 'log_loss':
+        classes = np.asarray(model_handler.model.classes_)
+        if y is None:
+            return np.asarray(predict(x)).argmax(axis=1), metric
+        labels = np.asarray(y)
+        positions = np.minimum(np.searchsorted(classes, labels), len(classes) - 1)
+        if not (classes[positions] == labels).all():
+            raise ValueError("Target values are not among the model's classes")
+        return positions, metric
+    if metric == 'squared_error' and y is not None:
+        return np.asarray(y, dtype=np.float64), metric
+    return np.asarray(predict(x)), metric
+
+
+def permutation_importance(model_handler, x, y=None, n_jobs=1, max_rows=10000, min_repeats=5, max_repeats=50,
+                           tolerance=0.05, confidence=0.95, batch_rows=200000, random_state=42):
+    """Permutation importance of every feature, repeated until its confidence interval is narrow enough.
+
+    Each repeat shuffles one column of a sample of at most ``max_rows`` rows
+    and records the increase of the mean loss. Features get ``min_repeats``
+    repeats, then more rounds of repeats until the half-width of their
+    interval is within ``tolerance`` of the largest importance, or they
+    reach ``max_repeats``. With ``n_jobs`` other than 1 features are scored
+    across a process pool. The table has the columns of
+    ``src.sampling.importance_from_sums`` plus the repeats each feature took.
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+    if min_repeats < 2 or max_repeats < min_repeats:
+        raise ValueError("Need 2 <= min_repeats <= max_repeats")
+    if len(x) == 0:
+        raise ValueError("No rows to compute permutation importance on")
+    if len(x) > max_rows:
+        positions = np.sort(np.random.default_rng(random_state).choice(len(x), max_rows, replace=False))
+        x = x.iloc[positions]
+        y = None if y is None else y.iloc[positions]
+
+    if model_handler.model_type == 'clustering':
+        assigner = model_handler.cluster_assigner()
+        predict = assigner.predict
+    else:
+        assigner = None
+        predict = model_handler.predict_proba if METRICS[model_handler.model_type] == 'log_loss' \
+            else model_handler.predict
+    reference, metric = reference_values(model_handler, x, y, predict)
+
+    columns = list(x.columns)
+    samples = {column: np.empty(0) for column in columns}
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    scorer = _Scorer(predict, x, reference, metric, batch_rows)
+    n_workers = min(resolve_n_jobs(n_jobs), len(columns))
+    pool = None
+    if n_workers > 1:
+        pool = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                   initargs=(model_handler.model_path, assigner, x, reference, metric, batch_rows))
+    rounds = 0
+    active = columns
+    try:
+        while active:
+            # Seeds depend only on the feature and round, so results do not depend on n_jobs
+            tasks = [(column, min(min_repeats, max_repeats - len(samples[column])),
+                      (random_state, columns.index(column), rounds)) for column in active]
+            if pool is not None:
+                results = pool.map(_score_task, tasks)
+            else:
+                results = (scorer.shuffled(*task) for task in tasks)
+            for column, scores in zip(active, results):
+                samples[column] = np.concatenate([samples[column], scores])
+            rounds += 1
+
+            scale = max(max(abs(scores.mean()) for scores in samples.values()), np.finfo(np.float64).eps)
+            active = [
+                column for column in active
+                if len(samples[column]) < max_repeats and
+                z * samples[column].std(ddof=1) / np.sqrt(len(samples[column])) > tolerance * scale
+            ]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    mean = np.array([samples[column].mean() for column in columns])
+    margin = np.array([z * samples[column].std(ddof=1) / np.sqrt(len(samples[column])) for column in columns])
+    result = pd.DataFrame({
+        'importance': mean,
+        'ci_low': mean - margin,
+        'ci_high': mean + margin,
+        'repeats': [len(samples[column]) for column in columns],
+    }, index=columns)
+    result.attrs['n_rows'] = len(x)
+    result.attrs['confidence'] = confidence
+    result.attrs['metric'] = metric
+    result.attrs['rounds'] = rounds
+    result.attrs['baseline_loss'] = float(scorer.baseline)
+    return result.sort_values('importance', ascending=False)
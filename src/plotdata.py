@@ -0,0 +1,212 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Aggregates whose size depends only on the bin counts, never on the number
+# of rows, so plot payloads stay flat as datasets grow
+
+
+def _edges(low, high, size):
+    if not np.isfinite(low) or not np.isfinite(high) or low == high:
+        low, high = (low - 0.5, high + 0.5) if np.isfinite(low) else (-0.5, 0.5)
+    return np.linspace(low, high, size + 1)
+
+
+def _bin_codes(values, edges):
+    """Bin of every value for equal-width ``edges``, the top edge included in the last bin"""
+    size = len(edges) - 1
+    codes = ((values - edges[0]) * (size / (edges[-1] - edges[0]))).astype(np.intp)
+    return np.clip(codes, 0, size - 1)
+
+
+def _grouped_stats(codes, n_groups, contributions, values=None):
+    """Count, mean, std, min and max of the contributions of each group"""
+    count = np.bincount(codes, minlength=n_groups)
+    total = np.bincount(codes, weights=contributions, minlength=n_groups)
+    total_sq = np.bincount(codes, weights=contributions ** 2, minlength=n_groups)
+    low = np.full(n_groups, np.inf)
+    high = np.full(n_groups, -np.inf)
+    np.minimum.at(low, codes, contributions)
+    np.maximum.at(high, codes, contributions)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        std = np.sqrt(np.maximum(total_sq / count - mean ** 2, 0))
+        value_mean = None if values is None else np.bincount(codes, weights=values, minlength=n_groups) / count
+    stats = []
+    for i in np.flatnonzero(count):
+        entry = {'count': int(count[i]), 'mean': float(mean[i]), 'std': float(std[i]),
+                 'min': float(low[i]), 'max': float(high[i])}
+        if value_mean is not None:
+            entry['value_mean'] = float(value_mean[i])
+        stats.append((i, entry))
+    return stats
+
+
+def density(values, contributions, x_edges, y_edges):
+    """2D histogram of (feature value, contribution); ``counts[i][j]`` is x bin i, y bin j"""
+    x_size, y_size = len(x_edges) - 1, len(y_edges) - 1
+    cells = _bin_codes(values, x_edges) * y_size + _bin_codes(contributions, y_edges)
+    counts = np.bincount(cells, minlength=x_size * y_size).reshape(x_size, y_size)
+    return {'x_edges': x_edges.tolist(), 'y_edges': y_edges.tolist(), 'counts': counts.tolist()}
+
+
+class PlotData:
+    """Pre-binned contribution plots for every feature of a compiled explanation.
+
+    Built once at compile time from the displayed feature values ``x`` and
+    the contributions (one frame per class for classifiers). For numeric
+    features the overview is ``n_bins`` quantile bins of the feature with the
+    contribution statistics of each, plus a ``grid_size`` x ``grid_size``
+    density grid of (value, contribution); categorical features get one bin
+    per category (the ``max_categories`` most frequent, the rest pooled) and a
+    contribution histogram per category. ``window`` serves a zoomed-in view:
+    raw points when the window holds at most ``point_budget`` rows, otherwise
+    a density grid of the window with a sample of that many points.
+    """
+
+    def __init__(self, x, contributions, n_bins=32, grid_size=64, point_budget=2000, max_categories=50):
+        self.x = x
+        self.contributions = contributions if isinstance(contributions, list) else [contributions]
+        self.n_bins = n_bins
+        self.grid_size = grid_size
+        self.point_budget = point_budget
+        self.max_categories = max_categories
+        self.numeric = {feature: pd.api.types.is_numeric_dtype(x[feature]) and not pd.api.types.is_bool_dtype(x[feature])
+                        for feature in x.columns}
+        self._sorted = {}
+        self._codes = {}
+        self._lock = threading.Lock()
+        self.overviews = {}
+        for feature in x.columns:
+            for class_index, summary in enumerate(self._overviews(feature)):
+                self.overviews[class_index, feature] = summary
+
+    def _values(self, feature):
+        return self.x[feature].to_numpy(dtype=np.float64)
+
+    def _contributions(self, feature, class_index):
+        return self.contributions[class_index][feature].to_numpy(dtype=np.float64)
+
+    def _categories(self, feature):
+        """Categories by decreasing frequency and each row's position among them.
+
+        Beyond ``max_categories`` the least frequent are pooled into '(other)'.
+        """
+        if feature not in self._codes:
+            codes, labels = pd.factorize(self.x[feature], use_na_sentinel=False)
+            counts = np.bincount(codes, minlength=len(labels))
+            rank = np.empty(len(labels), dtype=np.int32)
+            rank[np.argsort(-counts, kind='stable')] = np.arange(len(labels))
+            rank = np.minimum(rank, self.max_categories - 1)
+            labels = [str(label) for label in labels[np.argsort(-counts, kind='stable')]]
+            if len(labels) > self.max_categories:
+                labels = labels[:self.max_categories - 1] + ['(other)']
+            self._codes[feature] = (labels, rank[codes])
+        return self._codes[feature]
+
+    def _overviews(self, feature):
+        """Overview of ``feature`` for every class, sharing the feature's bins between classes"""
+        if self.numeric[feature]:
+            values = self._values(feature)
+            edges = np.unique(np.quantile(values, np.linspace(0, 1, self.n_bins + 1)))
+            if len(edges) == 1:
+                edges = np.array([edges[0], edges[0]])
+            codes = np.searchsorted(edges[1:-1], values, side='right')
+            x_edges = _edges(values.min(), values.max(), self.grid_size)
+        else:
+            categories, codes = self._categories(feature)
+
+        summaries = []
+        for class_index in range(len(self.contributions)):
+            contributions = self._contributions(feature, class_index)
+            y_edges = _edges(contributions.min(), contributions.max(), self.grid_size)
+            summary = {'feature': str(feature), 'rows': len(contributions)}
+            if self.numeric[feature]:
+                summary['type'] = 'numeric'
+                summary['bins'] = [
+                    {'low': float(edges[i]), 'high': float(edges[i + 1]), **entry}
+                    for i, entry in _grouped_stats(codes, len(edges) - 1, contributions, values)
+                ]
+                summary['density'] = density(values, contributions, x_edges, y_edges)
+            else:
+                summary['type'] = 'categorical'
+                summary['bins'] = [
+                    {'category': categories[i], **entry}
+                    for i, entry in _grouped_stats(codes, len(categories), contributions)
+                ]
+                cells = codes * self.grid_size + _bin_codes(contributions, y_edges)
+                counts = np.bincount(cells, minlength=len(categories) * self.grid_size)
+                summary['density'] = {'categories': categories, 'y_edges': y_edges.tolist(),
+                                      'counts': counts.reshape(len(categories), self.grid_size).tolist()}
+            summaries.append(summary)
+        return summaries
+
+    def overview(self, feature, class_index=-1):
+        """Aggregated plot data for ``feature``, independent of the number of rows"""
+        return self.overviews[self._check(feature, class_index)]
+
+    def _check(self, feature, class_index):
+        if feature not in self.numeric:
+            raise ValueError(f"Unknown feature: {feature}")
+        if not -len(self.contributions) <= class_index < len(self.contributions):
+            raise ValueError(f"class must index one of {len(self.contributions)} contribution tables")
+        return class_index % len(self.contributions), feature
+
+    def _sorted_feature(self, feature):
+        """Values of a numeric feature in ascending order with their row positions, built on first use"""
+        with self._lock:
+            if feature not in self._sorted:
+                values = self._values(feature)
+                order = np.argsort(values, kind='stable')
+                self._sorted[feature] = (values[order], order)
+            return self._sorted[feature]
+
+    def window(self, feature, class_index=-1, x_range=None, y_range=None, category=None, max_points=None):
+        """Plot data for the rows of ``feature`` inside a zoom window.
+
+        ``x_range`` bounds numeric feature values and ``category`` selects a
+        category of a categorical feature; ``y_range`` bounds contributions.
+        """
+        class_index, feature = self._check(feature, class_index)
+        max_points = min(max_points or self.point_budget, self.point_budget)
+
+        if self.numeric[feature]:
+            sorted_values, order = self._sorted_feature(feature)
+            low, high = x_range if x_range is not None else (sorted_values[0], sorted_values[-1])
+            start = np.searchsorted(sorted_values, low, side='left')
+            stop = np.searchsorted(sorted_values, high, side='right')
+            positions, values = order[start:stop], sorted_values[start:stop]
+        elif category is None:
+            positions, values = np.arange(len(self.x)), None
+        else:
+            categories, codes = self._categories(feature)
+            if str(category) not in categories:
+                raise ValueError(f"Unknown category for {feature}: {category}")
+            positions, values = np.flatnonzero(codes == categories.index(str(category))), None
+        contributions = self._contributions(feature, class_index)[positions]
+        if y_range is not None:
+            keep = (contributions >= y_range[0]) & (contributions <= y_range[1])
+            positions, contributions = positions[keep], contributions[keep]
+            values = None if values is None else values[keep]
+
+        result = {'feature': str(feature), 'rows': len(positions)}
+        if len(positions) > max_points:
+            if values is not None:
+                x_edges = _edges(values.min(), values.max(), self.grid_size)
+                y_edges = _edges(contributions.min(), contributions.max(), self.grid_size)
+                result['density'] = density(values, contributions, x_edges, y_edges)
+            # A fixed-seed sample keeps repeated requests for a window identical
+            chosen = np.sort(np.random.default_rng(0).choice(len(positions), max_points, replace=False))
+            positions, contributions = positions[chosen], contributions[chosen]
+        result['level'] = 'points' if len(positions) == result['rows'] else 'sample'
+        shown = self.x[feature].iloc[positions]
+        result['points'] = [
+            {'index': index, 'value': value, 'contribution': contribution}
+            for index, value, contribution in zip(shown.index.tolist(), shown.tolist(), contributions.tolist())
+        ]
+        return result
+
+    def nbytes(self):
+        return sum(values.nbytes + order.nbytes for values, order in self._sorted.values()) + \
+            sum(codes.nbytes for _, codes in self._codes.values())
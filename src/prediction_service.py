@@ -0,0 +1,156 @@
+import queue
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+
+class PredictionService:
+    """Coalesces concurrent prediction calls into vectorized micro-batches.
+
+    Callers block in ``predict()`` while a single worker thread gathers every
+    request that arrives within ``max_latency_ms`` of the first one (up to
+    ``max_batch_rows`` rows), runs the model once per method and column layout,
+    and splits the results back. Predictions are memoized by row hash in an LRU
+    of ``cache_size`` rows, so repeated what-if rows never reach the model.
+    """
+
+    def __init__(self, model_handler, max_batch_rows=4096, max_latency_ms=5, cache_size=100000):
+        self.model_handler = model_handler
+        self.max_batch_rows = max_batch_rows
+        self.max_latency = max_latency_ms / 1000.0
+        self.cache_size = cache_size
+        self._queue = queue.Queue()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.batches = 0
+        self.rows_predicted = 0
+        self.cache_hits = 0
+        self.closed = False
+        self._close_lock = threading.Lock()
+        # The worker only holds a weak reference, so it never keeps the model alive
+        self._worker = threading.Thread(target=_serve, args=(weakref.ref(self), self._queue),
+                                        name='explainify-predict', daemon=True)
+        self._worker.start()
+
+    def close(self):
+        """Stop the worker thread once the requests already queued are answered"""
+        with self._close_lock:
+            self.closed = True
+            self._queue.put(None)
+
+    def predict(self, X, proba=False):
+        """Predict (or predict_proba) for the rows of ``X`` through the batching queue"""
+        X = pd.DataFrame(X)
+        method = 'predict_proba' if proba else 'predict'
+        keys = [(method, h) for h in pd.util.hash_pandas_object(X, index=False).to_numpy()]
+
+        results = [None] * len(keys)
+        missing = []
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[i] = self._cache[key]
+                else:
+                    missing.append(i)
+            self.cache_hits += len(keys) - len(missing)
+
+        if missing:
+            future = Future()
+            # Requests queued before close() are still answered, none after it
+            with self._close_lock:
+                if self.closed:
+                    raise ValueError("Prediction service is closed")
+                self._queue.put((method, X.iloc[missing], future))
+            for i, value in zip(missing, future.result()):
+                results[i] = value
+            with self._cache_lock:
+                for i in missing:
+                    self._cache[keys[i]] = results[i]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return np.asarray(results) if results else np.empty(0)
+
+    def _gather(self, first):
+        """The requests arriving within max_latency of ``first``; ends with None when closed"""
+        batch = [first]
+        rows = len(first[1])
+        deadline = time.monotonic() + self.max_latency
+        while rows < self.max_batch_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            if request is None:
+                break
+            rows += len(request[1])
+        return batch
+
+    def _run_batch(self, batch):
+        """Run one model call per (method, column layout) group and resolve the futures"""
+        groups = {}
+        for method, X, future in batch:
+            groups.setdefault((method, tuple(X.columns)), []).append((X, future))
+
+        for (method, _), requests in groups.items():
+            try:
+                X = pd.concat([X for X, _ in requests], ignore_index=True)
+                if method == 'predict_proba':
+                    predictions = self.model_handler.predict_proba(X)
+                else:
+                    predictions = self.model_handler.predict(X)
+                self.batches += 1
+                self.rows_predicted += len(X)
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for X, future in requests:
+                future.set_result(list(predictions[start:start + len(X)]))
+                start += len(X)
+
+    def stats(self):
+        with self._cache_lock:
+            cached_rows = len(self._cache)
+        return {
+            'batches': self.batches,
+            'rows_predicted': self.rows_predicted,
+            'cache_hits': self.cache_hits,
+            'cached_rows': cached_rows,
+            'max_batch_rows': self.max_batch_rows,
+            'max_latency_ms': self.max_latency * 1000.0,
+        }
+
+
+def _serve(service_ref, requests, poll_seconds=1.0):
+    """Worker loop: answer batches until the service is closed or garbage collected"""
+    while True:
+        try:
+            first = requests.get(timeout=poll_seconds)
+        except queue.Empty:
+            if service_ref() is None:
+                return
+            continue
+        if first is None:
+            return
+        service = service_ref()
+        if service is None:
+            return
+        batch = service._gather(first)
+        closing = batch[-1] is None
+        service._run_batch([request for request in batch if request is not None])
+        del service
+        if closing:
+            return
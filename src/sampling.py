@@ -0,0 +1,86 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+SAMPLING_STRATEGIES = ('uniform', 'target', 'prediction')
+
+
+def _strata_labels(values, n_bins=10):
+    """Group values into strata, binning continuous values by quantile"""
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values) and values.nunique() > 2 * n_bins:
+        return pd.qcut(values, q=n_bins, duplicates='drop').cat.codes
+    return values.astype('category').cat.codes
+
+
+def sample_rows(data, budget, strategy='uniform', strata=None, random_state=42):
+    """Return the sorted index of at most ``budget`` rows of ``data``.
+
+    ``uniform`` draws rows without replacement. ``target`` and ``prediction``
+    allocate the budget across strata of ``strata`` in proportion to their size
+    (every stratum keeps at least one row), so rare classes and value ranges
+    survive the subsampling.
+    """
+    if strategy not in SAMPLING_STRATEGIES:
+        raise ValueError(f"Unknown sampling strategy '{strategy}', expected one of {SAMPLING_STRATEGIES}")
+    if budget is None or len(data) <= budget:
+        return data.index
+
+    rng = np.random.default_rng(random_state)
+    if strategy == 'uniform':
+        positions = rng.choice(len(data), size=budget, replace=False)
+        return data.index[np.sort(positions)]
+
+    if strata is None:
+        raise ValueError(f"Stratified sampling by {strategy} needs the {strategy} values")
+    labels = np.asarray(_strata_labels(strata))
+    groups = [np.flatnonzero(labels == label) for label in np.unique(labels)]
+    sizes = np.array([len(group) for group in groups])
+    quota = np.maximum(1, np.floor(sizes * budget / sizes.sum()).astype(int))
+    # Hand rows lost to rounding to the largest strata
+    for i in np.argsort(-sizes)[:max(0, budget - quota.sum())]:
+        quota[i] += 1
+    quota = np.minimum(quota, sizes)
+
+    positions = np.concatenate([
+        rng.choice(group, size=k, replace=False) for group, k in zip(groups, quota)
+    ])
+    return data.index[np.sort(positions)]
+
+
+def importance_with_confidence(contributions, confidence=0.95):
+    """Mean absolute contribution per feature with a normal-approximation confidence interval.
+
+    Multi-class contributions (a list of frames) are averaged over classes first.
+    """
+    if isinstance(contributions, list):
+        values = np.mean([np.abs(c.to_numpy()) for c in contributions], axis=0)
+        columns = contributions[0].columns
+    else:
+        values = np.abs(contributions.to_numpy())
+        columns = contributions.columns
+    return importance_from_sums(columns, values.shape[0], values.sum(axis=0), (values ** 2).sum(axis=0), confidence)
+
+
+def importance_from_sums(columns, n, total, total_sq, confidence=0.95):
+    """Importance table from running sums of |contribution| and its square over ``n`` rows"""
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+    total = np.asarray(total, dtype=np.float64)
+    mean = total / max(n, 1)
+    if n > 1:
+        variance = np.maximum(np.asarray(total_sq, dtype=np.float64) - n * mean ** 2, 0) / (n - 1)
+        std_error = np.sqrt(variance / n)
+    else:
+        std_error = np.zeros_like(mean)
+    margin = NormalDist().inv_cdf(0.5 + confidence / 2) * std_error
+
+    result = pd.DataFrame({
+        'importance': mean,
+        'ci_low': mean - margin,
+        'ci_high': mean + margin,
+    }, index=columns)
+    result.attrs['n_rows'] = n
+    result.attrs['confidence'] = confidence
+    return result.sort_values('importance', ascending=False)
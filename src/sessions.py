@@ -0,0 +1,211 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class ExplanationSession:
+    """One compiled explainer and the Shapash dashboard serving it"""
+
+    def __init__(self, explainer, port, url, memory_bytes):
+        self.id = uuid.uuid4().hex
+        self.explainer = explainer
+        self.port = port
+        self.url = url
+        self.memory_bytes = memory_bytes
+        self.app = None
+        self.created_at = time.time()
+        self.last_access = self.created_at
+
+    def touch(self):
+        self.last_access = time.time()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'url': self.url,
+            'port': self.port,
+            'memory_bytes': self.memory_bytes,
+            'created_at': self.created_at,
+            'last_access': self.last_access,
+        }
+
+
+class SessionManager:
+    """Serves many explainers from one process, one dashboard port per session.
+
+    Sessions idle for longer than ``ttl_seconds`` are closed by a background
+    reaper, and the least recently used sessions are closed whenever admitting a
+    new one would take the estimated total memory past ``max_memory_bytes``.
+    """
+
+    def __init__(self, ports, host='localhost', ttl_seconds=1800, max_memory_bytes=4 * 1024 ** 3,
+                 reap_interval=60):
+        self.ports = list(ports)
+        self.host = host
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_bytes = max_memory_bytes
+        self.reap_interval = reap_interval
+        self._sessions = OrderedDict()
+        # Ports of closed sessions whose dashboards may still be listening
+        self._releasing = set()
+        self._lock = threading.Lock()
+        self._reaper = None
+        self.evictions = 0
+
+    def create(self, explainer, launch=True):
+        """Launch a dashboard for a compiled explainer and return its session.
+
+        With ``launch=False`` the session only serves the API routes: it takes
+        no port and starts no dashboard (benchmarks use this).
+        """
+        self.reap()
+        memory_bytes = explainer.memory_usage()
+
+        with self._lock:
+            evicted = self._make_room(memory_bytes)
+            session = self._reserve(explainer, memory_bytes, launch)
+
+        for old in evicted:
+            self._release(old)
+        if session is None:
+            # Every free port belonged to an evicted session, which is stopped now
+            with self._lock:
+                session = self._reserve(explainer, memory_bytes, launch)
+            if session is None:
+                raise RuntimeError("All dashboard ports are in use, try again later")
+        if not launch:
+            return session
+        port = session.port
+
+        try:
+            session.app = explainer.launch_webapp(port=port)
+            self._track_activity(session)
+        except Exception:
+            with self._lock:
+                self._sessions.pop(session.id, None)
+            raise
+        return session
+
+    def _make_room(self, memory_bytes):
+        """Pop least recently used sessions until ``memory_bytes`` fits under the cap"""
+        evicted = []
+        total = sum(s.memory_bytes for s in self._sessions.values())
+        while self._sessions and total + memory_bytes > self.max_memory_bytes:
+            session_id = min(self._sessions, key=lambda k: self._sessions[k].last_access)
+            session = self._sessions.pop(session_id)
+            total -= session.memory_bytes
+            self._releasing.add(session.port)
+            evicted.append(session)
+            self.evictions += 1
+        return evicted
+
+    def _reserve(self, explainer, memory_bytes, launch=True):
+        """Register a session on a free port, or return None when there is none; call with the lock held"""
+        if not launch:
+            session = ExplanationSession(explainer, None, None, memory_bytes)
+            self._sessions[session.id] = session
+            return session
+        port = self._free_port()
+        if port is None:
+            return None
+        session = ExplanationSession(explainer, port, f'http://{self.host}:{port}', memory_bytes)
+        self._sessions[session.id] = session
+        return session
+
+    def _free_port(self):
+        used = {s.port for s in self._sessions.values()} | self._releasing
+        for port in self.ports:
+            if port not in used:
+                return port
+        return None
+
+    def _track_activity(self, session):
+        """Refresh the session's idle timer whenever its dashboard serves a request"""
+        smartapp = getattr(session.explainer.explainer, 'smartapp', None)
+        if smartapp is None:
+            return
+        try:
+            smartapp.app.server.before_request(session.touch)
+        except Exception as e:
+            # Flask refuses new hooks once the server has handled a request
+            print(f"Could not track dashboard activity for session {session.id}: {str(e)}")
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is not None:
+            session.touch()
+        return session
+
+    def list(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+    def close(self, session_id):
+        """Stop a session's dashboard and release its port"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self._releasing.add(session.port)
+        self._release(session)
+        return True
+
+    def _release(self, session):
+        """Stop a closed session's dashboard, then make its port available again"""
+        try:
+            self._stop(session)
+        finally:
+            with self._lock:
+                self._releasing.discard(session.port)
+
+    @staticmethod
+    def _stop(session):
+        if session.app is not None:
+            session.app.kill()
+            session.app.join(timeout=5)
+        # The explainer stays on the session: requests that fetched it before it
+        # closed finish normally, and it is collected once they drop it
+        session.app = None
+
+    def reap(self):
+        """Close sessions that have been idle for longer than the TTL"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [s for s in self._sessions.values() if s.last_access < cutoff]
+            for session in expired:
+                del self._sessions[session.id]
+                self._releasing.add(session.port)
+                self.evictions += 1
+        for session in expired:
+            self._release(session)
+        return len(expired)
+
+    def start_reaper(self):
+        """Start a daemon thread that reaps idle sessions every ``reap_interval`` seconds"""
+        if self._reaper is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(self.reap_interval)
+                try:
+                    self.reap()
+                except Exception as e:
+                    print(f"Error reaping sessions: {str(e)}")
+
+        self._reaper = threading.Thread(target=loop, name='explainify-session-reaper', daemon=True)
+        self._reaper.start()
+
+    def stats(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            'sessions': len(sessions),
+            'ports': len(self.ports),
+            'memory_bytes': sum(s.memory_bytes for s in sessions),
+            'max_memory_bytes': self.max_memory_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,310 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+
+class UploadError(Exception):
+    """An upload request that cannot be honoured; ``status`` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Upload:
+    """One resumable upload being streamed into a partial file"""
+
+    def __init__(self, upload_id, filename, size, sha256=None, received=0, created=None):
+        self.id = upload_id
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.received = received
+        self.created = created or time.time()
+        self.updated = time.time()
+        self.digest = None
+        self.lock = threading.Lock()
+
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'received': self.received,
+            'complete': self.size is not None and self.received == self.size,
+        }
+
+
+class UploadManager:
+    """Resumable chunked uploads stored once per distinct content.
+
+    Chunks are appended to ``<upload_dir>/partial/<id>.part`` while a SHA-256
+    digest is updated from the same bytes, so finishing an upload never
+    re-reads the file. Finished files are moved to ``<upload_dir>/blobs``
+    under their content hash; uploading a file that is already stored just
+    returns the existing blob. Single files are capped at ``max_file_bytes``
+    and blobs plus partial uploads at ``quota_bytes``; the least recently used
+    blobs are dropped to make room, and partial uploads idle for longer than
+    ``ttl_seconds`` are discarded.
+    """
+
+    def __init__(self, upload_dir, max_file_bytes=8 * 1024 ** 3, quota_bytes=32 * 1024 ** 3,
+                 ttl_seconds=24 * 3600, read_size=1024 * 1024):
+        self.upload_dir = upload_dir
+        self.blob_dir = os.path.join(upload_dir, 'blobs')
+        self.partial_dir = os.path.join(upload_dir, 'partial')
+        self.max_file_bytes = max_file_bytes
+        self.quota_bytes = quota_bytes
+        self.ttl_seconds = ttl_seconds
+        self.read_size = read_size
+        self._uploads = {}
+        self._lock = threading.Lock()
+        self.deduplicated = 0
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+    @staticmethod
+    def _extension(filename):
+        return filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+
+    def _part_path(self, upload_id):
+        return os.path.join(self.partial_dir, f'{upload_id}.part')
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.partial_dir, f'{upload_id}.json')
+
+    def blob_path(self, file_id):
+        """Path of a stored file, or None when ``file_id`` does not name one"""
+        digest, _, extension = file_id.partition('.')
+        if len(digest) != 64 or not digest.isalnum() or not extension.isalnum():
+            return None
+        path = os.path.join(self.blob_dir, file_id)
+        if not os.path.exists(path):
+            return None
+        # Using a blob makes it recently used for quota eviction
+        os.utime(path)
+        return path
+
+    def _usage(self):
+        total = 0
+        for folder in (self.blob_dir, self.partial_dir):
+            for name in os.listdir(folder):
+                try:
+                    total += os.path.getsize(os.path.join(folder, name))
+                except FileNotFoundError:
+                    continue
+        return total
+
+    def _reserved(self):
+        """Bytes promised to partial uploads but not yet received"""
+        return sum(upload.size - upload.received for upload in self._uploads.values() if upload.size is not None)
+
+    def _make_room(self, size):
+        """Drop least recently used blobs until ``size`` more bytes fit in the quota"""
+        needed = self._usage() + self._reserved() + size - self.quota_bytes
+        if needed <= 0:
+            return
+        blobs = []
+        for name in os.listdir(self.blob_dir):
+            path = os.path.join(self.blob_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            blobs.append((stat.st_mtime, stat.st_size, path))
+        for _, blob_size, path in sorted(blobs):
+            if needed <= 0:
+                break
+            os.remove(path)
+            needed -= blob_size
+        if needed > 0:
+            raise UploadError("Upload quota exceeded", status=413)
+
+    def _save_meta(self, upload):
+        with open(self._meta_path(upload.id), 'w') as f:
+            json.dump({'filename': upload.filename, 'size': upload.size, 'sha256': upload.sha256,
+                       'created': upload.created}, f)
+
+    def create(self, filename, size, sha256=None):
+        """Start an upload; returns the Upload, or a finished file id when ``sha256`` is already stored.
+
+        A ``size`` of None streams a file of unknown length (capped at ``max_file_bytes``).
+        """
+        if size is not None and size < 0:
+            raise UploadError("size must be >= 0")
+        if size is not None and size > self.max_file_bytes:
+            raise UploadError(f"File exceeds the {self.max_file_bytes} byte limit", status=413)
+
+        if sha256:
+            file_id = f'{sha256.lower()}.{self._extension(filename)}'
+            if self.blob_path(file_id) is not None:
+                with self._lock:
+                    self.deduplicated += 1
+                return file_id
+
+        with self._lock:
+            self.reap()
+            self._make_room(size or 0)
+            upload = Upload(uuid.uuid4().hex, filename, size, sha256.lower() if sha256 else None)
+            upload.digest = hashlib.sha256()
+            open(self._part_path(upload.id), 'wb').close()
+            self._save_meta(upload)
+            self._uploads[upload.id] = upload
+        return upload
+
+    def get(self, upload_id):
+        """Return the Upload, reloading it from disk after a restart"""
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is not None or not upload_id.isalnum():
+                return upload
+            meta_path = self._meta_path(upload_id)
+            if not os.path.exists(meta_path):
+                return None
+            with open(meta_path) as f:
+                meta = json.load(f)
+            upload = Upload(upload_id, meta['filename'], meta['size'], meta['sha256'],
+                            received=os.path.getsize(self._part_path(upload_id)), created=meta['created'])
+            self._uploads[upload_id] = upload
+            return upload
+
+    def _resume_digest(self, upload):
+        """Rebuild the running hash from the partial file (only needed after a restart)"""
+        digest = hashlib.sha256()
+        with open(self._part_path(upload.id), 'rb') as f:
+            for chunk in iter(lambda: f.read(self.read_size), b''):
+                digest.update(chunk)
+        upload.digest = digest
+
+    def write_chunk(self, upload_id, offset, stream, length=None):
+        """Append bytes from ``stream`` at ``offset``; returns the new received count.
+
+        ``offset`` must equal the bytes already received, so a client that lost
+        a response asks for the upload's status and resends from there.
+        """
+        upload = self.get(upload_id)
+        if upload is None:
+            raise UploadError("Upload not found", status=404)
+        with upload.lock:
+            if offset != upload.received:
+                raise UploadError(f"Expected offset {upload.received}, got {offset}", status=409)
+            if upload.digest is None:
+                self._resume_digest(upload)
+
+            remaining = (upload.size if upload.size is not None else self.max_file_bytes) - upload.received
+            if length is not None and length > remaining:
+                raise UploadError(f"Chunk exceeds the declared size by {length - remaining} bytes", status=413)
+            written = 0
+            with open(self._part_path(upload.id), 'ab') as f:
+                try:
+                    for chunk in iter(lambda: stream.read(self.read_size), b''):
+                        written += len(chunk)
+                        if written > remaining:
+                            raise UploadError("Chunk exceeds the declared upload size", status=413)
+                        f.write(chunk)
+                        upload.digest.update(chunk)
+                except BaseException:
+                    # Any failure, a client disconnect included, drops the whole chunk so
+                    # the partial file matches upload.received and the client can resend it
+                    f.truncate(upload.received)
+                    upload.digest = None
+                    raise
+            upload.received += written
+            upload.updated = time.time()
+            return upload.received
+
+    def complete(self, upload_id):
+        """Finish an upload and return ``(file_id, deduplicated)``"""
+        upload = self.get(upload_id)
+        if upload is None:
+            raise UploadError("Upload not found", status=404)
+        with upload.lock:
+            if upload.size is None:
+                upload.size = upload.received
+                with self._lock:
+                    # The length was only known once the stream ended
+                    self._make_room(0)
+            if upload.received != upload.size:
+                raise UploadError(f"Upload incomplete: {upload.received} of {upload.size} bytes", status=409)
+            if upload.digest is None:
+                self._resume_digest(upload)
+            sha256 = upload.digest.hexdigest()
+            if upload.sha256 and upload.sha256 != sha256:
+                self.abort(upload_id)
+                raise UploadError("Content hash does not match the declared sha256")
+
+            file_id = f'{sha256}.{self._extension(upload.filename)}'
+            blob_path = os.path.join(self.blob_dir, file_id)
+            deduplicated = os.path.exists(blob_path)
+            if deduplicated:
+                os.remove(self._part_path(upload.id))
+                os.utime(blob_path)
+            else:
+                os.replace(self._part_path(upload.id), blob_path)
+            self._forget(upload.id)
+        if deduplicated:
+            with self._lock:
+                self.deduplicated += 1
+        return file_id, deduplicated
+
+    def store(self, stream, filename):
+        """Store a whole file from ``stream`` in one go (the non-resumable upload path)"""
+        upload = self.create(filename, None)
+        try:
+            self.write_chunk(upload.id, 0, stream)
+            return self.complete(upload.id)[0]
+        except Exception:
+            self.abort(upload.id)
+            raise
+
+    def _forget(self, upload_id):
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+        for path in (self._part_path(upload_id), self._meta_path(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def abort(self, upload_id):
+        """Discard a partial upload; returns False when there was none"""
+        if self.get(upload_id) is None:
+            return False
+        self._forget(upload_id)
+        return True
+
+    def reap(self):
+        """Forget partial uploads that have been idle for longer than the TTL"""
+        now = time.time()
+        for name in os.listdir(self.partial_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.partial_dir, name)
+            try:
+                idle = now - os.path.getmtime(self._part_path(name[:-5]))
+            except FileNotFoundError:
+                idle = now - os.path.getmtime(path)
+            if idle > self.ttl_seconds:
+                self._uploads.pop(name[:-5], None)
+                for stale in (path, self._part_path(name[:-5])):
+                    try:
+                        os.remove(stale)
+                    except FileNotFoundError:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            active = len(self._uploads)
+            reserved = self._reserved()
+        return {
+            'active_uploads': active,
+            'stored_files': len(os.listdir(self.blob_dir)),
+            'used_bytes': self._usage(),
+            'reserved_bytes': reserved,
+            'quota_bytes': self.quota_bytes,
+            'max_file_bytes': self.max_file_bytes,
+            'deduplicated': self.deduplicated,
+        }
@@ -0,0 +1,340 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.incremental import row_fingerprints
+
+# Perturbed copies of base rows are built as one frame, so a whole sweep or a
+# batch of counterfactual candidates costs a single model call
+
+# Rows of data a counterfactual search measures feature scales and draws values from
+SCALE_ROWS = 10000
+
+
+def row_digest(x):
+    """Content hash of encoded rows, independent of the index"""
+    return hashlib.sha256(row_fingerprints(x).tobytes()).hexdigest()
+
+
+def spec_key(spec):
+    return json.dumps(spec, sort_keys=True, default=str)
+
+
+def _json_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def decode_values(encoder, feature, values):
+    """JSON-ready feature values, labels for categorical features"""
+    if feature in encoder.categories:
+        return [None if pd.isna(label) else _json_value(label) for label in encoder.decode(feature, values)]
+    return [_json_value(value) for value in np.asarray(values)]
+
+
+def grid_values(data, encoder, feature, values=None, points=20, percentiles=(0.05, 0.95)):
+    """Encoded grid of ``feature``: the given raw ``values``, or ``points`` values spanning ``data``.
+
+    Numeric features take evenly spaced values between the ``percentiles`` of
+    the data (all distinct values when there are at most ``points``);
+    categorical features take their ``points`` most frequent categories.
+    """
+    if feature not in data.columns:
+        raise ValueError(f"Unknown feature: {feature}")
+    categorical = feature in encoder.categories
+    if values is not None:
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"values of {feature} must be a non-empty list")
+        if categorical:
+            codes = encoder.transform(pd.DataFrame({feature: values}))[feature].to_numpy()
+            if (codes < 0).any():
+                raise ValueError(f"Missing categories for {feature}")
+            return codes
+        try:
+            return np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError(f"values of {feature} must be numbers")
+    if points < 2:
+        raise ValueError("points must be at least 2")
+    column = data[feature].dropna()
+    if categorical:
+        return np.sort(column.value_counts().index[:points].to_numpy())
+    integer = pd.api.types.is_integer_dtype(column.dtype)
+    column = column.to_numpy(dtype=np.float64)
+    distinct = np.unique(column)
+    if len(distinct) <= points:
+        return distinct
+    values = np.linspace(*np.quantile(column, percentiles), points)
+    return np.unique(np.rint(values)) if integer else values
+
+
+def _output(model_handler, x):
+    """Model output for ``x``: class probabilities for classifiers, predictions otherwise"""
+    if model_handler.model_type == 'classification':
+        return np.asarray(model_handler.predict_proba(x))
+    return np.asarray(model_handler.predict(x))
+
+
+def sweep(model_handler, base, grid, encoder, ice=True, max_evaluations=1000000):
+    """ICE curves and partial dependence of ``base`` rows over a grid of feature values.
+
+    ``grid`` is a list of ``(feature, encoded values)``; with several features
+    every combination is evaluated (row-major, first feature slowest). All
+    ``len(base)`` x grid-size rows go to the model in one call.
+    """
+    features = [feature for feature, _ in grid]
+    if len(set(features)) != len(features):
+        raise ValueError("Each feature may appear in the grid only once")
+    mesh = [axis.ravel() for axis in np.meshgrid(*[values for _, values in grid], indexing='ij')]
+    n_rows, n_points = len(base), len(mesh[0])
+    if n_rows * n_points > max_evaluations:
+        raise ValueError(f"{n_rows} rows x {n_points} grid points exceeds {max_evaluations} evaluations")
+
+    columns = {column: np.repeat(base[column].to_numpy(), n_points) for column in base.columns}
+    for feature, values in zip(features, mesh):
+        columns[feature] = np.tile(values, n_rows).astype(np.result_type(base[feature].dtype, values.dtype))
+    output = _output(model_handler, pd.DataFrame(columns, columns=base.columns, copy=False))
+
+    result = {
+        'features': [str(feature) for feature in features],
+        'grid': [decode_values(encoder, feature, values) for feature, values in grid],
+        'shape': [len(values) for _, values in grid],
+        'rows': n_rows,
+        'evaluations': n_rows * n_points,
+    }
+    if model_handler.model_type == 'classification':
+        # (rows, points, classes); partial dependence and ICE per class
+        output = output.reshape(n_rows, n_points, -1)
+        classes = [_json_value(label) for label in model_handler.model.classes_]
+        result['classes'] = classes
+        result['partial_dependence'] = {str(label): output[:, :, c].mean(axis=0).tolist()
+                                        for c, label in enumerate(classes)}
+        if ice:
+            result['ice'] = {str(label): output[:, :, c].tolist() for c, label in enumerate(classes)}
+    elif model_handler.model_type == 'clustering':
+        # Share of the rows assigned to each cluster at every grid point
+        output = output.reshape(n_rows, n_points)
+        result['partial_dependence'] = {str(_json_value(label)): (output == label).mean(axis=0).tolist()
+                                        for label in np.unique(output)}
+        if ice:
+            result['ice'] = output.tolist()
+    else:
+        output = output.reshape(n_rows, n_points)
+        result['partial_dependence'] = output.mean(axis=0).tolist()
+        if ice:
+            result['ice'] = output.tolist()
+    return result
+
+
+def acceptance(model_handler, target=None, low=None, high=None):
+    """Test of the predictions a counterfactual must reach.
+
+    Classifiers and clustering models need a ``target`` class or cluster;
+    regressors a range, from ``low`` and/or to ``high``.
+    """
+    if model_handler.model_type == 'regression':
+        if low is None and high is None:
+            raise ValueError("A counterfactual for a regressor needs low and/or high")
+        low = -np.inf if low is None else float(low)
+        high = np.inf if high is None else float(high)
+        return lambda predictions: (predictions >= low) & (predictions <= high)
+    if target is None:
+        raise ValueError("A counterfactual needs a target class or cluster")
+    if model_handler.model_type == 'classification':
+        labels = np.asarray(model_handler.model.classes_)
+    else:
+        labels = model_handler.cluster_assigner().centroid_labels
+    # JSON targets may be numbers or strings whatever the label type
+    matches = [label for label in labels if label == target or str(label) == str(target)]
+    if not matches:
+        raise ValueError(f"Unknown target: {target}")
+    return lambda predictions: predictions == matches[0]
+
+
+class _Search:
+    """Candidate evaluation and distances for one counterfactual search"""
+
+    def __init__(self, model_handler, base, data, encoder, accept):
+        self.model_handler = model_handler
+        self.columns = base.columns
+        self.dtypes = base.dtypes
+        self.integer = np.array([pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)
+                                 for dtype in self.dtypes])
+        self.categorical = np.array([column in encoder.categories for column in self.columns])
+        self.base = base.to_numpy(dtype=np.float64)[0]
+        # Numeric changes are measured in standard deviations of the data
+        scale = data.to_numpy(dtype=np.float64).std(axis=0) if len(data) > 1 else np.ones(len(self.columns))
+        self.scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+        self.accept = accept
+        self.evaluations = 0
+        self.calls = 0
+
+    def frame(self, matrix):
+        return pd.DataFrame(matrix, columns=self.columns).astype(self.dtypes.to_dict())
+
+    def evaluate(self, matrix):
+        """Predictions for candidate rows and which of them reach the desired outcome"""
+        predictions = np.asarray(self.model_handler.predict(self.frame(matrix)))
+        self.evaluations += len(matrix)
+        self.calls += 1
+        return predictions, self.accept(predictions)
+
+    def distance(self, matrix):
+        """Standardized L1 distance to the base row, one per changed categorical feature"""
+        delta = matrix - self.base
+        return np.where(self.categorical, delta != 0, np.abs(delta) / self.scale).sum(axis=1)
+
+
+def counterfactual(model_handler, base, data, encoder, accept, mutable=None, max_evaluations=10000,
+                   max_seconds=5.0, batch_size=500, patience=3, random_state=42):
+    """Search for the row closest to ``base`` whose prediction satisfies ``accept``.
+
+    Candidates replace a random subset of the ``mutable`` features of the
+    base row with values of rows from ``data`` (preferring rows whose
+    mutable values alone are accepted, the closest of which seeds the
+    search), so they stay within the observed values; once
+    one is accepted its changes are also reverted or pulled halfway towards
+    the base row one feature at a time. Each batch of at most ``batch_size``
+    candidates is one model call, and every evaluated row, the base row and
+    scored donors included, counts towards ``max_evaluations``. The search
+    stops at ``max_evaluations`` rows, after ``max_seconds``, or once ``patience`` batches in a row found
+    nothing closer.
+    """
+    if max_evaluations < 1:
+        raise ValueError("max_evaluations must be at least 1")
+    if max_seconds <= 0:
+        raise ValueError("max_seconds must be positive")
+    start = time.perf_counter()
+    rng = np.random.default_rng(random_state)
+    if len(data) > SCALE_ROWS:
+        data = data.iloc[np.sort(rng.choice(len(data), SCALE_ROWS, replace=False))]
+    search = _Search(model_handler, base, data, encoder, accept)
+    columns = list(base.columns)
+    mutable = columns if mutable is None else mutable
+    unknown = [feature for feature in mutable if feature not in columns]
+    if unknown:
+        raise ValueError(f"Unknown features: {', '.join(map(str, unknown))}")
+    if not mutable:
+        raise ValueError("No features may change")
+    free = np.array([column in mutable for column in columns])
+
+    base_prediction, accepted = search.evaluate(search.base[None, :])
+    best, best_prediction, best_distance = None, None, np.inf
+    if accepted[0]:
+        best, best_prediction, best_distance = search.base, base_prediction[0], 0.0
+
+    donors = data.to_numpy(dtype=np.float64)
+    n_donors = min(batch_size, max_evaluations - search.evaluations)
+    if len(donors) > n_donors:
+        donors = donors[rng.choice(len(donors), n_donors, replace=False)]
+    if len(donors) and best is None:
+        # Donors carry over only their mutable features, so each scored donor is itself a candidate
+        projected = np.where(free, donors, search.base)
+        projected = np.where(search.integer, np.rint(projected), projected)
+        predictions, accepted = search.evaluate(projected)
+        if accepted.any():
+            distances = np.where(accepted, search.distance(projected), np.inf)
+            position = int(distances.argmin())
+            best, best_prediction, best_distance = projected[position], predictions[position], distances[position]
+            donors = donors[accepted]
+
+    stopped, stale = 'converged', 0
+    while best_distance > 0:
+        budget = min(batch_size, max_evaluations - search.evaluations)
+        if budget <= 0:
+            stopped = 'max_evaluations'
+            break
+        if time.perf_counter() - start >= max_seconds:
+            stopped = 'max_seconds'
+            break
+        if not len(donors):
+            break
+
+        candidates = []
+        if best is not None:
+            # Undo each change of the best candidate, or halve it for numeric features
+            for j in np.flatnonzero(best != search.base):
+                reverted = best.copy()
+                reverted[j] = search.base[j]
+                candidates.append(reverted)
+                if not search.categorical[j]:
+                    halved = best.copy()
+                    halved[j] = (best[j] + search.base[j]) / 2
+                    candidates.append(halved)
+        candidates = candidates[:budget]
+        n_random = budget - len(candidates)
+        if n_random > 0:
+            # Each random candidate changes a random share of the mutable features, at least one
+            changed = (rng.random((n_random, len(columns))) < rng.random((n_random, 1))) & free
+            changed[np.arange(n_random), rng.choice(np.flatnonzero(free), n_random)] = True
+            drawn = donors[rng.integers(len(donors), size=n_random)]
+            candidates.extend(np.where(changed, drawn, search.base))
+        matrix = np.array(candidates)
+        matrix = np.where(search.integer, np.rint(matrix), matrix)
+
+        predictions, accepted = search.evaluate(matrix)
+        distances = np.where(accepted, search.distance(matrix), np.inf)
+        position = int(distances.argmin())
+        if distances[position] < best_distance - 1e-12:
+            best, best_prediction, best_distance = matrix[position], predictions[position], distances[position]
+            stale = 0
+        else:
+            stale += 1
+            if stale >= patience and best is not None:
+                break
+
+    result = {
+        'found': best is not None,
+        'base_prediction': _json_value(base_prediction[0]),
+        'evaluations': search.evaluations,
+        'model_calls': search.calls,
+        'seconds': round(time.perf_counter() - start, 4),
+        'stopped': stopped,
+    }
+    if best is not None:
+        row = search.frame(best[None, :])
+        result['prediction'] = _json_value(best_prediction)
+        result['distance'] = float(best_distance)
+        result['counterfactual'] = {str(column): decode_values(encoder, column, row[column].to_numpy())[0]
+                                    for column in columns}
+        result['changes'] = [
+            {'feature': str(column), 'from': decode_values(encoder, column, base[column].to_numpy())[0],
+             'to': result['counterfactual'][str(column)]}
+            for column in columns if row[column].iloc[0] != base[column].iloc[0]
+        ]
+    return result
+
+
+class WhatIfCache:
+    """LRU of what-if results keyed by (model hash, base rows hash, perturbation spec)"""
+
+    def __init__(self, max_items=256):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'items': len(self._items), 'max_items': self.max_items, 'hits': self.hits, 'misses': self.misses}
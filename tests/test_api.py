@@ -0,0 +1,60 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+import app as explainify
+from src.explainer import XAIExplainer
+
+
+@pytest.fixture
+def session(tmp_path):
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({'x': rng.normal(size=60), 'color': rng.choice(['blue', 'green', 'red'], 60)})
+    codes = pd.Categorical(data['color']).codes
+    data['target'] = data['x'] * 2 + codes
+    data.to_csv(tmp_path / 'data.csv', index=False)
+    joblib.dump(LinearRegression().fit(pd.DataFrame({'x': data['x'], 'color': codes}), data['target']),
+                tmp_path / 'model.pkl')
+
+    explainer = XAIExplainer(explainify.model_registry.get(str(tmp_path / 'model.pkl')), str(tmp_path / 'data.csv'))
+    assert explainer.compile_explainer(), explainer.compile_error
+    session = explainify.session_manager.create(explainer, launch=False)
+    yield session
+    explainify.session_manager.close(session.id)
+
+
+@pytest.fixture
+def client():
+    return explainify.app.test_client()
+
+
+def test_unknown_labels_are_a_bad_request(client, session):
+    rows = [{'x': 0.5, 'color': 'purple'}]
+    response = client.post('/api/predict', json={'session_id': session.id, 'rows': rows})
+    assert response.status_code == 400
+    assert "'color'" in response.get_json()['error'] and 'purple' in response.get_json()['error']
+    response = client.post(f'/api/explain/{session.id}/row', json={'features': rows[0]})
+    assert response.status_code == 400
+    response = client.post('/api/whatif', json={'session_id': session.id, 'rows': rows,
+                                                'grid': {'feature': 'x', 'points': 3}})
+    assert response.status_code == 400
+
+
+def test_predict_matches_the_explained_row(client, session):
+    explainer = session.explainer
+    row = {'x': 0.25, 'color': 'red'}
+    response = client.post('/api/predict', json={'session_id': session.id, 'rows': [row]})
+    assert response.status_code == 200
+    explained = client.post(f'/api/explain/{session.id}/row', json={'features': row}).get_json()
+    assert response.get_json()['predictions'][0] == pytest.approx(explained['prediction'])
+    assert response.get_json()['predictions'][0] == pytest.approx(0.5 + 2)
+    # The model sees the dataset's compact dtypes on both paths
+    assert explainer.encode_rows([row]).dtypes.to_dict() == explainer.features.dtypes.to_dict()
+
+
+def test_predict_rejects_missing_features(client, session):
+    response = client.post('/api/predict', json={'session_id': session.id, 'rows': [{'x': 1.0}]})
+    assert response.status_code == 400
+    assert 'color' in response.get_json()['error']
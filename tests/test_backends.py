@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+import shap
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import GammaRegressor, LinearRegression, LogisticRegression, PoissonRegressor, \
+    TweedieRegressor
+
+from src.backends import KernelBackend, LinearBackend, TreeBackend, select_backend, summarize_background
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    x = pd.DataFrame(rng.normal(size=(200, 3)), columns=['a', 'b', 'c'])
+    y = 2 * x['a'] - x['b'] + 0.5 * x['a'] * x['c'] + rng.normal(0, 0.1, len(x))
+    return x, y
+
+
+def contributions(backend_cls, model, x, background=None):
+    if background is None:
+        background = summarize_background(backend_cls, x)
+    return backend_cls(model, masker=background).run_explainer(x)['contributions']
+
+
+def test_linear_matches_shap(data):
+    x, y = data
+    model = LinearRegression().fit(x, y)
+    expected = shap.LinearExplainer(model, shap.maskers.Independent(x, max_samples=len(x))).shap_values(x)
+    np.testing.assert_allclose(contributions(LinearBackend, model, x), expected, atol=1e-10)
+
+
+def test_logistic_matches_shap_in_log_odds(data):
+    x, y = data
+    model = LogisticRegression().fit(x, y > 0)
+    expected = shap.LinearExplainer(model, shap.maskers.Independent(x, max_samples=len(x))).shap_values(x)
+    np.testing.assert_allclose(contributions(LinearBackend, model, x), expected, atol=1e-10)
+
+
+def test_tree_matches_shap_and_adds_up(data):
+    x, y = data
+    model = RandomForestRegressor(n_estimators=10, max_depth=4, random_state=0).fit(x, y)
+    explainer = shap.TreeExplainer(model, feature_perturbation='tree_path_dependent')
+    values = contributions(TreeBackend, model, x)
+    np.testing.assert_allclose(values, explainer.shap_values(x), atol=1e-10)
+    np.testing.assert_allclose(values.sum(axis=1) + explainer.expected_value, model.predict(x), atol=1e-6)
+
+
+def test_kernel_matches_exact_linear_contributions(data):
+    x, y = data
+    model = LinearRegression().fit(x, y)
+    background = summarize_background(KernelBackend, x)
+    mean = np.average(background.data, axis=0, weights=background.weights)
+    # Three features leave few enough coalitions for KernelSHAP to enumerate them all
+    expected = (x.to_numpy() - mean) * model.coef_
+    np.testing.assert_allclose(contributions(KernelBackend, model, x.iloc[:20], background), expected[:20], atol=1e-8)
+
+
+@pytest.mark.parametrize('model,backend', [
+    (LinearRegression(), 'linear'),
+    (TweedieRegressor(power=0), 'linear'),
+    (TweedieRegressor(power=1.5, link='identity'), 'linear'),
+    (PoissonRegressor(), 'kernel'),
+    (GammaRegressor(), 'kernel'),
+    (TweedieRegressor(power=1.5), 'kernel'),
+])
+@pytest.mark.filterwarnings('ignore::sklearn.exceptions.ConvergenceWarning')
+def test_log_link_regressors_are_not_explained_linearly(data, model, backend):
+    x, y = data
+    model.fit(x, np.exp(y / 8))
+    assert select_backend(model).name == backend
+    if backend != 'linear':
+        with pytest.raises(ValueError):
+            select_backend(model, 'linear')
@@ -0,0 +1,75 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression, LogisticRegression
+
+from src.bundles import BundleStore
+from src.explainer import XAIExplainer
+from src.model_handler import ModelHandler
+
+
+def compile_explainer(tmp_path, classes=None):
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.normal(size=(80, 3)), columns=['a', 'b', 'c'])
+    if classes is None:
+        data['target'] = data.sum(axis=1)
+        model = LinearRegression()
+    else:
+        data['target'] = pd.qcut(data['a'] + data['b'], classes, labels=False)
+        model = LogisticRegression()
+    data.to_csv(tmp_path / 'data.csv', index=False)
+    joblib.dump(model.fit(data[['a', 'b', 'c']], data['target']), tmp_path / 'model.pkl')
+    explainer = XAIExplainer(ModelHandler(str(tmp_path / 'model.pkl')), str(tmp_path / 'data.csv'))
+    assert explainer.compile_explainer(), explainer.compile_error
+    return explainer
+
+
+@pytest.mark.parametrize('classes', [None, 3])
+def test_export_round_trip(tmp_path, classes):
+    explainer = compile_explainer(tmp_path, classes)
+    smart = explainer.explainer
+    store = BundleStore(str(tmp_path / 'bundles'))
+    bundle_id, manifest = store.export(explainer)
+
+    bundle = store.get(bundle_id)
+    assert bundle.manifest == manifest
+    assert manifest['rows'] == len(smart.x_init) and manifest['features'] == ['a', 'b', 'c']
+    contributions = smart.contributions if isinstance(smart.contributions, list) else [smart.contributions]
+    assert len(manifest['contributions']) == len(contributions)
+
+    rows = bundle.rows(offset=5, limit=10, class_index=0)
+    assert len(rows) == 10
+    for i, row in enumerate(rows):
+        position = 5 + i
+        assert row['row_id'] == smart.x_init.index[position]
+        assert row['features'] == pytest.approx(smart.x_init.iloc[position].to_dict())
+        assert row['prediction'] == pytest.approx(smart.y_pred.iloc[position, 0])
+        assert row['contributions'] == pytest.approx(contributions[0].iloc[position].to_dict(), rel=1e-6)
+    assert len(bundle.rows(offset=75, limit=10)) == 5
+
+    importance = {entry['feature']: entry['importance'] for entry in bundle.importance()}
+    expected = explainer.global_importance()['importance']
+    assert importance == pytest.approx(expected.to_dict())
+    assert store.stats()['bundles'] == 1 and store.stats()['open_bundles'] == 1
+
+
+@pytest.mark.parametrize('bundle_id', ['..', '../bundles', 'a/b', '', 'missing'])
+def test_ids_outside_the_store_are_not_bundles(tmp_path, bundle_id):
+    store = BundleStore(str(tmp_path / 'bundles'))
+    # A directory an id with a path in it could reach
+    os.makedirs(tmp_path / 'bundles' / 'a' / 'b')
+    assert store.get(bundle_id) is None
+    assert not store.delete(bundle_id)
+    assert os.path.isdir(tmp_path / 'bundles' / 'a' / 'b')
+
+
+def test_deleted_bundles_are_gone(tmp_path):
+    store = BundleStore(str(tmp_path / 'bundles'), max_open=1)
+    bundle_id, _ = store.export(compile_explainer(tmp_path))
+    assert store.get(bundle_id) is not None
+    assert store.delete(bundle_id)
+    assert store.get(bundle_id) is None
+    assert not store.delete(bundle_id)
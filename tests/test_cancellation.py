@@ -0,0 +1,56 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from src.explainer import XAIExplainer
+from src.jobs import Job, JobCancelled
+from src.model_handler import ModelHandler
+
+
+@pytest.fixture
+def explainer(tmp_path):
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.normal(size=(400, 3)), columns=['a', 'b', 'c'])
+    data['target'] = data.sum(axis=1)
+    data.to_csv(tmp_path / 'data.csv', index=False)
+    joblib.dump(LinearRegression().fit(data[['a', 'b', 'c']], data['target']), tmp_path / 'model.pkl')
+
+    def make(**options):
+        return XAIExplainer(ModelHandler(str(tmp_path / 'model.pkl')), str(tmp_path / 'data.csv'), **options)
+    return make
+
+
+def cancel_after(calls):
+    job = Job()
+    seen = []
+
+    def checkpoint():
+        seen.append(None)
+        if len(seen) == calls:
+            job._cancel_event.set()
+        job.check_cancelled()
+    return checkpoint, seen
+
+
+@pytest.mark.parametrize('calls', [1, 3, 5, 8])
+def test_cancel_between_stages_and_chunks(explainer, calls):
+    # Four chunks of 100 rows add a checkpoint after each chunk
+    compiled = explainer(n_jobs=2, chunk_size=100)
+    checkpoint, seen = cancel_after(calls)
+    with pytest.raises(JobCancelled):
+        compiled.compile_explainer(checkpoint=checkpoint)
+    assert len(seen) == calls
+    assert compiled.explainer is None and compiled.plot_data is None
+
+
+def test_checkpoints_cover_every_stage(explainer):
+    compiled = explainer(n_jobs=2, chunk_size=100)
+    checkpoint, seen = cancel_after(0)
+    assert compiled.compile_explainer(checkpoint=checkpoint)
+    # Six stage checkpoints and one after each of the four chunks
+    assert len(seen) == 10
+    # A finished compile does not keep its job's checkpoint
+    assert compiled.compile_explainer()
+    assert len(seen) == 10
@@ -0,0 +1,65 @@
+import threading
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.cluster import AgglomerativeClustering, KMeans
+
+from src.model_handler import ModelHandler
+from src.model_registry import ModelRegistry
+
+
+def fit(tmp_path, model, x):
+    path = tmp_path / 'model.pkl'
+    joblib.dump(model.fit(x), path)
+    return str(path)
+
+
+def test_datasets_get_their_own_cluster_index(tmp_path):
+    rng = np.random.default_rng(0)
+    first = np.vstack([rng.normal(0, 0.1, (10, 2)), rng.normal(5, 0.1, (10, 2))])
+    second = first[::-1] + 100
+    registry = ModelRegistry()
+    shared = registry.get(fit(tmp_path, AgglomerativeClustering(n_clusters=2), first))
+    labels = shared.model.labels_
+
+    one = shared.with_data(first)
+    other = shared.with_data(second)
+    assert one is not shared and one.model is shared.model
+    np.testing.assert_array_equal(one.predict(first), labels)
+    np.testing.assert_array_equal(other.predict(second), labels)
+    # Each view keeps its own index, and the shared handler never gets one
+    np.testing.assert_array_equal(one.predict(first), labels)
+    assert one.cluster_assigner() is not other.cluster_assigner()
+    with pytest.raises(ValueError):
+        shared.cluster_assigner()
+
+
+def test_centroid_models_are_not_bound_to_a_dataset(tmp_path):
+    x = np.vstack([np.zeros((5, 2)), np.ones((5, 2)) * 3])
+    handler = ModelHandler(fit(tmp_path, KMeans(n_clusters=2, n_init=1, random_state=0), x))
+    assert handler.with_data(x) is handler
+    np.testing.assert_array_equal(handler.predict(x), handler.model.labels_)
+
+
+def test_concurrent_digest_lookups(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f'{i}.bin'
+        path.write_bytes(bytes([i]) * 1000)
+        paths.append(str(path))
+    registry = ModelRegistry()
+    digests = {}
+
+    def look_up():
+        for _ in range(50):
+            for path in paths:
+                digests.setdefault(path, set()).add(registry.digest(path))
+
+    threads = [threading.Thread(target=look_up) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(len(found) == 1 for found in digests.values())
+    assert len({next(iter(found)) for found in digests.values()}) == len(paths)
@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.contribution_store import ARRAY_NAME, INDEX_NAME, ContributionStore, trim_stores, write_store
+
+
+def contributions(seed=0, rows=500, index=None):
+    rng = np.random.default_rng(seed)
+    # Columns of very different magnitudes, each quantized on its own scale
+    values = rng.normal(size=(rows, 4)) * np.array([0.001, 1.0, 50.0, 1e4])
+    return pd.DataFrame(values, columns=['a', 'b', 'c', 'd'], index=index)
+
+
+@pytest.mark.parametrize('dtype', ['float32', 'int16', 'int8'])
+def test_round_trip_error_is_bounded_per_column(tmp_path, dtype):
+    frame = contributions()
+    write_store(str(tmp_path / 'store'), frame, dtype)
+    stored = ContributionStore(str(tmp_path / 'store')).frames()
+
+    assert stored.dtypes.eq(np.float32).all()
+    pd.testing.assert_index_equal(stored.index, frame.index)
+    for feature in frame.columns:
+        peak = frame[feature].abs().max()
+        error = (stored[feature].to_numpy(dtype=np.float64) - frame[feature]).abs().max()
+        if dtype == 'float32':
+            assert error <= peak * np.finfo(np.float32).eps
+        else:
+            # Half a quantization step, plus float32 rounding of the decoded value
+            bound = peak / (2 * np.iinfo(dtype).max) + peak * np.finfo(np.float32).eps
+            assert error <= bound, feature
+
+
+def test_multiclass_layout(tmp_path):
+    frames = [contributions(seed) for seed in range(3)]
+    write_store(str(tmp_path / 'store'), frames)
+    store = ContributionStore(str(tmp_path / 'store'))
+
+    assert store.index['multiclass'] and store.index['classes'] == 3
+    assert store.array.shape == (3, 4, 500)
+    # Every feature column of every class is contiguous
+    np.testing.assert_array_equal(store.array[1, 2], frames[1]['c'].to_numpy(dtype=np.float32))
+    for c, frame in enumerate(store.frames()):
+        pd.testing.assert_frame_equal(frame, frames[c].astype(np.float32))
+    np.testing.assert_array_equal(store.column('d', class_index=-1), store.array[2, 3])
+    with pytest.raises(ValueError):
+        store.column('a', class_index=3)
+
+
+def test_top_rows_and_top_features(tmp_path):
+    frame = contributions(index=pd.Index([f'row{i}' for i in range(500)]))
+    write_store(str(tmp_path / 'store'), frame)
+    store = ContributionStore(str(tmp_path / 'store'))
+
+    positions, values = store.top_rows('b', k=5)
+    expected = frame['b'].abs().to_numpy().argsort()[::-1][:5]
+    np.testing.assert_array_equal(positions, expected)
+    np.testing.assert_allclose(values, frame['b'].to_numpy()[expected], rtol=1e-6)
+    assert len(store.top_rows('b', k=1000)[0]) == 500
+
+    row = frame.iloc[7]
+    top = store.top_features(7, k=2)
+    assert [feature for feature, _ in top] == list(row.abs().sort_values(ascending=False).index[:2])
+    assert top[0][1] == pytest.approx(row[top[0][0]], rel=1e-6)
+    assert [feature for feature, _ in store.top_features(7, features=['a', 'b'])] == \
+        list(row[['a', 'b']].abs().sort_values(ascending=False).index)
+    with pytest.raises(ValueError):
+        store.top_rows('missing')
+
+
+def test_trim_stores_keeps_the_most_recently_used(tmp_path):
+    paths = [str(tmp_path / name) for name in ('old', 'middle', 'new')]
+    for age, path in enumerate(paths):
+        write_store(path, contributions(age))
+        os.utime(os.path.join(path, INDEX_NAME), (age, age))
+    size = sum(os.path.getsize(os.path.join(paths[0], entry)) for entry in os.listdir(paths[0]))
+    # Opening a store marks it as used
+    ContributionStore(paths[0])
+
+    trim_stores(str(tmp_path), 2 * size)
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
+    trim_stores(str(tmp_path), 0)
+    assert os.listdir(tmp_path) == []
+
+
+def test_unknown_dtype_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        write_store(str(tmp_path / 'store'), contributions(), 'float16')
+    assert not os.path.exists(tmp_path / 'store' / ARRAY_NAME)
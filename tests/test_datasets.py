@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import src.explainer_cache as explainer_cache
+from src.explainer_cache import compile_key, file_digest
+from src.ingest import load_dataset
+
+
+def write_csv(path, seed, rows=200):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame(rng.normal(size=(rows, 4)), columns=list('abcd')).to_csv(path, index=False)
+    return str(path)
+
+
+def test_unchanged_files_are_hashed_once(tmp_path, monkeypatch):
+    path = write_csv(tmp_path / 'data.csv', 0)
+    digest = file_digest(path)
+    opened = []
+    real_open = open
+    monkeypatch.setattr('builtins.open', lambda *args, **kwargs: opened.append(args[0]) or real_open(*args, **kwargs))
+    assert file_digest(path) == digest
+    assert opened == []
+
+
+def test_changed_files_change_the_cache_keys(tmp_path):
+    data = write_csv(tmp_path / 'data.csv', 0)
+    model = tmp_path / 'model.pkl'
+    model.write_bytes(b'model')
+    key = compile_key(str(model), data, {'backend': 'auto'})
+    assert compile_key(str(model), data, {'backend': 'auto'}) == key
+    assert compile_key(str(model), data, {'backend': 'tree'}) != key
+
+    write_csv(data, 1)
+    os.utime(data, ns=(0, 1))
+    changed = compile_key(str(model), data, {'backend': 'auto'})
+    assert changed != key
+    model.write_bytes(b'other model')
+    assert compile_key(str(model), data, {'backend': 'auto'}) not in (key, changed)
+
+
+def test_dataset_cache_round_trips_and_is_trimmed(tmp_path):
+    cache_dir = tmp_path / 'datasets'
+    paths = [write_csv(tmp_path / f'{i}.csv', i) for i in range(4)]
+    first = load_dataset(paths[0], cache_dir=str(cache_dir))
+    pd.testing.assert_frame_equal(load_dataset(paths[0], cache_dir=str(cache_dir)), first)
+
+    def cached(path):
+        return cache_dir / f'{file_digest(path)}.arrow'
+
+    size = os.path.getsize(cached(paths[0]))
+    for i, path in enumerate(paths):
+        load_dataset(path, cache_dir=str(cache_dir), cache_bytes=2 * size)
+        os.utime(cached(path), (i * 10, i * 10))
+    # Only the two most recently used files fit
+    assert sorted(os.listdir(cache_dir)) == sorted(cached(path).name for path in paths[2:])
+
+
+def test_digest_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(explainer_cache, 'DIGEST_CACHE_ITEMS', 3)
+    for i in range(5):
+        path = tmp_path / f'{i}.bin'
+        path.write_bytes(bytes([i]))
+        file_digest(str(path))
+    assert len(explainer_cache._digests) <= 3
@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from src.encoding import CategoricalEncoder, EncoderStore
+
+
+def frame():
+    return pd.DataFrame({
+        'text': ['b', 'a', None, 'b'],
+        'objects': pd.Series([10, 2, 10, 7], dtype=object),
+        'ints': pd.Categorical([3, 1, 2, 3]),
+        'floats': pd.Categorical([0.1, 1 / 3, float('inf'), 0.1]),
+        'flags': pd.Categorical([True, False, True, True]),
+        'dates': pd.Categorical(pd.to_datetime(['2024-01-01', '2024-06-30 12:00:00.000000001', None, '2024-01-01'], format='ISO8601')),
+        'value': [1.0, 2.0, 3.0, 4.0],
+    })
+
+
+def test_labels_round_trip_with_their_types(tmp_path):
+    data = frame()
+    fitted = EncoderStore(str(tmp_path)).get(data, 'model')
+    loaded = EncoderStore(str(tmp_path)).get(data, 'model')
+    assert set(loaded.categories) == set(fitted.categories)
+    for column, labels in fitted.categories.items():
+        tm.assert_index_equal(loaded.categories[column], labels)
+        assert [type(label) for label in loaded.categories[column]] == [type(label) for label in labels]
+    tm.assert_frame_equal(loaded.transform(data), fitted.transform(data))
+    # Integer labels in object columns stay integers, sorted numerically
+    assert list(loaded.categories['objects']) == [2, 7, 10]
+    np.testing.assert_array_equal(loaded.transform(data)['objects'], [2, 0, 2, 1])
+
+
+def test_unversioned_files_still_load(tmp_path):
+    data = pd.DataFrame({'text': ['x', 'y'], 'value': [1.0, 2.0]})
+    EncoderStore(str(tmp_path)).get(data, 'model')
+    path = next(tmp_path.iterdir())
+    path.write_text(json.dumps({'text': ['y', 'x']}))
+    loaded = EncoderStore(str(tmp_path)).get(data, 'model')
+    assert list(loaded.categories['text']) == ['y', 'x']
+
+
+def test_unstorable_labels_keep_the_encoder_in_memory(tmp_path):
+    data = pd.DataFrame({'obj': pd.Series([(1, 2), (3, 4)], dtype=object)})
+    encoder = EncoderStore(str(tmp_path)).get(data, 'model')
+    assert isinstance(encoder, CategoricalEncoder)
+    np.testing.assert_array_equal(encoder.transform(data)['obj'], [0, 1])
+    assert not any(path.suffix == '.json' for path in tmp_path.iterdir())
+
+
+def test_unknown_labels_are_rejected():
+    encoder = CategoricalEncoder()
+    encoder.fit(pd.DataFrame({'color': ['red', 'blue'], 'size': pd.Categorical(['s', 'm'])}))
+    with pytest.raises(ValueError, match="feature 'color': 'green'"):
+        encoder.transform(pd.DataFrame({'color': ['red', 'green'], 'size': ['s', 's']}))
+    with pytest.raises(ValueError, match="feature 'size': 'xl'"):
+        encoder.transform(pd.DataFrame({'color': ['red'], 'size': pd.Categorical(['xl'])}))
+    # Missing values are not unknown labels
+    np.testing.assert_array_equal(encoder.transform(pd.DataFrame({'color': ['red', None]}))['color'], [1, -1])
+
+
+def test_codes_are_stable_per_model_and_independent_across_models(tmp_path):
+    first = pd.DataFrame({'color': ['red', 'blue']})
+    later = pd.DataFrame({'color': ['green', 'red']})
+    store = EncoderStore(str(tmp_path))
+    store.get(first, 'model-a')
+    # A later dataset keeps model-a's codes and appends its new label
+    encoder = store.get(later, 'model-a')
+    assert list(encoder.categories['color']) == ['blue', 'red', 'green']
+    np.testing.assert_array_equal(encoder.transform(later)['color'], [2, 1])
+    # Another model with the same columns starts from its own data, in sorted order
+    other = EncoderStore(str(tmp_path)).get(later, 'model-b')
+    assert list(other.categories['color']) == ['green', 'red']
+    # and model-a's codes survive a restart
+    restarted = EncoderStore(str(tmp_path)).get(first, 'model-a')
+    np.testing.assert_array_equal(restarted.transform(first)['color'], [1, 0])
@@ -0,0 +1,81 @@
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from src.explainer import XAIExplainer
+from src.explainer_cache import ExplainerCache
+from src.model_handler import ModelHandler
+
+
+def write_data(path, seed):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame(rng.normal(size=(120, 3)), columns=['a', 'b', 'c'])
+    data['target'] = data.sum(axis=1)
+    data.to_csv(path, index=False)
+    # Rewrites within one mtime tick must still look changed
+    os.utime(path, ns=(seed + 1, seed + 1))
+    return data
+
+
+@pytest.fixture
+def files(tmp_path):
+    data = write_data(tmp_path / 'data.csv', 0)
+    joblib.dump(LinearRegression().fit(data[['a', 'b', 'c']], data['target']), tmp_path / 'model.pkl')
+    return str(tmp_path / 'model.pkl'), str(tmp_path / 'data.csv')
+
+
+def compile_with(cache, model_path, data_path, **options):
+    explainer = XAIExplainer(ModelHandler(model_path), data_path, cache=cache, **options)
+    assert explainer.compile_explainer(), explainer.compile_error
+    return explainer.backend_report.get('cached', False)
+
+
+def test_hits_until_the_model_data_or_settings_change(files, tmp_path):
+    model_path, data_path = files
+    cache = ExplainerCache(str(tmp_path / 'cache'))
+    assert not compile_with(cache, model_path, data_path)
+    assert compile_with(cache, model_path, data_path)
+
+    assert not compile_with(cache, model_path, data_path, sample_size=50)
+    assert compile_with(cache, model_path, data_path, sample_size=50)
+    assert not compile_with(cache, model_path, data_path, sample_size=50, random_state=1)
+
+    write_data(data_path, 1)
+    assert not compile_with(cache, model_path, data_path)
+    joblib.dump(LinearRegression().fit([[0, 0, 0], [1, 1, 1]], [0, 3]), model_path)
+    assert not compile_with(cache, model_path, data_path)
+    assert cache.hits == 2
+
+
+def test_entries_survive_a_restart(files, tmp_path):
+    model_path, data_path = files
+    compile_with(ExplainerCache(str(tmp_path / 'cache')), model_path, data_path)
+    restarted = ExplainerCache(str(tmp_path / 'cache'))
+    assert compile_with(restarted, model_path, data_path)
+    assert restarted.disk_hits == 1
+
+
+def test_mapped_contributions_are_not_cached(files, tmp_path):
+    model_path, data_path = files
+    store_dir = str(tmp_path / 'stores')
+    options = {'contribution_store_dir': store_dir, 'contribution_dtype': 'float32'}
+    compiled = XAIExplainer(ModelHandler(model_path), data_path, cache=ExplainerCache(str(tmp_path / 'cache')), **options)
+    assert compiled.compile_explainer(), compiled.compile_error
+    entries = [name for name in os.listdir(tmp_path / 'cache') if name.endswith('.joblib')]
+    cached = joblib.load(tmp_path / 'cache' / entries[0])
+    assert cached.contributions is None and cached.data is None
+
+    restarted = XAIExplainer(ModelHandler(model_path), data_path, cache=ExplainerCache(str(tmp_path / 'cache')), **options)
+    assert restarted.compile_explainer() and restarted.backend_report['cached']
+    pd.testing.assert_frame_equal(restarted.explainer.contributions, compiled.explainer.contributions)
+    assert restarted.explainer.data is not None
+
+    # Without its store the entry is recompiled rather than served without contributions
+    for name in os.listdir(store_dir):
+        shutil.rmtree(os.path.join(store_dir, name))
+    assert not compile_with(ExplainerCache(str(tmp_path / 'cache')), model_path, data_path, **options)
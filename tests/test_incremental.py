@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+from src.backends import LinearBackend, summarize_background
+from src.incremental import IncrementalStore, background_digest
+
+
+def explain(store, model, x):
+    background = summarize_background(LinearBackend, x)
+    key = ('model', tuple(x.columns), LinearBackend.name, background_digest(background))
+
+    def compute(backend, background, rows):
+        return backend.run_explainer(rows)['contributions'], model.predict(rows)
+
+    return store.explain(key, x, lambda: (LinearBackend(model, masker=background), background), compute)
+
+
+def test_later_dataset_is_explained_against_its_own_background():
+    rng = np.random.default_rng(0)
+    first = pd.DataFrame(rng.normal(size=(200, 3)), columns=['a', 'b', 'c'])
+    second = pd.concat([first, pd.DataFrame(rng.normal(5, 1, size=(50, 3)), columns=['a', 'b', 'c'])],
+                       ignore_index=True)
+    model = LinearRegression().fit(first, first.sum(axis=1))
+    store = IncrementalStore()
+
+    explain(store, model, first)
+    contributions, _, _, _, report = explain(store, model, second)
+    fresh = LinearBackend(model, masker=summarize_background(LinearBackend, second)).run_explainer(second)
+    np.testing.assert_allclose(contributions, fresh['contributions'])
+    assert report['reused_rows'] == 0
+
+
+def test_same_dataset_reuses_its_rows():
+    rng = np.random.default_rng(1)
+    x = pd.DataFrame(rng.normal(size=(100, 2)), columns=['a', 'b'])
+    model = LinearRegression().fit(x, x['a'])
+    store = IncrementalStore()
+    explain(store, model, x)
+    _, _, _, _, report = explain(store, model, x.copy())
+    assert report == {'reused_rows': 100, 'computed_rows': 0}
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.encoding import CategoricalEncoder
+from src.ingest import read_csv_compact
+
+
+def write(tmp_path, text):
+    path = tmp_path / 'data.csv'
+    path.write_text(text)
+    return str(path)
+
+
+def test_floats_float32_would_corrupt_stay_float64(tmp_path):
+    path = write(tmp_path, 'ts,price,small\n'
+                 '1700000000.25,12345678.91,0.1\n'
+                 '1700000001.75,12345678.5,0.25\n'
+                 '1700000003.5,12345679.75,3.5\n')
+    data = read_csv_compact(path, chunksize=2)
+    assert data['ts'].dtype == np.float64 and data['price'].dtype == np.float64
+    np.testing.assert_array_equal(data['ts'], [1700000000.25, 1700000001.75, 1700000003.5])
+    np.testing.assert_array_equal(data['price'], [12345678.91, 12345678.5, 12345679.75])
+    # Values float32 keeps well within their spread are still narrowed
+    assert data['small'].dtype == np.float32
+    np.testing.assert_allclose(data['small'], [0.1, 0.25, 3.5], rtol=1e-7)
+
+
+@pytest.mark.parametrize('chunksize', [1, 2, 100])
+def test_ints_with_gaps_keep_their_exact_values(tmp_path, chunksize):
+    path = write(tmp_path, 'small,large\n1,16777217\n,\n3,16777219\n')
+    data = read_csv_compact(path, chunksize=chunksize)
+    assert data['small'].dtype == np.float32 and data['large'].dtype == np.float64
+    np.testing.assert_array_equal(data['large'], [16777217, np.nan, 16777219])
+
+
+@pytest.mark.parametrize('chunksize', [1, 2, 3, 100])
+def test_text_in_a_later_chunk_reads_the_column_as_text(tmp_path, chunksize):
+    path = write(tmp_path, 'code,value\n1,0.5\n2,1.5\n3,2.5\nx,3.5\n')
+    data = read_csv_compact(path, chunksize=chunksize, max_categories=1)
+    assert data['code'].tolist() == pd.read_csv(path, dtype={'code': str})['code'].tolist()
+    assert data['code'].tolist() == ['1', '2', '3', 'x']
+    encoder = CategoricalEncoder()
+    encoder.fit(data)
+    np.testing.assert_array_equal(encoder.transform(data)['code'], [0, 1, 2, 3])
+
+
+def test_numbers_in_a_later_chunk_of_a_categorical(tmp_path):
+    path = write(tmp_path, 'code\na\nb\n007\n1.0\n')
+    data = read_csv_compact(path, chunksize=2)
+    # Numeric-looking text keeps its written form
+    assert data['code'].astype(object).tolist() == ['a', 'b', '007', '1.0']
@@ -0,0 +1,63 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from src.explainer import XAIExplainer
+from src.model_handler import ModelHandler
+
+
+def compile_both(tmp_path, model):
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.normal(size=(150, 3)), columns=['a', 'b', 'c'])
+    data['target'] = (data['a'] + data['b'] > 0).astype(int) if hasattr(model, 'predict_proba') else data.sum(axis=1)
+    data.to_csv(tmp_path / 'data.csv', index=False)
+    joblib.dump(model.fit(data[['a', 'b', 'c']], data['target']), tmp_path / 'model.pkl')
+
+    # Path-dependent TreeSHAP needs no background, so both explain every row the same way
+    explainers = []
+    for lazy in (False, True):
+        explainer = XAIExplainer(ModelHandler(str(tmp_path / 'model.pkl')), str(tmp_path / 'data.csv'),
+                                 lazy=lazy, lazy_rows=40, row_cache_size=2)
+        assert explainer.compile_explainer(), explainer.compile_error
+        explainers.append(explainer)
+    return explainers
+
+
+def as_list(contributions):
+    return contributions if isinstance(contributions, list) else [contributions]
+
+
+@pytest.mark.parametrize('model', [RandomForestRegressor(n_estimators=5, random_state=0),
+                                   RandomForestClassifier(n_estimators=5, random_state=0)])
+def test_lazy_rows_match_the_eager_explanation(tmp_path, model):
+    eager, lazy = compile_both(tmp_path, model)
+    assert len(lazy.explainer.x_init) == 40 and len(eager.explainer.x_init) == 150
+    uncompiled = [index for index in eager.data.index if index not in lazy.explainer.x_init.index][:3]
+    compiled = lazy.explainer.x_init.index[0]
+
+    for index in uncompiled + [compiled]:
+        explanation, cached = lazy.explain_row(index)
+        assert cached == (index == compiled)
+        expected, _ = eager.explain_row(index)
+        assert explanation['prediction'] == pytest.approx(expected['prediction'])
+        for actual, wanted in zip(as_list(explanation['contributions']), as_list(expected['contributions'])):
+            np.testing.assert_allclose(actual.to_numpy(dtype=np.float64), wanted.to_numpy(dtype=np.float64),
+                                       rtol=1e-5, atol=1e-6)
+
+    # Computed rows are memoized, up to row_cache_size of them
+    assert lazy.explain_row(uncompiled[-1])[1]
+    assert not lazy.explain_row(uncompiled[0])[1]
+    with pytest.raises(ValueError):
+        lazy.explain_row(1000)
+
+
+def test_explain_features_matches_the_row(tmp_path):
+    eager, lazy = compile_both(tmp_path, RandomForestRegressor(n_estimators=5, random_state=0))
+    index = next(index for index in eager.data.index if index not in lazy.explainer.x_init.index)
+    explanation, _ = lazy.explain_features(eager.data.loc[index, ['a', 'b', 'c']].to_dict())
+    expected, _ = eager.explain_row(index)
+    assert explanation['prediction'] == pytest.approx(expected['prediction'])
+    np.testing.assert_allclose(explanation['contributions'].to_numpy(dtype=np.float64),
+                               expected['contributions'].to_numpy(dtype=np.float64), rtol=1e-5, atol=1e-6)
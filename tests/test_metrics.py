@@ -0,0 +1,36 @@
+import numpy as np
+
+import src.metrics as metrics
+from src.metrics import MetricsRegistry
+
+
+def gauges(registry):
+    return {name: value for (name, _), value in registry._gauges.items()}
+
+
+def test_span_records_how_far_it_raised_the_peak(monkeypatch):
+    peaks = iter([100, 150, 150, 150])
+    monkeypatch.setattr(metrics, 'peak_rss_bytes', lambda: next(peaks))
+    registry = MetricsRegistry()
+    for stage in ('grow', 'idle'):
+        with registry.span(stage):
+            pass
+    growth = {labels: value for (name, labels), value in registry._gauges.items()
+              if name == 'explainify_stage_peak_rss_growth_bytes'}
+    assert growth == {(('stage', 'grow'),): 50, (('stage', 'idle'),): 0}
+    assert gauges(registry)['explainify_process_peak_rss_bytes'] == 150
+
+
+def test_peak_rss_is_reported_in_bytes():
+    block = np.ones(16 * 1024 ** 2 // 8)
+    assert metrics.peak_rss_bytes() >= block.nbytes
+
+
+def test_span_without_getrusage(monkeypatch):
+    monkeypatch.setattr(metrics, 'resource', None)
+    registry = MetricsRegistry()
+    with registry.span('stage') as span:
+        span.rows = 3
+    assert metrics.peak_rss_bytes() is None
+    assert gauges(registry) == {}
+    assert 'explainify_rows_processed_total{stage="stage"} 3' in registry.render()
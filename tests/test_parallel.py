@@ -0,0 +1,35 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression, LogisticRegression
+
+from src.backends import LinearBackend, TreeBackend, summarize_background
+from src.parallel import compute_contributions
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    x = pd.DataFrame(rng.normal(size=(500, 4)), columns=['a', 'b', 'c', 'd'])
+    return x, x['a'] * 2 - x['b'] + x['c'] * x['d']
+
+
+@pytest.mark.parametrize('backend_cls,make_model', [
+    (LinearBackend, lambda x, y: LinearRegression().fit(x, y)),
+    (LinearBackend, lambda x, y: LogisticRegression().fit(x, y > 0)),
+    (TreeBackend, lambda x, y: RandomForestRegressor(n_estimators=5, max_depth=4, random_state=0).fit(x, y)),
+])
+@pytest.mark.parametrize('chunk_size', [64, 500])
+def test_parallel_matches_serial(tmp_path, data, backend_cls, make_model, chunk_size):
+    x, y = data
+    model = make_model(x, y)
+    path = tmp_path / 'model.pkl'
+    joblib.dump(model, path)
+    background = summarize_background(backend_cls, x)
+
+    serial = backend_cls(model, masker=background).run_explainer(x)['contributions']
+    parallel = compute_contributions(str(path), x, backend_cls, background, n_jobs=2, chunk_size=chunk_size)
+    assert parallel.shape == np.asarray(serial).shape
+    np.testing.assert_allclose(parallel, serial, rtol=0, atol=1e-12)
@@ -0,0 +1,61 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from src.model_handler import ModelHandler
+from src.permutation import permutation_importance
+
+
+@pytest.fixture
+def handler(tmp_path):
+    rng = np.random.default_rng(0)
+    x = pd.DataFrame(rng.normal(size=(400, 3)), columns=['strong', 'weak', 'noise'])
+    y = 3 * x['strong'] + 0.3 * x['weak'] + rng.normal(0, 0.5, len(x))
+    path = tmp_path / 'model.pkl'
+    joblib.dump(LinearRegression().fit(x, y), path)
+    return ModelHandler(str(path)), x, y
+
+
+@pytest.mark.parametrize('min_repeats,max_repeats', [(2, 2), (3, 7), (5, 50)])
+def test_repeats_stay_within_bounds(handler, min_repeats, max_repeats):
+    model, x, y = handler
+    result = permutation_importance(model, x, y, min_repeats=min_repeats, max_repeats=max_repeats, tolerance=1e-9)
+    # A tolerance nobody can meet runs every feature up to max_repeats
+    assert (result['repeats'] == max_repeats).all()
+    assert result.attrs['rounds'] == -(-max_repeats // min_repeats)
+
+
+def test_stops_once_intervals_are_narrow_enough(handler):
+    model, x, y = handler
+    result = permutation_importance(model, x, y, min_repeats=5, max_repeats=50, tolerance=0.05, confidence=0.95)
+    assert (result['repeats'] >= 5).all() and (result['repeats'] <= 50).all()
+    scale = result['importance'].abs().max()
+    narrow = (result['ci_high'] - result['ci_low']) / 2 <= 0.05 * scale
+    # Every feature either met the tolerance or ran out of repeats
+    assert (narrow | (result['repeats'] == 50)).all()
+    assert list(result.index[:2]) == ['strong', 'weak']
+    assert (result['ci_low'] <= result['importance']).all() and (result['importance'] <= result['ci_high']).all()
+
+
+def test_max_rows_bounds_the_sample(handler):
+    model, x, y = handler
+    result = permutation_importance(model, x, y, max_rows=100)
+    assert result.attrs['n_rows'] == 100
+
+
+@pytest.mark.parametrize('options', [
+    {'min_repeats': 1}, {'min_repeats': 5, 'max_repeats': 4}, {'confidence': 1.0}, {'confidence': 0},
+])
+def test_rejects_invalid_bounds(handler, options):
+    model, x, y = handler
+    with pytest.raises(ValueError):
+        permutation_importance(model, x, y, **options)
+
+
+def test_results_do_not_depend_on_batching(handler):
+    model, x, y = handler
+    one = permutation_importance(model, x, y, batch_rows=400)
+    many = permutation_importance(model, x, y, batch_rows=400 * 50)
+    pd.testing.assert_frame_equal(one, many)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.plotdata import PlotData
+
+
+@pytest.fixture
+def plot_data():
+    rng = np.random.default_rng(0)
+    x = pd.DataFrame({'num': rng.normal(size=5000), 'cat': rng.choice(['a', 'b', 'c'], 5000, p=[0.9, 0.09, 0.01])},
+                     index=np.arange(5000) + 100)
+    contributions = pd.DataFrame({'num': x['num'] * 2, 'cat': rng.normal(size=5000)}, index=x.index)
+    return PlotData(x, contributions, n_bins=10, grid_size=8, point_budget=300)
+
+
+def test_window_never_ships_more_than_the_point_budget(plot_data):
+    everything = plot_data.window('num')
+    assert everything['rows'] == 5000 and everything['level'] == 'sample'
+    assert len(everything['points']) == 300
+    assert np.sum(everything['density']['counts']) == 5000
+    assert len(plot_data.window('num', max_points=10_000)['points']) == 300
+    assert len(plot_data.window('num', max_points=50)['points']) == 50
+    assert len(plot_data.window('cat')['points']) == 300
+    # Sampling is seeded, so repeated requests match
+    assert plot_data.window('num') == everything
+
+
+def test_small_windows_return_every_point(plot_data):
+    window = plot_data.window('num', x_range=(0.0, 0.05))
+    values = plot_data.x['num']
+    expected = values[(values >= 0.0) & (values <= 0.05)]
+    assert window['level'] == 'points' and window['rows'] == len(expected) <= 300
+    assert sorted(point['index'] for point in window['points']) == sorted(expected.index)
+    for point in window['points']:
+        assert point['contribution'] == pytest.approx(2 * point['value'])
+
+    rare = plot_data.window('cat', category='c')
+    assert rare['level'] == 'points' and {point['value'] for point in rare['points']} == {'c'}
+    bounded = plot_data.window('num', y_range=(0.0, 0.1))
+    assert all(0.0 <= point['contribution'] <= 0.1 for point in bounded['points'])
+
+
+def test_overviews_do_not_grow_with_rows(plot_data):
+    numeric = plot_data.overview('num')
+    assert numeric['rows'] == 5000 and len(numeric['bins']) <= 10
+    assert sum(entry['count'] for entry in numeric['bins']) == 5000
+    assert np.shape(numeric['density']['counts']) == (8, 8)
+    categorical = plot_data.overview('cat')
+    assert [entry['category'] for entry in categorical['bins']] == ['a', 'b', 'c']
+    with pytest.raises(ValueError):
+        plot_data.window('cat', category='d')
+    with pytest.raises(ValueError):
+        plot_data.overview('missing')
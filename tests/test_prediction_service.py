@@ -0,0 +1,62 @@
+import gc
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from src.model_handler import ModelHandler
+from src.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    x = pd.DataFrame({'a': np.arange(10.0), 'b': np.ones(10)})
+    path = tmp_path / 'model.pkl'
+    joblib.dump(LinearRegression().fit(x, x['a'] * 2), path)
+    return str(path)
+
+
+def wait_until_stopped(thread, seconds=5):
+    deadline = time.monotonic() + seconds
+    while thread.is_alive() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return not thread.is_alive()
+
+
+def test_close_answers_queued_requests_and_stops_the_thread(model_path):
+    handler = ModelHandler(model_path)
+    x = pd.DataFrame({'a': [1.0, 2.0], 'b': [1.0, 1.0]})
+    np.testing.assert_allclose(handler.predict_batched(x), [2.0, 4.0])
+    service = handler.prediction_service()
+    handler.close()
+    assert wait_until_stopped(service._worker)
+    # Cached rows are still served; anything that would reach the model is refused
+    with pytest.raises(ValueError):
+        service.predict(pd.DataFrame({'a': [3.0], 'b': [1.0]}))
+    # The handler starts a fresh service on the next batched call
+    np.testing.assert_allclose(handler.predict_batched(x), [2.0, 4.0])
+    handler.close()
+
+
+def test_worker_exits_once_the_handler_is_collected(model_path):
+    handler = ModelHandler(model_path)
+    handler.predict_batched(pd.DataFrame({'a': [1.0], 'b': [1.0]}))
+    worker = handler.prediction_service()._worker
+    del handler
+    gc.collect()
+    assert wait_until_stopped(worker)
+
+
+def test_registry_eviction_stops_the_prediction_thread(model_path, tmp_path):
+    other = tmp_path / 'other.pkl'
+    joblib.dump(LinearRegression().fit([[0.0, 1.0], [1.0, 0.0]], [0.0, 1.0]), other)
+    registry = ModelRegistry(max_memory_bytes=1)
+    handler = registry.get(model_path)
+    handler.predict_batched(pd.DataFrame({'a': [1.0], 'b': [1.0]}))
+    worker = handler.prediction_service()._worker
+    registry.get(str(other))
+    assert registry.evictions == 1
+    assert wait_until_stopped(worker)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.sampling import importance_from_sums, importance_with_confidence, sample_rows
+
+
+def test_stratified_sample_keeps_class_proportions_and_rare_classes():
+    labels = np.repeat(['a', 'b', 'c', 'rare'], [7000, 2000, 995, 5])
+    data = pd.DataFrame({'x': np.arange(len(labels))}, index=np.arange(len(labels)) * 2)
+    index = sample_rows(data, 1000, 'target', strata=labels)
+
+    assert len(index) == 1000 and index.is_monotonic_increasing and index.isin(data.index).all()
+    counts = pd.Series(labels, index=data.index)[index].value_counts()
+    assert counts['a'] == pytest.approx(700, abs=2)
+    assert counts['b'] == pytest.approx(200, abs=2)
+    assert counts['c'] == pytest.approx(99, abs=2)
+    assert counts['rare'] >= 1
+
+
+def test_continuous_strata_cover_the_value_range():
+    values = np.random.default_rng(0).exponential(size=20000)
+    data = pd.DataFrame({'x': values})
+    sampled = values[sample_rows(data, 500, 'prediction', strata=values)]
+    deciles = np.quantile(values, np.linspace(0, 1, 11))
+    per_decile = np.histogram(sampled, bins=deciles)[0]
+    assert per_decile.min() >= 45
+
+
+def test_sampling_is_reproducible_and_validated():
+    data = pd.DataFrame({'x': range(100)})
+    assert sample_rows(data, 10, random_state=1).equals(sample_rows(data, 10, random_state=1))
+    assert sample_rows(data, 200).equals(data.index)
+    with pytest.raises(ValueError):
+        sample_rows(data, 10, 'target')
+    with pytest.raises(ValueError):
+        sample_rows(data, 10, 'clusters')
+
+
+def test_confidence_interval_covers_the_population_importance():
+    rng = np.random.default_rng(0)
+    population = pd.DataFrame(rng.normal(size=(100000, 3)) * [1.0, 0.5, 2.0], columns=['a', 'b', 'c'])
+    truth = population.abs().mean()
+    covered = []
+    for seed in range(200):
+        sample = population.iloc[sample_rows(population, 200, random_state=seed)]
+        table = importance_with_confidence(sample, confidence=0.9).loc[truth.index]
+        covered.append((table['ci_low'] <= truth) & (truth <= table['ci_high']))
+    coverage = pd.DataFrame(covered).mean()
+    assert ((coverage > 0.84) & (coverage < 0.96)).all()
+
+
+def test_importance_from_sums_matches_the_frame():
+    contributions = pd.DataFrame(np.random.default_rng(1).normal(size=(50, 2)), columns=['a', 'b'])
+    values = contributions.abs().to_numpy()
+    from_sums = importance_from_sums(contributions.columns, 50, values.sum(axis=0), (values ** 2).sum(axis=0))
+    pd.testing.assert_frame_equal(from_sums, importance_with_confidence(contributions))
+    assert importance_with_confidence([contributions, contributions]).index[0] == from_sums.index[0]
+    with pytest.raises(ValueError):
+        importance_from_sums(contributions.columns, 50, values.sum(axis=0), values.sum(axis=0), confidence=1)
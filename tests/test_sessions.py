@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+from src.sessions import SessionManager
+
+# Ports whose fake dashboards are still running
+listening = set()
+
+
+class FakeApp:
+    def __init__(self, port):
+        self.port = port
+
+    def kill(self):
+        listening.discard(self.port)
+
+    def join(self, timeout=None):
+        pass
+
+
+class FakeExplainer:
+    def __init__(self, memory_bytes=10):
+        self.memory_bytes = memory_bytes
+        self.explainer = None
+
+    def memory_usage(self):
+        return self.memory_bytes
+
+    def launch_webapp(self, port):
+        assert port not in listening, f"port {port} is still serving an evicted session"
+        listening.add(port)
+        return FakeApp(port)
+
+
+@pytest.fixture(autouse=True)
+def reset_listening():
+    listening.clear()
+
+
+def test_evicted_port_is_only_reused_once_stopped():
+    manager = SessionManager([9001], max_memory_bytes=10)
+    first = manager.create(FakeExplainer())
+    second = manager.create(FakeExplainer())
+    assert manager.evictions == 1
+    assert second.port == first.port
+    assert manager.list() == [second]
+
+
+def test_eviction_prefers_a_fresh_port():
+    manager = SessionManager([9001, 9002, 9003], max_memory_bytes=20)
+    first = manager.create(FakeExplainer())
+    second = manager.create(FakeExplainer())
+    third = manager.create(FakeExplainer())
+    assert manager.evictions == 1
+    assert third.port not in (first.port, second.port)
+
+
+def test_closing_port_is_not_handed_out_while_stopping():
+    manager = SessionManager([9001, 9002], max_memory_bytes=100)
+    session = manager.create(FakeExplainer())
+    stopping = threading.Event()
+    release = threading.Event()
+
+    def slow_kill():
+        stopping.set()
+        release.wait(5)
+        listening.discard(session.port)
+
+    session.app.kill = slow_kill
+    closer = threading.Thread(target=manager.close, args=(session.id,))
+    closer.start()
+    assert stopping.wait(5)
+    other = manager.create(FakeExplainer())
+    assert other.port != session.port
+    release.set()
+    closer.join()
+    assert manager.create(FakeExplainer()).port == session.port
+
+
+def test_no_free_port():
+    manager = SessionManager([9001], max_memory_bytes=100)
+    manager.create(FakeExplainer())
+    with pytest.raises(RuntimeError):
+        manager.create(FakeExplainer())
+
+
+def test_sessions_without_a_dashboard_take_no_port():
+    manager = SessionManager([9001], max_memory_bytes=100)
+    headless = manager.create(FakeExplainer(), launch=False)
+    assert headless.port is None and headless.app is None
+    assert manager.get(headless.id) is headless
+    assert manager.create(FakeExplainer()).port == 9001
+    assert manager.close(headless.id)
+
+
+def test_requests_holding_a_closed_session_keep_its_explainer():
+    manager = SessionManager([9001], max_memory_bytes=10)
+    explainer = FakeExplainer()
+    fetched = manager.get(manager.create(explainer).id)
+    manager.create(FakeExplainer())
+    assert manager.get(fetched.id) is None
+    assert fetched.explainer is explainer and fetched.app is None
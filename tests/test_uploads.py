@@ -0,0 +1,65 @@
+import hashlib
+import io
+
+import pytest
+
+from src.uploads import UploadError, UploadManager
+
+
+class DisconnectingStream:
+    """Yields ``limit`` bytes of ``data`` and then fails like a dropped client connection"""
+
+    def __init__(self, data, limit, error=OSError):
+        self.stream = io.BytesIO(data[:limit])
+        self.error = error
+
+    def read(self, size):
+        chunk = self.stream.read(size)
+        if not chunk:
+            raise self.error("client disconnected")
+        return chunk
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return UploadManager(str(tmp_path), read_size=100)
+
+
+def test_resume_after_disconnect_stores_the_original_bytes(manager):
+    data = bytes(range(256)) * 20
+    upload = manager.create('data.csv', len(data))
+
+    with pytest.raises(OSError):
+        manager.write_chunk(upload.id, 0, DisconnectingStream(data, 1000))
+    # The interrupted chunk is dropped entirely, so the client resends from 0
+    assert manager.get(upload.id).received == 0
+    assert manager.write_chunk(upload.id, 0, io.BytesIO(data)) == len(data)
+
+    file_id, _ = manager.complete(upload.id)
+    assert file_id == f'{hashlib.sha256(data).hexdigest()}.csv'
+    with open(manager.blob_path(file_id), 'rb') as f:
+        assert f.read() == data
+
+
+def test_disconnect_in_a_later_chunk_keeps_earlier_chunks(manager):
+    data = b'x' * 500 + b'y' * 500
+    upload = manager.create('data.csv', len(data))
+    manager.write_chunk(upload.id, 0, io.BytesIO(data[:500]))
+
+    with pytest.raises(OSError):
+        manager.write_chunk(upload.id, 500, DisconnectingStream(data[500:], 300))
+    assert manager.get(upload.id).received == 500
+    with pytest.raises(UploadError):
+        manager.write_chunk(upload.id, 800, io.BytesIO(data[800:]))
+    manager.write_chunk(upload.id, 500, io.BytesIO(data[500:]))
+
+    file_id, _ = manager.complete(upload.id)
+    assert file_id.startswith(hashlib.sha256(data).hexdigest())
+
+
+def test_chunk_beyond_declared_size_is_rejected(manager):
+    upload = manager.create('data.csv', 10)
+    with pytest.raises(UploadError) as error:
+        manager.write_chunk(upload.id, 0, io.BytesIO(b'z' * 20))
+    assert error.value.status == 413
+    assert manager.get(upload.id).received == 0
@@ -0,0 +1,87 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from src.encoding import CategoricalEncoder
+from src.model_handler import ModelHandler
+from src.whatif import acceptance, counterfactual, grid_values, sweep
+
+
+class CountingHandler:
+    """ModelHandler wrapper that records the rows of every model call"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.model = handler.model
+        self.model_type = handler.model_type
+        self.calls = []
+
+    def predict(self, x):
+        self.calls.append(len(x))
+        return self.handler.predict(x)
+
+    def predict_proba(self, x):
+        self.calls.append(len(x))
+        return self.handler.predict_proba(x)
+
+
+@pytest.fixture
+def classifier(tmp_path):
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({'a': rng.normal(size=2000), 'b': rng.normal(size=2000),
+                         'color': rng.choice(['red', 'blue'], 2000)})
+    encoder = CategoricalEncoder()
+    encoder.fit(data)
+    x = encoder.transform(data)
+    model = LogisticRegression().fit(x, (x['a'] + x['b'] > 1).astype(int))
+    path = tmp_path / 'model.pkl'
+    joblib.dump(model, path)
+    return CountingHandler(ModelHandler(str(path))), x, encoder
+
+
+def test_sweep_is_one_model_call(classifier):
+    handler, x, encoder = classifier
+    grid = [('a', grid_values(x, encoder, 'a', points=100))]
+    result = sweep(handler, x.iloc[:1000], grid, encoder)
+    assert handler.calls == [100000]
+    assert result['evaluations'] == 100000
+    assert len(result['ice']['1']) == 1000 and len(result['partial_dependence']['1']) == 100
+
+
+def test_sweep_rejects_grids_over_the_evaluation_budget(classifier):
+    handler, x, encoder = classifier
+    with pytest.raises(ValueError):
+        sweep(handler, x.iloc[:100], [('a', np.arange(20.0))], encoder, max_evaluations=1999)
+    assert handler.calls == []
+
+
+@pytest.mark.parametrize('max_evaluations', [1, 10, 600, 2000])
+def test_counterfactual_respects_the_evaluation_budget(classifier, max_evaluations):
+    handler, x, encoder = classifier
+    base = x[handler.predict(x) == 0].iloc[[0]]
+    handler.calls.clear()
+    result = counterfactual(handler, base, x, encoder, acceptance(handler, 1), max_evaluations=max_evaluations)
+    assert sum(handler.calls) == result['evaluations'] <= max_evaluations
+    if max_evaluations < 600:
+        assert result['stopped'] == 'max_evaluations'
+
+
+def test_counterfactual_keeps_accepted_donors_and_immutable_features(classifier):
+    handler, x, encoder = classifier
+    base = x[handler.predict(x) == 0].iloc[[0]]
+    result = counterfactual(handler, base, x, encoder, acceptance(handler, 1), mutable=['a', 'b'],
+                            max_evaluations=10)
+    assert result['found'] and result['prediction'] == 1
+    assert result['counterfactual']['color'] == encoder.decode('color', base['color'])[0]
+    assert {change['feature'] for change in result['changes']} <= {'a', 'b'}
+
+
+def test_counterfactual_rejects_empty_budgets(classifier):
+    handler, x, encoder = classifier
+    base = x.iloc[[0]]
+    with pytest.raises(ValueError):
+        counterfactual(handler, base, x, encoder, acceptance(handler, 1), max_evaluations=0)
+    with pytest.raises(ValueError):
+        counterfactual(handler, base, x, encoder, acceptance(handler, 1), max_seconds=0)